@@ -1,16 +1,16 @@
-from flask import Flask, render_template, request, send_file, Response
+from flask import Flask, render_template, request, send_file, Response, g, url_for
 import os
 from werkzeug.utils import secure_filename
-from beatmachine import Beats
-import tempfile
+from beatmachine import Beats, Preview
+from beatmachine.buffers import BufferPool
+from beatmachine.instrumentation import add_hook
+from beatmachine.probe import probe_audio
+from beatmachine.service import AdmissionController, AdmissionRejected, Janitor, Metrics, TierSelector, estimate_peak_memory
 import logging
-import gc
-import numpy as np
 from pathlib import Path
-import shutil
-import threading
-from queue import Queue, Empty
+import re
 import time
+import uuid
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,95 +21,147 @@ MAX_FILE_SIZE = 8 * 1024 * 1024  # 8MB max file size
 CHUNK_SIZE = 512 * 1024  # 512KB chunks
 UPLOAD_FOLDER = Path('uploads')
 TEMP_FOLDER = Path('temp')
+MEMORY_BUDGET = int(os.environ.get('BEATMACHINE_MEMORY_BUDGET_MB', 1024)) * 1024 * 1024
+MAX_WAITING_JOBS = int(os.environ.get('BEATMACHINE_MAX_WAITING_JOBS', 2))
+ADMISSION_TIMEOUT = float(os.environ.get('BEATMACHINE_ADMISSION_TIMEOUT', 2))
+TARGET_LATENCY = float(os.environ.get('BEATMACHINE_TARGET_LATENCY', 60))
+PREVIEW_SECONDS = float(os.environ.get('BEATMACHINE_PREVIEW_SECONDS', 30))
+BUFFER_POOL_SIZE = int(os.environ.get('BEATMACHINE_BUFFER_POOL_MB', 512)) * 1024 * 1024
+# Uploads are removed as soon as they are processed, so this is how long results stay available for download
+FILE_MAX_AGE = float(os.environ.get('BEATMACHINE_FILE_MAX_AGE', 300))
+FILE_QUOTA = int(os.environ.get('BEATMACHINE_FILE_QUOTA_MB', 2048)) * 1024 * 1024
+CLEANUP_INTERVAL = float(os.environ.get('BEATMACHINE_CLEANUP_INTERVAL', 30))
+# Internal nginx location that serves TEMP_FOLDER, e.g. /_results/. When set, nginx sends results itself.
+ACCEL_REDIRECT = os.environ.get('BEATMACHINE_ACCEL_REDIRECT')
+RESULT_ID = re.compile('[0-9a-f]{32}')
 
 # Create directories
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 TEMP_FOLDER.mkdir(exist_ok=True)
 
-# Global processing queue
-processing_queue = Queue(maxsize=2)
-current_jobs = {}
+# Jobs are admitted against an estimated memory budget instead of a fixed queue size
+admission = AdmissionController(MEMORY_BUDGET, max_waiting=MAX_WAITING_JOBS, wait_timeout=ADMISSION_TIMEOUT)
+
+# Analysis quality degrades under load to keep latency bounded
+tier_selector = TierSelector(target_latency=TARGET_LATENCY)
+
+# Large arrays are borrowed per job and reused, so the heap doesn't fragment across jobs
+buffer_pool = BufferPool(max_idle_bytes=BUFFER_POOL_SIZE)
+
+# Old uploads and results are cleaned up in the background, never on the request path
+janitor = Janitor([UPLOAD_FOLDER, TEMP_FOLDER], max_age=FILE_MAX_AGE, max_total_bytes=FILE_QUOTA, interval=CLEANUP_INTERVAL)
+
+# Stage timings, request latencies and queue depth, scraped from /metrics
+metrics = Metrics()
+add_hook(metrics)
+metrics.gauge('beatmachine_jobs_running', 'Jobs currently being processed.', lambda: admission.running)
+metrics.gauge('beatmachine_jobs_waiting', 'Jobs waiting for memory to free up.', lambda: admission.waiting)
+metrics.gauge('beatmachine_memory_reserved_bytes', 'Estimated memory reserved by admitted jobs.', lambda: admission.in_use)
+metrics.gauge('beatmachine_memory_budget_bytes', 'Memory budget for admitted jobs.', lambda: admission.budget_bytes)
+metrics.gauge('beatmachine_buffer_pool_idle_bytes', 'Pooled buffers not in use.', lambda: buffer_pool.idle_bytes)
+metrics.gauge('beatmachine_buffer_pool_borrowed_bytes', 'Pooled buffers in use.', lambda: buffer_pool.borrowed_bytes)
+metrics.gauge('beatmachine_files_bytes', 'Space taken by uploads and results at the last cleanup.', lambda: janitor.total_bytes)
+metrics.counter('beatmachine_files_removed_total', 'Uploads and results removed by cleanup.', lambda: janitor.removed_files)
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+# Hand results to Apache or lighttpd with X-Sendfile instead of reading them in Python
+app.config['USE_X_SENDFILE'] = os.environ.get('BEATMACHINE_X_SENDFILE') == '1'
 
-def cleanup_old_files():
-    """Clean up files older than 5 minutes"""
-    try:
-        for folder in [UPLOAD_FOLDER, TEMP_FOLDER]:
-            for file in folder.glob('*'):
-                if file.is_file() and (time.time() - file.stat().st_mtime > 300):
-                    try:
-                        file.unlink()
-                    except:
-                        pass
-    except Exception as e:
-        logger.error(f"Cleanup error: {e}")
+def pattern_effect(pattern):
+    """Keep beats marked 1 in the repeating pattern and drop beats marked 0"""
+    keep = [c == '1' for c in pattern] or [True]
+
+    def effect(beats):
+        for i, beat in enumerate(beats):
+            if keep[i % len(keep)]:
+                yield beat
+
+    return effect
+
+def result_path(result_id, filename):
+    return TEMP_FOLDER / f"{result_id}_remixed_{filename}"
 
-def process_beats(input_path, output_path, pattern):
-    """Process beats in small chunks"""
+def result_etag(result_id, path):
+    # Results never change once written, so the job id and size make a strong validator
+    return f"{result_id}-{path.stat().st_size}"
+
+def send_result(result_id, filename):
+    """Serve a finished remix, answering conditional and range requests from the file on disk"""
+    path = result_path(result_id, filename)
+    etag = result_etag(result_id, path)
+    if ACCEL_REDIRECT:
+        response = Response(mimetype='audio/wav')
+        response.headers['X-Accel-Redirect'] = ACCEL_REDIRECT.rstrip('/') + '/' + path.name
+        response.headers['Content-Disposition'] = f'attachment; filename=remixed_{filename}'
+        response.set_etag(etag)
+    else:
+        # Without X-Sendfile, gunicorn sends whole files with sendfile() through wsgi.file_wrapper
+        response = send_file(
+            path.resolve(),
+            mimetype='audio/wav',
+            as_attachment=True,
+            download_name=f'remixed_{filename}',
+            conditional=True,
+            etag=etag,
+            max_age=FILE_MAX_AGE,
+        )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers['Content-Location'] = url_for('download_result', result_id=result_id, filename=filename)
+    return response
+
+def process_beats(input_path, output_path, pattern, backend=None, preview=False):
+    """Locate beats, apply the pattern and write the result"""
     try:
-        beats = Beats.from_song(str(input_path))
-        from beatmachine.effects import RemapBeats
-        
-        # Create simple mapping
-        mapping = [i % len(pattern) for i in range(len(beats))]
-        effect = RemapBeats(mapping)
-        
-        # Process in small chunks
-        chunk_size = 500  # Process 500 beats at a time
-        total_beats = len(beats)
-        
-        # Create temporary file for processing
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            temp_path = Path(temp_file.name)
-            
-            for i in range(0, total_beats, chunk_size):
-                chunk = beats[i:min(i + chunk_size, total_beats)]
-                processed_chunk = effect.apply(chunk)
-                processed_chunk.save(str(temp_path), append=(i > 0))
-                del processed_chunk
-                del chunk
-                gc.collect()
-            
-            # Move completed file to output location
-            shutil.move(str(temp_path), output_path)
-        
-        return True
+        # Decoded and rendered audio is only used within this block, so it can go back to the pool afterwards
+        with buffer_pool.lease():
+            if preview:
+                # Only decode, analyse and encode the start of the song
+                Preview.from_song(str(input_path), PREVIEW_SECONDS, backend).render([pattern_effect(pattern)], str(output_path))
+                return True
+
+            beats = Beats.from_song(str(input_path), backend)
+            beats.apply(pattern_effect(pattern)).save(str(output_path))
+            return True
     except Exception as e:
         logger.error(f"Processing error: {e}")
         return False
-    finally:
-        gc.collect()
 
-def worker():
-    while True:
-        try:
-            input_path, output_path, pattern = processing_queue.get(timeout=1)
-        except Empty:
-            continue
-        
-        success = process_beats(input_path, output_path, pattern)
-        
-        if not success:
-            logger.error("Error processing audio")
-        
-        processing_queue.task_done()
+@app.before_request
+def start_timer():
+    g.start = time.monotonic()
+    # Started from a request rather than at import, so that each forked gunicorn worker runs its own
+    janitor.start()
 
-# Start worker thread
-thread = threading.Thread(target=worker)
-thread.daemon = True
-thread.start()
+@app.after_request
+def record_latency(response):
+    # Covers everything up to the start of the response body, which is when processing is done
+    if request.endpoint == 'remix_audio':
+        metrics.observe_request(time.monotonic() - g.start, response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
-    cleanup_old_files()
     return render_template('index.html')
 
+@app.route('/results/<result_id>/<filename>')
+def download_result(result_id, filename):
+    if not RESULT_ID.fullmatch(result_id) or filename != secure_filename(filename):
+        return 'Not found', 404
+    
+    # send_file opens the result, after which the janitor removing it doesn't affect the download
+    with janitor.protect(result_path(result_id, filename)):
+        if not result_path(result_id, filename).is_file():
+            return 'This remix has expired, please upload the song again.', 404
+        return send_result(result_id, filename)
+
 @app.route('/remix', methods=['POST'])
 def remix_audio():
-    cleanup_old_files()
-    
     if 'file' not in request.files:
         return 'No file uploaded', 400
     
@@ -123,43 +175,55 @@ def remix_audio():
     try:
         # Save uploaded file
         filename = secure_filename(file.filename)
-        input_path = UPLOAD_FOLDER / filename
-        output_path = TEMP_FOLDER / f"remixed_{filename}"
+        result_id = uuid.uuid4().hex
+        input_path = UPLOAD_FOLDER / f"{result_id}_{filename}"
+        output_path = result_path(result_id, filename)
+        
+        # Keep the janitor away from this job's files until the result is open for sending
+        janitor.hold(input_path, output_path)
         
         # Save file
         file.save(input_path)
         
         # Get pattern
-        pattern = request.form.get('pattern', '1234')
+        pattern = request.form.get('pattern', '1010')
+        preview = request.form.get('preview') == '1'
         
-        # Add to processing queue
-        processing_queue.put((input_path, output_path, pattern))
+        # Estimate memory from the decoded size rather than the upload size
+        try:
+            info = probe_audio(input_path)
+            if preview:
+                info = info._replace(duration=min(info.duration, PREVIEW_SECONDS))
+            estimate = estimate_peak_memory(info)
+        except ValueError:
+            input_path.unlink(missing_ok=True)
+            janitor.release(input_path, output_path)
+            return 'Could not read audio file.', 400
         
-        # Wait for processing to complete
-        processing_queue.join()
+        # Pick analysis quality from the load at arrival time
+        tier = tier_selector.select(admission.running + admission.waiting)
         
-        # Stream processed file
-        def generate():
-            try:
-                with open(output_path, 'rb') as f:
-                    while True:
-                        chunk = f.read(CHUNK_SIZE)
-                        if not chunk:
-                            break
-                        yield chunk
-            finally:
-                # Cleanup after streaming
-                try:
-                    input_path.unlink(missing_ok=True)
-                    output_path.unlink(missing_ok=True)
-                except:
-                    pass
+        # Wait for memory to free up, or fail fast if the worker is saturated
+        try:
+            with admission.admit(estimate):
+                start = time.monotonic()
+                success = process_beats(input_path, output_path, pattern, tier_selector.backend(tier), preview)
+                tier_selector.record_latency(time.monotonic() - start)
+        except AdmissionRejected as e:
+            input_path.unlink(missing_ok=True)
+            janitor.release(input_path, output_path)
+            if e.retry_after is None:
+                return 'File is too long to process.', 413
+            return 'Server is busy, please try again shortly.', 503, {'Retry-After': str(e.retry_after)}
         
-        response = Response(
-            generate(),
-            mimetype='audio/wav',
-            headers={'Content-Disposition': f'attachment; filename=remixed_{filename}'}
-        )
+        if not success:
+            raise RuntimeError('Error processing audio')
+        
+        # The result is kept until it expires, so repeated and partial downloads don't render it again
+        input_path.unlink(missing_ok=True)
+        response = send_result(result_id, filename)
+        response.headers['X-Beatmachine-Tier'] = tier.name
+        janitor.release(input_path, output_path)
         return response
         
     except Exception as e:
@@ -168,6 +232,7 @@ def remix_audio():
         try:
             input_path.unlink(missing_ok=True)
             output_path.unlink(missing_ok=True)
+            janitor.release(input_path, output_path)
         except:
             pass
         return f'Server error: {str(e)}', 500
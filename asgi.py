@@ -0,0 +1,429 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from werkzeug.http import (
+    parse_etags,
+    parse_options_header,
+    parse_range_header,
+    quote_etag,
+)
+from werkzeug.sansio.multipart import (
+    Data,
+    Epilogue,
+    Field,
+    File,
+    MultipartDecoder,
+    NeedData,
+)
+from werkzeug.utils import secure_filename
+
+from app import (
+    ACCEL_REDIRECT,
+    CHUNK_SIZE,
+    FILE_MAX_AGE,
+    MAX_FILE_SIZE,
+    PREVIEW_SECONDS,
+    RESULT_ID,
+    UPLOAD_FOLDER,
+    admission,
+    buffer_pool,
+    janitor,
+    metrics,
+    pattern_effect,
+    result_etag,
+    result_path,
+    tier_selector,
+)
+from beatmachine import Beats, Preview
+from beatmachine.probe import probe_audio
+from beatmachine.service import AdmissionRejected, estimate_peak_memory
+
+# Serves the same routes as app.py from an event loop. Uploads, waiting for memory, decoding and downloads don't hold
+# a thread, so slow clients cost a socket rather than a worker. Run with `uvicorn asgi:app`, or under gunicorn with
+# `gunicorn -k uvicorn.workers.UvicornWorker asgi:app`.
+
+logger = logging.getLogger(__name__)
+
+# Threads that analyse and render songs. numpy, madmom and libsndfile release the GIL for the heavy lifting, and
+# admission control already bounds how many jobs run at once.
+JOB_THREADS = int(os.environ.get("BEATMACHINE_JOB_THREADS", 2))
+
+# Form fields other than the file are tiny, so each is capped well below the upload limit
+MAX_FIELD_SIZE = 64 * 1024
+
+executor = ThreadPoolExecutor(JOB_THREADS, thread_name_prefix="beatmachine-job")
+
+INDEX_HTML = (Path(__file__).parent / "templates" / "index.html").read_bytes()
+
+
+class HTTPError(Exception):
+    """An error response, raised from anywhere while handling a request"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def _encode_headers(headers):
+    return [(name.lower().encode("latin-1"), str(value).encode("latin-1")) for name, value in headers.items()]
+
+
+async def respond(send, status, body, content_type="text/plain; charset=utf-8", headers=None):
+    """Send a complete response"""
+    if isinstance(body, str):
+        body = body.encode()
+    headers = {"Content-Type": content_type, "Content-Length": len(body), **(headers or {})}
+    await send({"type": "http.response.start", "status": status, "headers": _encode_headers(headers)})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_result(send, method, headers, result_id, filename, extra_headers=None):
+    """Serve a finished remix, answering conditional and range requests from the file on disk"""
+    path = result_path(result_id, filename)
+    response_headers = {
+        "Content-Type": "audio/wav",
+        "Content-Disposition": f"attachment; filename=remixed_{filename}",
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"private, max-age={int(FILE_MAX_AGE)}",
+        "Content-Location": f"/results/{result_id}/{filename}",
+        **(extra_headers or {}),
+    }
+    if ACCEL_REDIRECT:
+        response_headers["X-Accel-Redirect"] = ACCEL_REDIRECT.rstrip("/") + "/" + path.name
+        await respond(send, 200, b"", "audio/wav", response_headers)
+        return
+
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as f:
+        etag = result_etag(result_id, path)
+        size = os.fstat(f.fileno()).st_size
+        response_headers["ETag"] = quote_etag(etag)
+        status, start, stop = 200, 0, size
+
+        if method in ("GET", "HEAD"):
+            if parse_etags(headers.get("if-none-match")).contains_weak(etag):
+                await send({"type": "http.response.start", "status": 304, "headers": _encode_headers(response_headers)})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            # Only single ranges are served partially. Anything else, or a stale If-Range, gets the whole file.
+            byte_range = parse_range_header(headers.get("range"))
+            if_range = headers.get("if-range")
+            if byte_range is not None and len(byte_range.ranges) == 1 and if_range in (None, quote_etag(etag)):
+                bounds = byte_range.range_for_length(size)
+                if bounds is None:
+                    await respond(send, 416, "", headers={"Content-Range": f"bytes */{size}"})
+                    return
+                status, (start, stop) = 206, bounds
+                response_headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+
+        response_headers["Content-Length"] = stop - start
+        await send({"type": "http.response.start", "status": status, "headers": _encode_headers(response_headers)})
+        if method == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # Each chunk waits for the client to take the previous one, so slow clients only cost memory for one chunk
+        f.seek(start)
+        remaining = stop - start
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, min(CHUNK_SIZE, remaining))
+            remaining -= len(chunk)
+            more = bool(chunk) and remaining > 0
+            await send({"type": "http.response.body", "body": chunk, "more_body": more})
+            if not more:
+                break
+
+
+async def body_chunks(receive, limit):
+    """Yield the request body as it arrives, refusing bodies larger than limit"""
+    received = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise HTTPError(400, "Client disconnected.")
+
+        body = message.get("body", b"")
+        received += len(body)
+        if received > limit:
+            raise HTTPError(413, "File is too large.")
+
+        yield body
+        if not message.get("more_body", False):
+            return
+
+
+async def receive_upload(receive, content_type, open_file):
+    """Stream a multipart form to disk as it arrives
+
+    open_file is called with the name of the uploaded file and returns the path to write it to. Returns the form's
+    text fields and that path.
+    """
+    mimetype, options = parse_options_header(content_type)
+    if mimetype != "multipart/form-data" or "boundary" not in options:
+        raise HTTPError(400, "No file uploaded")
+
+    decoder = MultipartDecoder(options["boundary"].encode())
+    fields = {}
+    path = None
+    out = None
+    current = None
+
+    def handle_events():
+        nonlocal path, out, current
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, (NeedData, Epilogue)):
+                return
+            if isinstance(event, File):
+                # Only the first file in the 'file' field is kept
+                current = None
+                if event.name == "file" and path is None:
+                    path = open_file(event.filename)
+                    out = open(path, "wb")
+                    current = out
+            elif isinstance(event, Field):
+                current = fields.setdefault(event.name, bytearray())
+            elif isinstance(event, Data) and current is out and out is not None:
+                out.write(event.data)
+            elif isinstance(event, Data) and current is not None:
+                current.extend(event.data)
+                if len(current) > MAX_FIELD_SIZE:
+                    raise HTTPError(413, "Form field is too large.")
+
+    try:
+        async for chunk in body_chunks(receive, MAX_FILE_SIZE):
+            decoder.receive_data(chunk)
+            handle_events()
+        decoder.receive_data(None)
+        handle_events()
+    except ValueError:
+        raise HTTPError(400, "Malformed upload.")
+    finally:
+        if out is not None:
+            out.close()
+
+    if path is None:
+        raise HTTPError(400, "No file uploaded")
+
+    return {name: value.decode("utf-8", "replace") for name, value in fields.items()}, path
+
+
+async def decode(path, info, seconds=None):
+    """Decode a song to float64 samples in an ffmpeg subprocess, without tying up a thread while it runs"""
+    command = ["ffmpeg", "-v", "error", "-nostdin", "-i", str(path)]
+    if seconds is not None:
+        command += ["-t", str(seconds)]
+    command += ["-ac", str(info.channels), "-ar", str(info.sample_rate), "-f", "f64le", "pipe:1"]
+
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    pcm = bytearray()
+
+    async def read_samples():
+        while True:
+            chunk = await process.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            pcm.extend(chunk)
+
+    try:
+        _, errors = await asyncio.gather(read_samples(), process.stderr.read())
+        await process.wait()
+    finally:
+        if process.returncode is None:
+            process.kill()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {errors.decode(errors='replace').strip()}")
+
+    frames = len(pcm) // (8 * info.channels)
+    signal = np.frombuffer(pcm, dtype=np.float64, count=frames * info.channels)
+    return signal.reshape(frames, info.channels), info.sample_rate
+
+
+def render(signal, sample_rate, input_path, output_path, pattern, tier, preview, start):
+    """Locate beats in decoded audio, apply the pattern and write the result. Runs on a job thread."""
+    backend = tier_selector.backend(tier)
+    with buffer_pool.lease():
+        beats = Beats.from_signal(signal, sample_rate, backend)
+        if preview:
+            complete = len(signal) < round(PREVIEW_SECONDS * sample_rate)
+            Preview(str(input_path), beats, complete, backend).render([pattern_effect(pattern)], str(output_path))
+        else:
+            beats.apply(pattern_effect(pattern)).save(str(output_path))
+
+    # Recorded here rather than on the event loop, like every other job thread
+    tier_selector.record_latency(time.monotonic() - start)
+
+
+@contextlib.asynccontextmanager
+async def admitted(estimate):
+    """Reserve memory for a job, waiting on a spare thread so the event loop keeps serving other requests"""
+    loop = asyncio.get_running_loop()
+    admit = admission.admit(estimate)
+    entered = loop.run_in_executor(None, admit.__enter__)
+    try:
+        await asyncio.shield(entered)
+    except asyncio.CancelledError:
+        # The wait carries on without us, so give the memory back if it is eventually granted
+        entered.add_done_callback(lambda f: f.cancelled() or f.exception() or admit.__exit__(None, None, None))
+        raise
+
+    try:
+        yield
+    finally:
+        admit.__exit__(None, None, None)
+
+
+async def process_upload(receive, headers, held):
+    """Receive an upload and remix it, returning the result's id, file name and tier"""
+    filename = None
+    result_id = None
+
+    def open_file(name):
+        nonlocal filename, result_id
+        if not name:
+            raise HTTPError(400, "No file selected")
+        filename = secure_filename(name)
+        if not filename.lower().endswith((".mp3", ".wav")):
+            raise HTTPError(400, "Invalid file type. Please upload MP3 or WAV files only.")
+
+        result_id = uuid.uuid4().hex
+        input_path = UPLOAD_FOLDER / f"{result_id}_{filename}"
+        output_path = result_path(result_id, filename)
+        # Keep the janitor away from this job's files until the response is done
+        janitor.hold(input_path, output_path)
+        held.extend([input_path, output_path])
+        return input_path
+
+    fields, input_path = await receive_upload(receive, headers.get("content-type", ""), open_file)
+    output_path = held[1]
+    pattern = fields.get("pattern", "1010")
+    preview = fields.get("preview") == "1"
+
+    # Estimate memory from the decoded size rather than the upload size
+    loop = asyncio.get_running_loop()
+    try:
+        info = await loop.run_in_executor(None, probe_audio, input_path)
+        estimate = estimate_peak_memory(
+            info._replace(duration=min(info.duration, PREVIEW_SECONDS)) if preview else info
+        )
+    except ValueError:
+        raise HTTPError(400, "Could not read audio file.")
+
+    # Pick analysis quality from the load at arrival time
+    tier = tier_selector.select(admission.running + admission.waiting)
+
+    # Wait for memory to free up, or fail fast if the worker is saturated
+    try:
+        async with admitted(estimate):
+            start = time.monotonic()
+            signal, sample_rate = await decode(input_path, info, PREVIEW_SECONDS if preview else None)
+            await loop.run_in_executor(
+                executor, render, signal, sample_rate, input_path, output_path, pattern, tier, preview, start
+            )
+    except AdmissionRejected as e:
+        if e.retry_after is None:
+            raise HTTPError(413, "File is too long to process.")
+        raise HTTPError(503, "Server is busy, please try again shortly.", {"Retry-After": e.retry_after})
+
+    return result_id, filename, tier
+
+
+async def remix_audio(receive, send, headers):
+    held = []
+    try:
+        try:
+            result_id, filename, tier = await process_upload(receive, headers, held)
+        except HTTPError as e:
+            await respond(send, e.status, e.message, headers=e.headers)
+            return
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            await respond(send, 500, f"Server error: {str(e)}")
+            for path in held:
+                path.unlink(missing_ok=True)
+            return
+
+        # The result is kept until it expires, so repeated and partial downloads don't render it again
+        await send_result(send, "POST", headers, result_id, filename, {"X-Beatmachine-Tier": tier.name})
+    finally:
+        if held:
+            held[0].unlink(missing_ok=True)
+        janitor.release(*held)
+
+
+async def download_result(send, method, headers, result_id, filename):
+    if not RESULT_ID.fullmatch(result_id) or filename != secure_filename(filename):
+        await respond(send, 404, "Not found")
+        return
+    try:
+        await send_result(send, method, headers, result_id, filename)
+    except FileNotFoundError:
+        await respond(send, 404, "This remix has expired, please upload the song again.")
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            janitor.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            janitor.stop()
+            executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    # Servers that don't send lifespan events get the janitor started by the first request instead
+    janitor.start()
+    path, method = scope["path"], scope["method"]
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+
+    if path == "/" and method in ("GET", "HEAD"):
+        await respond(send, 200, INDEX_HTML, "text/html; charset=utf-8")
+    elif path == "/metrics" and method in ("GET", "HEAD"):
+        await respond(send, 200, metrics.render(), "text/plain; version=0.0.4")
+    elif path == "/remix" and method == "POST":
+        start = time.monotonic()
+
+        async def timed_send(message):
+            # Covers everything up to the start of the response body, which is when processing is done
+            if message["type"] == "http.response.start":
+                metrics.observe_request(time.monotonic() - start, message["status"])
+            await send(message)
+
+        await remix_audio(receive, timed_send, headers)
+    elif path.startswith("/results/") and path.count("/") == 3 and method in ("GET", "HEAD"):
+        _, _, result_id, filename = path.split("/")
+        await download_result(send, method, headers, result_id, filename)
+    elif path in ("/", "/metrics", "/remix"):
+        await respond(send, 405, "Method Not Allowed")
+    else:
+        await respond(send, 404, "Not Found")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.environ.get("PORT", 8080))
+    uvicorn.run(app, host="0.0.0.0", port=port)
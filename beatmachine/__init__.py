@@ -1,2 +1,31 @@
-from . import backends, effects
-from .beats import Beats
+import importlib
+import typing as t
+
+if t.TYPE_CHECKING:
+    from . import backends, effects
+    from .analysis import Analysis
+    from .beats import Beats
+    from .chain import ChainPlan
+    from .plan import RenderPlan
+    from .preview import Preview
+
+# Attributes are imported on first use, so the CLI can talk to a running daemon without loading the audio stack.
+_exports = {
+    "backends": ".backends",
+    "effects": ".effects",
+    "Analysis": ".analysis",
+    "Beats": ".beats",
+    "ChainPlan": ".chain",
+    "RenderPlan": ".plan",
+    "Preview": ".preview",
+}
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = importlib.import_module(_exports[name], __name__)
+    value = module if module.__name__.endswith("." + name) else getattr(module, name)
+    globals()[name] = value
+    return value
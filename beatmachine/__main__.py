@@ -1,21 +1,28 @@
-import hashlib
+import concurrent.futures
+import cProfile
 import importlib.metadata
 import inspect
 import json
 import os
 import pickle
 import shutil
+import subprocess
 import tempfile
 import textwrap
+import tracemalloc
 from pathlib import Path
 from types import SimpleNamespace
 
 import click
+import numpy as np
 from jsonschema.exceptions import ValidationError
 
 import beatmachine as bm
-from beatmachine.backends.madmom import MadmomDbnBackend
 from beatmachine.effect_registry import EffectRegistry
+from beatmachine.effects.periodic import PeriodicEffect
+from beatmachine.instrumentation import Recorder, add_hook, remove_hook
+from beatmachine.references import beat_blocks
+from beatmachine.utils import file_digest
 
 try:
     _version = importlib.metadata.version("beatmachine")
@@ -28,10 +35,21 @@ def _hint(msg):
 
 
 def _load_beats_from_song(ctx, input):
+    from beatmachine.backends.madmom import MadmomDbnBackend
+
     backend = MadmomDbnBackend(min_bpm=ctx.obj.min_bpm, max_bpm=ctx.obj.max_bpm, model_count=4)
     return bm.Beats.from_song(input, backend)
 
 
+def _connect_daemon(ctx):
+    # Commands that don't need it leave the daemon module unimported, so starting them stays cheap.
+    from beatmachine.daemon_client import DaemonClient
+
+    if not ctx.obj.use_daemon:
+        return None
+    return DaemonClient.connect(ctx.obj.socket)
+
+
 def _get_cache_dir() -> Path:
     cache_dir = Path(tempfile.gettempdir()) / "beatmachine" / _version.split(".")[0]
     cache_dir.mkdir(parents=True, exist_ok=True)
@@ -39,14 +57,7 @@ def _get_cache_dir() -> Path:
 
 
 def _get_cache_file(song_file) -> Path:
-    cache_dir = _get_cache_dir()
-
-    md5 = hashlib.md5()
-    with open(song_file, "rb") as file:
-        while block := file.read(512):
-            md5.update(block)
-
-    return cache_dir / (md5.hexdigest())
+    return _get_cache_dir() / file_digest(song_file)
 
 
 class BeatsParam(click.Path):
@@ -65,6 +76,11 @@ class BeatsParam(click.Path):
                 beats = pickle.load(fp)
             return (beats, value)
 
+        # A running daemon analyses the song itself, so leave it to the command to send the job over.
+        ctx.obj.daemon = _connect_daemon(ctx)
+        if ctx.obj.daemon is not None:
+            return (None, value)
+
         cached = _get_cache_file(value)
         if ctx.obj.cache and cached.is_file():
             with cached.open("rb") as fp:
@@ -90,6 +106,9 @@ class BeatsParam(click.Path):
 class EffectsParam(click.ParamType):
     name = "effects"
 
+    def __init__(self, load=True):
+        self.load = load
+
     def convert(self, value, param, ctx):
         if not value:
             return None
@@ -107,7 +126,8 @@ class EffectsParam(click.ParamType):
             effects_obj = [effects_obj]
 
         try:
-            return EffectRegistry.load_effect_chain(effects_obj)
+            effects = EffectRegistry.load_effect_chain(effects_obj)
+            return effects if self.load else effects_obj
         except ValidationError as e:
             self.fail(
                 f"Effect contains an invalid value '{e.instance}'.\n"
@@ -120,8 +140,33 @@ class EffectsParam(click.ParamType):
 @click.option("-B", "--max-bpm", type=int, default=300, help="Maximum BPM.")
 @click.option("-y", "--skip-confirm", is_flag=True, help="If set, skip confirmation prompts.")
 @click.option("--no-cache", is_flag=True, help="If set, disables song caching.", envvar="BEATMACHINE_NO_CACHE")
+@click.option(
+    "--no-daemon", is_flag=True, help="If set, never send jobs to a running daemon.", envvar="BEATMACHINE_NO_DAEMON"
+)
+@click.option(
+    "--socket",
+    type=click.Path(dir_okay=False),
+    help="Socket used to talk to the daemon started by 'serve'.",
+    envvar="BEATMACHINE_SOCKET",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="If set, print how long each processing stage took. Jobs are then run here rather than by the daemon.",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(writable=True, dir_okay=False),
+    help="Write cProfile statistics for the main thread to this file. Implies --profile.",
+)
+@click.option(
+    "--trace-memory",
+    is_flag=True,
+    help="If set, trace allocations to report each stage's peak memory and the largest allocations. "
+    "Implies --profile.",
+)
 @click.pass_context
-def cli(ctx, min_bpm, max_bpm, skip_confirm, no_cache):
+def cli(ctx, min_bpm, max_bpm, skip_confirm, no_cache, no_daemon, socket, profile, profile_output, trace_memory):
     """
     Remix songs by rearranging and modifying beats.
 
@@ -129,15 +174,95 @@ def cli(ctx, min_bpm, max_bpm, skip_confirm, no_cache):
 
     View the repository at https://github.com/beat-machine/beat-machine.
     """
-    ctx.obj = SimpleNamespace(min_bpm=min_bpm, max_bpm=max_bpm, skip_confirm=skip_confirm, cache=not no_cache)
+    ctx.obj = SimpleNamespace(
+        min_bpm=min_bpm,
+        max_bpm=max_bpm,
+        skip_confirm=skip_confirm,
+        cache=not no_cache,
+        # Stages run by the daemon can't be timed from here, so profiled jobs are always run in this process.
+        use_daemon=not (no_daemon or profile or profile_output or trace_memory),
+        socket=socket,
+        daemon=None,
+    )
+
+    if profile or profile_output or trace_memory:
+        _start_profiling(ctx, profile_output, trace_memory)
+
+
+def _start_profiling(ctx, profile_output, trace_memory):
+    recorder = Recorder()
+    add_hook(recorder)
+    profiler = cProfile.Profile() if profile_output else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+
+    def report():
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_output)
+
+        snapshot = None
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        remove_hook(recorder)
+
+        click.echo(err=True)
+        if recorder.spans:
+            click.echo(recorder.format(), err=True)
+        else:
+            click.echo("No stages ran in this process.", err=True)
+
+        if snapshot is not None:
+            click.echo("\nTop allocations still held:", err=True)
+            for stat in snapshot.statistics("lineno")[:10]:
+                click.echo(f"  {stat}", err=True)
+
+        if profiler is not None:
+            click.echo(f"\nProfile written to {profile_output}", err=True)
+
+    ctx.call_on_close(report)
+
+
+def _send_to_daemon(ctx, client, command, **kwargs):
+    from beatmachine.daemon_client import DaemonError
+
+    # The daemon has its own working directory, so every path it's given must be absolute.
+    click.echo(f"Sending {command} job to daemon")
+    try:
+        client.request(command, min_bpm=ctx.obj.min_bpm, max_bpm=ctx.obj.max_bpm, cache=ctx.obj.cache, **kwargs)
+    except DaemonError as e:
+        raise click.ClickException(f"Daemon failed to run {command}: {e}")
 
 
 @cli.command()
-@click.option("-e", "--effects", required=True, type=EffectsParam())
-@click.option("-o", "--output", type=click.Path(writable=True, dir_okay=False))
+@click.option("-e", "--effects", required=True, type=EffectsParam(load=False))
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(writable=True, dir_okay=False),
+    multiple=True,
+    help="Output file. Repeat to encode several formats from a single render.",
+)
+@click.option(
+    "--encode-segments", type=click.IntRange(min=1), default=1, help="Encode MP3/AAC output in parallel segments."
+)
+@click.option(
+    "--effect-threads",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Process beats of periodic effects on this many threads.",
+)
+@click.option(
+    "--spill-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="Directory for effects that need the whole song to buffer it in, instead of memory.",
+)
 @click.argument("input", nargs=1, type=BeatsParam())
 @click.pass_context
-def apply(ctx, input, output, effects):
+def apply(ctx, input, output, effects, encode_segments, effect_threads, spill_dir):
     """
     Apply effects to a song or preprocessed `.beat` file.
 
@@ -146,24 +271,114 @@ def apply(ctx, input, output, effects):
     beats, filename = input
     stem, ext = os.path.splitext(filename)
 
-    if not output:
+    outputs = list(output)
+    if not outputs:
         if ext == ".beat":
             ext = ".mp3"
 
-        output = stem + "-out" + ext
-
-    if os.path.isfile(output) and not ctx.obj.skip_confirm:
-        click.confirm(f"Overwrite existing file at {output}", abort=True)
+        outputs = [stem + "-out" + ext]
+
+    for output in outputs:
+        if os.path.isfile(output) and not ctx.obj.skip_confirm:
+            click.confirm(f"Overwrite existing file at {output}", abort=True)
+
+    if beats is None:
+        _send_to_daemon(
+            ctx,
+            ctx.obj.daemon,
+            "apply",
+            input=os.path.abspath(filename),
+            effects=effects,
+            outputs=[os.path.abspath(o) for o in outputs],
+            segments=encode_segments,
+            effect_threads=effect_threads,
+            spill_dir=os.path.abspath(spill_dir) if spill_dir is not None else None,
+        )
+        print("Done!")
+        return
 
     click.echo("Applying effects")
-    beats = beats.apply_all(*effects)
+    effects = EffectRegistry.load_effect_chain(effects)
+
+    unbounded = bm.ChainPlan(effects).unbounded
+    if unbounded and spill_dir is None:
+        names = ", ".join(e.__effect_name__ for e in unbounded)
+        _hint(f"{names} hold the whole song in memory. Pass --spill-dir to buffer it on disk instead.")
 
-    click.echo(f"Writing audio file to {output}")
-    beats.save(output)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=effect_threads) as executor:
+        if effect_threads > 1:
+            effects = [e.with_executor(executor) if isinstance(e, PeriodicEffect) else e for e in effects]
+        beats = beats.apply_all(*effects, spill_dir=spill_dir, warn=False)
+
+        click.echo(f"Writing audio file to {', '.join(outputs)}")
+        if len(outputs) == 1:
+            beats.save(outputs[0], segments=encode_segments)
+        else:
+            beats.save_all(outputs)
 
     print("Done!")
 
 
+@cli.command()
+@click.option(
+    "-e",
+    "--effects",
+    type=EffectsParam(load=False),
+    help="Effects to apply to every song. Required unless SOURCE is a manifest.",
+)
+@click.option(
+    "-o",
+    "--output-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="Directory to write remixes to. Defaults to next to each song.",
+)
+@click.option("-f", "--format", "out_format", help="Output file extension, e.g. mp3. Defaults to each song's own.")
+@click.option("-j", "--jobs", type=click.IntRange(min=1), help="Number of worker processes. Defaults to one per CPU.")
+@click.argument("source", nargs=1)
+@click.pass_context
+def batch(ctx, source, effects, output_dir, out_format, jobs):
+    """
+    Apply effects to many songs in parallel.
+
+    SOURCE is a directory, a glob pattern, or a .json/.jsonl manifest of objects with "input", "effects" and
+    "output" keys. Songs are analysed in a pool of worker processes that each load the beat tracker once, and the
+    song cache is shared with 'apply'.
+    """
+    from beatmachine.batch import find_jobs, load_manifest, run_batch
+
+    if source.endswith((".json", ".jsonl")):
+        try:
+            batch_jobs = load_manifest(source)
+        except (OSError, ValueError) as e:
+            raise click.BadParameter(str(e), param_hint="SOURCE")
+    else:
+        if effects is None:
+            raise click.UsageError("Missing option '-e' / '--effects', which is required unless SOURCE is a manifest.")
+        ext = "." + out_format.lstrip(".") if out_format else None
+        batch_jobs = find_jobs(source, effects, output_dir, ext)
+
+    if not batch_jobs:
+        click.echo(f"No songs found in {source}", err=True)
+        ctx.exit(1)
+
+    click.echo(f"Processing {len(batch_jobs)} songs")
+    cache_dir = str(_get_cache_dir()) if ctx.obj.cache else None
+
+    failures = 0
+    for result in run_batch(batch_jobs, jobs, ctx.obj.min_bpm, ctx.obj.max_bpm, cache_dir):
+        analysis = "cached" if result.cached else f"{result.analysis_seconds:.1f}s"
+        timings = f"(analysis {analysis}, render {result.render_seconds:.1f}s)"
+        if result.error is None:
+            click.echo(f"ok      {result.job.input} -> {result.job.output} {timings}")
+        else:
+            failures += 1
+            click.secho(f"FAILED  {result.job.input}: {result.error}", fg="red", err=True)
+
+    click.echo(f"{len(batch_jobs) - failures} succeeded, {failures} failed")
+    if failures:
+        ctx.exit(1)
+
+
 @cli.command()
 @click.argument("input", nargs=1, type=click.Path(exists=True, dir_okay=False))
 @click.option("-o", "--output", type=click.Path(writable=True, dir_okay=False))
@@ -180,6 +395,15 @@ def preprocess(ctx, input, output):
     if not output:
         output = os.path.splitext(input)[0] + ".beat"
 
+    client = _connect_daemon(ctx)
+    if client is not None:
+        if os.path.isfile(output) and not ctx.obj.skip_confirm:
+            click.confirm(f"Overwrite existing file at {output}", abort=True)
+
+        _send_to_daemon(ctx, client, "preprocess", input=os.path.abspath(input), output=os.path.abspath(output))
+        print("Done!")
+        return
+
     click.echo(f"Processing {input}")
 
     beats = _load_beats_from_song(ctx, input)
@@ -260,6 +484,185 @@ def effect_info(json_schema, effect):
     _print_effect_human_readable(effect_cls)
 
 
+@cli.command()
+@click.option(
+    "-j", "--jobs", type=click.IntRange(min=1), help="Number of jobs to run at once. Defaults to one per CPU."
+)
+@click.pass_context
+def serve(ctx, jobs):
+    """
+    Run a daemon that keeps models and analysed songs loaded.
+
+    While it is running, 'apply' and 'preprocess' send their work to it instead of starting from scratch. Pass
+    --no-daemon to those commands to bypass it.
+    """
+    from beatmachine.daemon import Daemon, DaemonError
+
+    daemon = Daemon(ctx.obj.socket, str(_get_cache_dir()) if ctx.obj.cache else None, jobs)
+    click.echo(f"Listening on {daemon.socket_path}")
+    try:
+        daemon.serve_forever()
+    except DaemonError as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.option("-e", "--effects", required=True, type=EffectsParam())
+@click.option("-o", "--output", required=True, help="Output file or URL, or - for stdout.")
+@click.option("-f", "--format", "out_format", help="Output format passed to ffmpeg. Required when writing to stdout.")
+@click.option("-r", "--sample-rate", type=int, default=44100, help="Sample rate to process the stream at.")
+@click.option("-c", "--channels", type=int, default=2, help="Number of channels to process the stream at.")
+@click.option("--realtime", is_flag=True, help="Read input at its native rate, e.g. to simulate a live file.")
+@click.option(
+    "--windowed",
+    is_flag=True,
+    help="Track beats by re-running the offline tracker over a sliding window instead of tracking online.",
+)
+@click.argument("input", nargs=1)
+@click.pass_context
+def live(ctx, input, effects, output, out_format, sample_rate, channels, realtime, windowed):
+    """
+    Remix a live stream.
+
+    INPUT is anything ffmpeg can read, such as a file, a URL or - for stdin. Beats are tracked as audio arrives and
+    each one is written out as soon as the effects allow, so only windowed effects can be used.
+    """
+    from beatmachine.backends.madmom import MadmomDbnBackend
+    from beatmachine.live import (
+        MadmomOnlineTracker,
+        WindowedTracker,
+        read_pcm_blocks,
+        remix_stream,
+    )
+
+    unbounded = bm.ChainPlan(effects).unbounded
+    if unbounded:
+        names = ", ".join(e.__effect_name__ for e in unbounded)
+        raise click.UsageError(f"{names} need the whole song, so they can't be applied to a live stream.")
+
+    if windowed:
+        backend = MadmomDbnBackend(min_bpm=ctx.obj.min_bpm, max_bpm=ctx.obj.max_bpm, model_count=4)
+        tracker = WindowedTracker(backend, sample_rate, max_bpm=ctx.obj.max_bpm)
+    else:
+        tracker = MadmomOnlineTracker(sample_rate, ctx.obj.min_bpm, ctx.obj.max_bpm)
+
+    # fmt: off
+    decode = [
+        "ffmpeg", "-hide_banner", "-loglevel", "panic",
+        *(["-re"] if realtime else []),
+        "-i", "pipe:" if input == "-" else input,
+        "-f", "f64le", "-ac", str(channels), "-ar", str(sample_rate),
+        "pipe:",
+    ]
+    # fmt: on
+    encode = bm.Beats(sample_rate, channels, [])._create_ffmpeg_command(
+        "pipe:" if output == "-" else output, out_format, None
+    )
+
+    decoder = subprocess.Popen(decode, stdout=subprocess.PIPE, stdin=None if input == "-" else subprocess.DEVNULL)
+    encoder = subprocess.Popen(encode, stdin=subprocess.PIPE)
+    try:
+        beats = remix_stream(read_pcm_blocks(decoder.stdout, channels), channels, effects, tracker)
+        for beat in beats:
+            for block in beat_blocks(beat):
+                encoder.stdin.write(np.asarray(block, dtype=np.float64).tobytes())
+            encoder.stdin.flush()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        decoder.kill()
+        encoder.stdin.close()
+        encoder.wait()
+
+
+@cli.command()
+@click.option(
+    "-l", "--length", type=click.FloatRange(min=1), default=60, help="Length of the synthetic song in seconds."
+)
+@click.option("-c", "--channels", type=click.IntRange(min=1), default=2, help="Channels in the synthetic song.")
+@click.option("--bpm", type=click.FloatRange(min=1), default=120, help="Tempo of the synthetic song.")
+@click.option("-n", "--repeat", type=click.IntRange(min=1), default=3, help="Timed runs per benchmark.")
+@click.option("--fixed-tempo", is_flag=True, help="Analyse with a fixed-tempo backend instead of madmom.")
+@click.option("--examples", type=click.Path(exists=True, file_okay=False), help="Directory of effect chains.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False, writable=True), help="Write results as JSON.")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False), help="Compare with stored results.")
+@click.option("--tolerance", type=float, default=0.25, help="Allowed relative slowdown or memory growth.")
+@click.pass_context
+def bench(ctx, length, channels, bpm, repeat, fixed_tempo, examples, output, baseline, tolerance):
+    """
+    Benchmark analysis, effects and encoding on a synthetic song.
+
+    Exits with a non-zero status if any benchmark regressed against the baseline.
+    """
+    from beatmachine.backends.bpm import BpmBackend
+    from beatmachine.backends.madmom import MadmomDbnBackend
+    from beatmachine.bench import compare, dump_results, run_benchmarks
+
+    if fixed_tempo:
+        backend = BpmBackend(bpm, 0)
+    else:
+        backend = MadmomDbnBackend(min_bpm=ctx.obj.min_bpm, max_bpm=ctx.obj.max_bpm, model_count=4)
+
+    results = run_benchmarks(length, channels, bpm, backend, examples, repeat)
+    for result in results:
+        click.echo(f"{result.name:<40} {result.seconds * 1000:10.1f} ms {result.peak_bytes / 2**20:10.1f} MiB")
+
+    if output:
+        config = {"length": length, "channels": channels, "bpm": bpm, "fixed_tempo": fixed_tempo, "version": _version}
+        with open(output, "w") as fp:
+            json.dump(dump_results(results, config), fp, indent=2)
+
+    if baseline:
+        with open(baseline, "r") as fp:
+            regressions = compare(results, json.load(fp), tolerance)
+
+        for r in regressions:
+            click.secho(f"Regression in {r.name}: {r.metric} went from {r.baseline:.4g} to {r.current:.4g}", fg="red")
+
+        if regressions:
+            ctx.exit(1)
+
+        click.echo("No regressions")
+
+
+@cli.command()
+@click.option("-l", "--length", type=click.FloatRange(min=10), default=30, help="Length of each test track in seconds.")
+@click.option("--backend", "names", multiple=True, help="Backend to evaluate. Repeat for several. Defaults to all.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False, writable=True), help="Write results as JSON.")
+@click.pass_context
+def evaluate(ctx, length, names, output):
+    """
+    Compare beat tracking backends on synthetic tracks with known beats.
+
+    Reports F-measure, continuity (CMLt/AMLt), runtime and peak memory for every backend and track. Everything is
+    generated locally, so no datasets or network access are needed.
+    """
+    from beatmachine.evaluation import default_backends, default_material
+    from beatmachine.evaluation import evaluate as run_evaluation
+
+    backends = default_backends(ctx.obj.min_bpm, ctx.obj.max_bpm)
+    unknown = set(names) - set(backends)
+    if unknown:
+        raise click.BadParameter(f"Unknown backends {', '.join(sorted(unknown))}. Choose from {', '.join(backends)}.")
+    if names:
+        backends = {name: backends[name] for name in names}
+
+    results = []
+    click.echo(f"{'backend':<28} {'material':<20} {'F':>6} {'CMLt':>6} {'AMLt':>6} {'time':>9} {'memory':>10}")
+    for r in run_evaluation(backends, default_material(length)):
+        results.append(r)
+        click.echo(
+            f"{r.backend:<28} {r.material:<20} {r.f_measure:6.3f} {r.cmlt:6.3f} {r.amlt:6.3f} "
+            f"{r.seconds:8.2f}s {r.peak_bytes / 2**20:6.1f} MiB"
+        )
+
+    if output:
+        with open(output, "w") as fp:
+            json.dump([r._asdict() for r in results], fp, indent=2)
+
+
 @cli.command("clear-cache")
 def clear_cache():
     """
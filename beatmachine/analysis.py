@@ -0,0 +1,69 @@
+import typing as t
+
+import numpy as np
+
+from .backend import Backend
+from .features import compute_features
+
+
+class Analysis:
+    """
+    An Analysis records where the beats of a song are without holding on to its audio. Together with the source file,
+    it is enough to render any part of a remix later.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        sample_rate: int,
+        channels: int,
+        frames: int,
+        boundaries: np.ndarray,
+        features: np.ndarray = None,
+    ):
+        """
+        :param source: Path to the analysed song.
+        :param sample_rate: Sample rate of the decoded song.
+        :param channels: Number of channels in the decoded song.
+        :param frames: Number of samples per channel in the decoded song.
+        :param boundaries: Sample offsets where beats start, as returned by a backend.
+        :param features: Per-beat features as returned by :func:`beatmachine.features.compute_features`, if known.
+        """
+        self.source = source
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = frames
+        self.boundaries = np.asarray(boundaries, dtype=np.int64)
+        self.features = features
+
+    def __len__(self) -> int:
+        return len(self.boundaries) + 1
+
+    @property
+    def beat_ranges(self) -> np.ndarray:
+        """
+        :return: An array with shape (beats, 2) holding the first and one-past-last sample of each beat. Beats are
+                 split exactly like ``np.split(signal, boundaries)``.
+        """
+        edges = np.clip(self.boundaries, 0, self.frames)
+        starts = np.concatenate(([0], edges))
+        ends = np.maximum(np.concatenate((edges, [self.frames])), starts)
+        return np.stack((starts, ends), axis=1)
+
+    @staticmethod
+    def from_song(song: str, backend: Backend = None) -> "Analysis":
+        """
+        Decodes a song once, locates its beats and computes their features.
+
+        :param song: Path to the song to analyse.
+        :param backend: Backend used to locate beats. Defaults to madmom.
+        :return: A new Analysis.
+        """
+        from .beats import _default_backend, _load_audio
+
+        backend = backend or _default_backend()
+        signal, sample_rate = _load_audio(song)
+        channels = signal.shape[1] if signal.ndim > 1 else 1
+        boundaries = np.array(backend.locate_beats(signal, sample_rate)).astype(np.int64)
+        features = compute_features(signal, sample_rate, boundaries)
+        return Analysis(str(song), sample_rate, channels, signal.shape[0], boundaries, features)
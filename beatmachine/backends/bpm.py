@@ -9,5 +9,5 @@ class BpmBackend:
 
     def locate_beats(self, signal: np.ndarray, sample_rate: int) -> np.ndarray:
         samples_per_beat = int((60 * sample_rate) / self.bpm)
-        downbeat_sample = int(sample_rate * 1000 * self.first_beat_ms)
+        downbeat_sample = int(sample_rate * self.first_beat_ms / 1000)
         return np.arange(downbeat_sample, signal.shape[0], samples_per_beat)
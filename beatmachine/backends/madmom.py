@@ -4,8 +4,12 @@ import typing as t
 import numpy as np
 from madmom.audio import Signal
 from madmom.features.beats import DBNBeatTrackingProcessor, RNNBeatProcessor
+from madmom.models import BEATS_LSTM
 import os
 import site
+import threading
+
+from ..instrumentation import span
 
 # Look for models in the site-packages directory
 SITE_PACKAGES = site.getsitepackages()[0]
@@ -13,7 +17,7 @@ MADMOM_MODEL_PATH = os.path.join(SITE_PACKAGES, 'madmom', 'models')
 
 
 class MadmomDbnBackend:
-    def __init__(self, min_bpm: int = 55, max_bpm: int = 215, fps: int = 100, model_count: int = 1) -> None:
+    def __init__(self, min_bpm: int = 55, max_bpm: int = 215, fps: int = 100, model_count: int = len(BEATS_LSTM)) -> None:
         super().__init__()
         self.min_bpm = min_bpm
         self.max_bpm = max_bpm
@@ -21,11 +25,17 @@ class MadmomDbnBackend:
         self.model_count = model_count
         
         # Initialize processors
-        self.processor = RNNBeatProcessor(online=True, fps=self.fps)
+        # Each model in the ensemble costs a full RNN pass, so model_count is the main speed/accuracy knob
+        self.processor = RNNBeatProcessor(online=True, fps=self.fps, nn_files=BEATS_LSTM[: self.model_count])
         self.tracker = DBNBeatTrackingProcessor(min_bpm=self.min_bpm, max_bpm=self.max_bpm, fps=self.fps)
+        # The online processor keeps its recurrent state on itself and resets it on every call, so threads sharing
+        # this backend take turns running it
+        self._processor_lock = threading.Lock()
 
     def locate_beats(self, signal: np.ndarray, sample_rate: int) -> np.ndarray:
         madmom_signal = Signal(signal, sample_rate=sample_rate)
-        activations = self.processor(madmom_signal)
-        beats = self.tracker(activations)
+        with span("rnn"), self._processor_lock:
+            activations = self.processor(madmom_signal)
+        with span("dbn"):
+            beats = self.tracker(activations)
         return (beats * madmom_signal.sample_rate).astype(np.int64)
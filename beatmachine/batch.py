@@ -0,0 +1,171 @@
+import concurrent.futures
+import glob
+import json
+import os
+import pickle
+import tempfile
+import time
+import typing as t
+from pathlib import Path
+
+from .backends.madmom import MadmomDbnBackend
+from .beats import Beats
+from .effect_registry import EffectRegistry
+from .utils import file_digest
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a", ".aac")
+
+
+class BatchJob(t.NamedTuple):
+    input: str
+    effects: t.List[t.Dict[str, t.Any]]
+    output: str
+
+
+class BatchResult(t.NamedTuple):
+    job: BatchJob
+    error: t.Optional[str]
+    cached: bool
+    analysis_seconds: float
+    render_seconds: float
+
+
+def find_jobs(
+    source: str, effects: t.List[t.Dict[str, t.Any]], output_dir: str = None, out_ext: str = None
+) -> t.List[BatchJob]:
+    """
+    Builds batch jobs from a directory or glob of songs, all remixed with the same effects.
+
+    :param source: Directory to search recursively, or a glob pattern.
+    :param effects: Effect definitions applied to every song.
+    :param output_dir: Directory to write remixes to. Defaults to next to each song.
+    :param out_ext: Output extension, e.g. ".mp3". Defaults to the extension of each song.
+    :return: One job per song, in sorted order.
+    """
+    if os.path.isdir(source):
+        paths = [str(p) for p in Path(source).rglob("*") if p.suffix.lower() in AUDIO_EXTENSIONS]
+    else:
+        paths = [p for p in glob.glob(source, recursive=True) if os.path.isfile(p)]
+
+    jobs = []
+    for path in sorted(paths):
+        stem, ext = os.path.splitext(os.path.basename(path))
+        directory = output_dir if output_dir is not None else os.path.dirname(path)
+        jobs.append(BatchJob(path, effects, os.path.join(directory, stem + "-out" + (out_ext or ext))))
+
+    return jobs
+
+
+def load_manifest(path: str) -> t.List[BatchJob]:
+    """
+    Reads batch jobs from a manifest. A manifest is either a JSON list or a JSON lines file of objects with "input",
+    "effects" and "output" keys. Relative paths are resolved against the manifest's directory.
+
+    :param path: Path to a .json or .jsonl manifest.
+    :return: The jobs in the manifest, in order.
+    """
+    with open(path, "r") as fp:
+        if path.endswith(".jsonl"):
+            entries = [json.loads(line) for line in fp if line.strip()]
+        else:
+            entries = json.load(fp)
+
+    if not isinstance(entries, list):
+        raise ValueError(f"Manifest {path} should contain a list of jobs")
+
+    base = os.path.dirname(path)
+    jobs = []
+    for i, entry in enumerate(entries):
+        try:
+            effects = entry["effects"]
+            jobs.append(
+                BatchJob(
+                    os.path.join(base, entry["input"]),
+                    effects if isinstance(effects, list) else [effects],
+                    os.path.join(base, entry["output"]),
+                )
+            )
+        except (KeyError, TypeError):
+            raise ValueError(f"Job {i} in {path} should have 'input', 'effects' and 'output' keys")
+
+    return jobs
+
+
+# Backend owned by the current worker process, so its models are only loaded once per worker.
+_worker_backend = None
+_worker_cache_dir = None
+
+
+def _init_worker(min_bpm: int, max_bpm: int, cache_dir: t.Optional[str]):
+    global _worker_backend, _worker_cache_dir
+    _worker_backend = MadmomDbnBackend(min_bpm=min_bpm, max_bpm=max_bpm, model_count=4)
+    _worker_cache_dir = cache_dir
+
+
+def _load_beats(song: str, backend, cache_dir: t.Optional[str]) -> t.Tuple[Beats, bool]:
+    cached = Path(cache_dir) / file_digest(song) if cache_dir else None
+    if cached is not None and cached.is_file():
+        with cached.open("rb") as fp:
+            return pickle.load(fp), True
+
+    beats = Beats.from_song(song, backend)
+
+    if cached is not None:
+        # Other workers may be analysing the same song, so write somewhere private and move it into place.
+        fd, tmp = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, "wb") as fp:
+            pickle.dump(beats, fp)
+        os.replace(tmp, cached)
+
+    return beats, False
+
+
+def run_job(job: BatchJob) -> BatchResult:
+    """
+    Runs a single job in the current worker. Must be called after the worker has been initialized.
+
+    :param job: Job to run.
+    :return: The job's result. Failures are reported in the result rather than raised.
+    """
+    analysis_seconds = render_seconds = 0.0
+    cached = False
+    try:
+        start = time.perf_counter()
+        beats, cached = _load_beats(job.input, _worker_backend, _worker_cache_dir)
+        analysis_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        effects = EffectRegistry.load_effect_chain(job.effects)
+        os.makedirs(os.path.dirname(job.output) or ".", exist_ok=True)
+        beats.apply_all(*effects).save(job.output)
+        render_seconds = time.perf_counter() - start
+    except Exception as e:
+        return BatchResult(job, f"{type(e).__name__}: {e}", cached, analysis_seconds, render_seconds)
+
+    return BatchResult(job, None, cached, analysis_seconds, render_seconds)
+
+
+def run_batch(
+    jobs: t.Iterable[BatchJob],
+    workers: int = None,
+    min_bpm: int = 60,
+    max_bpm: int = 300,
+    cache_dir: str = None,
+) -> t.Generator[BatchResult, None, None]:
+    """
+    Runs jobs in a pool of processes. Each worker loads its beat tracking models once and reuses them for every job
+    it runs.
+
+    :param jobs: Jobs to run.
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :param min_bpm: Minimum BPM passed to the beat tracker.
+    :param max_bpm: Maximum BPM passed to the beat tracker.
+    :param cache_dir: Directory holding cached beats, or None to disable caching.
+    :return: A generator yielding results as jobs finish.
+    """
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(min_bpm, max_bpm, cache_dir)
+    ) as executor:
+        futures = [executor.submit(run_job, job) for job in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
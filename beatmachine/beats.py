@@ -1,24 +1,53 @@
+import concurrent.futures
+import contextlib
+import os
+import shutil
 import subprocess
+import tempfile
+import threading
 import typing as t
-from functools import reduce
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
-from madmom.audio import Signal
 
 from .backend import Backend
-from .backends.madmom import MadmomDbnBackend
+from .buffers import concatenate
+from .chain import ChainPlan
+from .codec import (
+    open_audio_writer,
+    pcm_blocks,
+    read_audio,
+    soundfile_format,
+    write_audio,
+)
 from .effect_registry import Effect
+from .features import FeatureIndex, compute_features
+from .instrumentation import span, timed_effects
+from .segmented import save_segmented, segmented_format
+from .shared import SharedBeats, SharedBeatsHandle, attach
 
-_DEFAULT_BACKEND = MadmomDbnBackend(model_count=4)  # TODO: 2 might be sufficient, test more
+
+class OutputTarget(t.NamedTuple):
+    """
+    One output of :meth:`Beats.save_all`.
+    """
+
+    fp: t.Union[str, t.BinaryIO]
+    out_format: str = None
+    extra_ffmpeg_args: t.List[str] = None
+
+
+@lru_cache(maxsize=None)
+def _default_backend() -> Backend:
+    # Built on first use, so importing beatmachine doesn't pay for loading models that may never be needed.
+    from .backends.madmom import MadmomDbnBackend
+
+    return MadmomDbnBackend(model_count=4)  # TODO: 2 might be sufficient, test more
 
 
-def _load_audio(path: Path) -> t.Tuple[int, np.array]:
-    # TODO: Revisit python-soundfile once it bundles a recent version of libsndfile on linux:
-    #       https://github.com/bastibe/python-soundfile/issues/353. (Most distros still have a libsndfile version
-    #       that doesn't support MP3. Users could always build from source but we don't want that to be a requirement.)
-    s = Signal(str(path), sample_rate=None, num_channels=None, dtype=np.float64)
-    return s, s.sample_rate
+def _load_audio(path: Path, start: float = None, stop: float = None) -> t.Tuple[np.ndarray, int]:
+    return read_audio(path, start, stop)
 
 
 class Beats:
@@ -29,11 +58,49 @@ class Beats:
     _sample_rate: int
     _channels: int
     _beats: t.List[np.ndarray]
+    _features: t.Optional[np.ndarray] = None
+    _feature_index: t.Optional[FeatureIndex] = None
 
-    def __init__(self, sample_rate: int, channels: int, beats: t.List[np.ndarray]):
+    def __init__(self, sample_rate: int, channels: int, beats: t.List[np.ndarray], features: np.ndarray = None):
         self._sample_rate = sample_rate
         self._channels = channels
         self._beats = beats
+        self._features = features
+
+    def __getstate__(self):
+        # The feature index is keyed by memory addresses, which mean nothing in another process.
+        state = self.__dict__.copy()
+        state.pop("_feature_index", None)
+        return state
+
+    @property
+    def features(self) -> FeatureIndex:
+        """
+        Per-beat features: start, duration, RMS level, peak level, spectral centroid and onset strength. Songs loaded
+        with :meth:`from_song` compute them during analysis and keep them when saved as a `.beat` file. Other Beats
+        objects compute them the first time they are asked for.
+
+        :return: An index of this object's beat features, in beat order.
+        """
+        if self._feature_index is None:
+            if not isinstance(self._beats, list):
+                self._beats = list(self._beats)
+
+            if self._features is None or len(self._features) != len(self._beats):
+                lengths = np.array([len(beat) for beat in self._beats], dtype=np.int64)
+                signal = self.to_ndarray() if self._beats else np.zeros((0, self._channels))
+                self._features = compute_features(signal, self._sample_rate, np.cumsum(lengths)[:-1])
+
+            self._feature_index = FeatureIndex(self._features, self._beats, self._sample_rate)
+
+        return self._feature_index
+
+    def _bind_features(self, effects: t.Iterable[Effect]) -> t.List[Effect]:
+        # Effects that look at how beats sound read this song's feature index instead of measuring each beat.
+        return [
+            effect.with_features(self.features) if getattr(effect, "reads_features", False) else effect
+            for effect in effects
+        ]
 
     def apply(self, effect: Effect) -> "Beats":
         """
@@ -42,22 +109,77 @@ class Beats:
         :param effect: Effect to apply.
         :return: A new Beats object with the given effect applied.
         """
+        (effect,) = timed_effects(self._bind_features([effect]))
         return Beats(self._sample_rate, self._channels, list(effect(self._beats)))
 
-    def apply_all(self, *effects_list: t.List[Effect]) -> "Beats":
+    def apply_all(self, *effects_list: t.List[Effect], spill_dir: str = None, warn: bool = True) -> "Beats":
         """
         Applies a list of effects and returns a new Beats object.
         This is the best way to apply multiple effects, since it only collects
         them into a list at the very end.
 
         :param effects_list: Effects to apply in order.
+        :param spill_dir: If set, effects that need the whole song read their input from a temporary file in this
+                          directory instead of memory. See :class:`ChainPlan`.
+        :param warn: If set, emits an :class:`UnboundedEffectWarning` when effects will hold the whole song in memory
+                     because no ``spill_dir`` was given.
         :return: A new Beats object with the given effects applied.
         """
-        return Beats(
-            self._sample_rate,
-            self._channels,
-            reduce(lambda beats, effect: effect(beats), effects_list, self._beats),
-        )
+        plan = ChainPlan(timed_effects(self._bind_features(effects_list)))
+        return Beats(self._sample_rate, self._channels, plan.run(self._beats, spill_dir, warn=warn))
+
+    def apply_variants(
+        self, chains: t.Iterable[t.Sequence[Effect]], executor: concurrent.futures.Executor = None
+    ) -> t.List["Beats"]:
+        """
+        Applies several effect chains to this song and returns one new Beats object per chain. Chains that start with
+        the same effects share that prefix: it is computed once and its output is reused by every chain built on it.
+        Beats produced by the built-in effects are mostly views into the source audio, so a shared prefix costs little
+        more than a list of references.
+
+        :param chains: Effect chains to apply. Each chain is a sequence of effects applied in order.
+        :param executor: If given, chains that branch from the same prefix are computed concurrently on it.
+        :return: A list of new Beats objects in the same order as ``chains``. Each can be iterated more than once.
+        """
+        # Build a prefix tree where node i applies effects[i] to the output of parents[i] (None being the source).
+        effects, parents, depths, leaves = [], [], [], []
+        children = {}
+        for chain in chains:
+            node = None
+            for effect in self._bind_features(chain):
+                shareable = getattr(effect, "__effect_deterministic__", False)
+                match = next(
+                    (c for c in children.get(node, []) if shareable and effects[c] == effect),
+                    None,
+                )
+
+                if match is None:
+                    match = len(effects)
+                    effects.append(effect)
+                    parents.append(node)
+                    depths.append(0 if node is None else depths[node] + 1)
+                    children.setdefault(node, []).append(match)
+
+                node = match
+            leaves.append(node)
+
+        # Wrapping comes after matching, since timed wrappers don't compare equal to the effects they time.
+        effects = timed_effects(effects)
+        if not isinstance(self._beats, list):
+            self._beats = list(self._beats)
+
+        outputs = {None: self._beats}
+
+        def run(i):
+            return list(effects[i](outputs[parents[i]]))
+
+        # Nodes at the same depth only depend on shallower nodes, so each level can be computed at once.
+        for depth in range(max(depths, default=-1) + 1):
+            level = [i for i, d in enumerate(depths) if d == depth]
+            results = executor.map(run, level) if executor else map(run, level)
+            outputs.update(zip(level, results))
+
+        return [Beats(self._sample_rate, self._channels, outputs[leaf]) for leaf in leaves]
 
     def to_ndarray(self) -> np.ndarray:
         """
@@ -65,14 +187,17 @@ class Beats:
 
         :return: An ndarray with shape (samples, channels).
         """
-        return np.concatenate(list(self._beats), axis=0)
+        return concatenate(list(self._beats))
 
     def _create_ffmpeg_command(self, dst: str, out_format: str = None, extra_args: t.List[str] = None):
+        return self._create_multi_output_ffmpeg_command([(dst, out_format, extra_args)])
+
+    def _create_multi_output_ffmpeg_command(self, outputs: t.List[t.Tuple[str, str, t.List[str]]]):
         cmd = [
             # fmt: off
             "ffmpeg",
             "-hide_banner",
-            "-loglevel", "panic",
+            "-loglevel", "error",
             "-y",
             "-f", "f64le",
             "-ar", str(self._sample_rate),
@@ -81,21 +206,28 @@ class Beats:
             # fmt: on
         ]
 
-        if out_format is not None:
-            cmd.extend(["-f", out_format])
+        for dst, out_format, extra_args in outputs:
+            if out_format is not None:
+                cmd.extend(["-f", out_format])
+
+            if extra_args is not None:
+                cmd.extend(extra_args)
 
-        if extra_args is not None:
-            cmd.extend(extra_args)
+            cmd.append(dst)
 
-        cmd.append(dst)
         return cmd
 
+    def _write_pcm(self, stream: t.BinaryIO):
+        # Beats are written one block at a time, so repeated beats are only expanded as they reach the encoder.
+        for block in pcm_blocks(self._beats, self._channels):
+            stream.write(block)
+
     def _save_to_file(self, filename: str, out_format: str = None, extra_ffmpeg_args: t.List[str] = None):
         p = subprocess.Popen(
             self._create_ffmpeg_command(filename, out_format, extra_ffmpeg_args),
             stdin=subprocess.PIPE,
         )
-        p.communicate(input=self.to_ndarray().tobytes())
+        self._write_pcm(p.stdin)
         p.stdin.close()
         p.wait()
 
@@ -109,17 +241,145 @@ class Beats:
             stdout=subprocess.PIPE,
         )
 
-        stdout, _ = p.communicate(input=self.to_ndarray().tobytes())
+        copier = threading.Thread(target=shutil.copyfileobj, args=(p.stdout, fp))
+        copier.start()
+        self._write_pcm(p.stdin)
         p.stdin.close()
+        copier.join()
+        p.stdout.close()
         p.wait()
 
-        return fp.write(stdout)
+    def save(self, fp, out_format=None, extra_ffmpeg_args: t.List[str] = None, segments: int = 1):
+        """
+        Encodes this Beats object. WAV, FLAC, OGG and (where libsndfile supports it) MP3 are written in-process;
+        other formats, and any save with extra ffmpeg arguments, go through ffmpeg.
+
+        :param fp: Filename or binary file-like object to write to.
+        :param out_format: Output format name. Required when writing to a file-like object.
+        :param extra_ffmpeg_args: Additional arguments passed to ffmpeg.
+        :param segments: If greater than 1, MP3 and AAC output is encoded in this many segments in parallel. Other
+                         formats ignore this.
+        """
+        with span("save"):
+            muxer = segmented_format(fp, out_format) if segments > 1 else None
+            if muxer is not None:
+                return save_segmented(self, fp, muxer, segments, extra_ffmpeg_args)
+
+            sf_format = None if extra_ffmpeg_args else soundfile_format(fp, out_format)
+            if sf_format is not None:
+                return write_audio(fp, self._beats, self._sample_rate, self._channels, sf_format)
+
+            if isinstance(fp, str):
+                return self._save_to_file(fp, out_format, extra_ffmpeg_args)
+            else:
+                return self._save_to_binary_io(fp, out_format, extra_ffmpeg_args)
+
+    def save_all(self, targets: t.Iterable[t.Union[str, OutputTarget]]):
+        """
+        Encodes this Beats object to several outputs at once. The effect chain runs once and every beat is handed to
+        all encoders as it is produced: libsndfile outputs are written in-process and everything else goes to a single
+        ffmpeg process with one output per target.
+
+        :param targets: Filenames or OutputTargets. File-like targets require an out_format.
+        """
+        targets = [OutputTarget(target) if isinstance(target, str) else OutputTarget(*target) for target in targets]
+
+        with span("save"), contextlib.ExitStack() as stack:
+            writers = []
+            ffmpeg_outputs = []
+            pass_fds = []
+            copiers = []
+
+            p = None
+            try:
+                for target in targets:
+                    sf_format = None if target.extra_ffmpeg_args else soundfile_format(target.fp, target.out_format)
+                    if sf_format is not None:
+                        writers.append(
+                            stack.enter_context(
+                                open_audio_writer(target.fp, self._sample_rate, self._channels, sf_format)
+                            )
+                        )
+                    elif isinstance(target.fp, str):
+                        ffmpeg_outputs.append((target.fp, target.out_format, target.extra_ffmpeg_args))
+                    else:
+                        if not target.out_format:
+                            raise ValueError("out_format is required when writing to file-like object")
+
+                        # Each file-like target gets its own pipe, drained by a thread so ffmpeg never blocks on it
+                        read_fd, write_fd = os.pipe()
+                        reader = stack.enter_context(os.fdopen(read_fd, "rb"))
+                        copiers.append(threading.Thread(target=shutil.copyfileobj, args=(reader, target.fp)))
+                        pass_fds.append(write_fd)
+                        ffmpeg_outputs.append((f"pipe:{write_fd}", target.out_format, target.extra_ffmpeg_args))
+
+                if ffmpeg_outputs:
+                    # Errors go to a file rather than a pipe, which ffmpeg could fill and block on
+                    stderr = stack.enter_context(tempfile.TemporaryFile())
+                    p = subprocess.Popen(
+                        self._create_multi_output_ffmpeg_command(ffmpeg_outputs),
+                        stdin=subprocess.PIPE,
+                        stderr=stderr,
+                        pass_fds=pass_fds,
+                    )
+            finally:
+                # ffmpeg holds its own copies of the write ends, and the readers only see EOF once ours are closed too.
+                for fd in pass_fds:
+                    os.close(fd)
+
+            for copier in copiers:
+                copier.start()
+
+            stopped_reading = None
+            try:
+                for block in pcm_blocks(self._beats, self._channels):
+                    for writer in writers:
+                        writer.write(block)
+                    if p is not None:
+                        p.stdin.write(block)
+            except BrokenPipeError as e:
+                if p is None:
+                    raise
+                # ffmpeg stopped reading, either because it failed or because its arguments told it to stop early.
+                # Its exit status tells which.
+                stopped_reading = e
+            except BaseException:
+                # Closing stdin would make ffmpeg finish a truncated output, so stop it outright
+                if p is not None:
+                    p.kill()
+                raise
+            finally:
+                if p is not None:
+                    with contextlib.suppress(BrokenPipeError):
+                        p.stdin.close()
+                    returncode = p.wait()
+                for copier in copiers:
+                    copier.join()
+
+            if p is not None and returncode != 0:
+                stderr.seek(0)
+                raise subprocess.CalledProcessError(returncode, p.args, stderr=stderr.read()) from stopped_reading
+
+    def share(self) -> SharedBeats:
+        """
+        Copies this Beats object into shared memory once, so other processes can use it without pickling any audio.
+        Send the result's ``handle`` to them and rebuild the beats there with :meth:`from_shared`.
+
+        :return: The published beats. Close it, or use it as a context manager, once every consumer has attached.
+        """
+        return SharedBeats(self._sample_rate, self._channels, self._beats)
+
+    @staticmethod
+    def from_shared(handle: SharedBeatsHandle) -> "Beats":
+        """
+        Attaches to beats published by :meth:`share`, possibly in another process.
 
-    def save(self, fp, out_format=None, extra_ffmpeg_args: t.List[str] = None):
-        if isinstance(fp, str):
-            return self._save_to_file(fp, out_format, extra_ffmpeg_args)
-        else:
-            return self._save_to_binary_io(fp, out_format, extra_ffmpeg_args)
+        :param handle: Handle of the published beats.
+        :return: A new Beats object whose beats are read-only views of the shared memory.
+        """
+        audio, boundaries = attach(handle)
+        beats = np.split(audio, boundaries) if handle.beat_count else []
+        return Beats(handle.sample_rate, handle.channels, beats)
 
     @property
     def sample_rate(self):
@@ -136,15 +396,44 @@ class Beats:
         return self._channels
 
     @staticmethod
-    def from_song(fp: t.Union[str, t.BinaryIO], backend: Backend = None) -> "Beats":
-        backend = backend or _DEFAULT_BACKEND
+    def from_song(
+        fp: t.Union[str, t.BinaryIO], backend: Backend = None, *, start: float = None, stop: float = None
+    ) -> "Beats":
+        """
+        Loads a song and splits it into beats.
+
+        :param fp: Song to load.
+        :param backend: Backend used to locate beats. Defaults to madmom.
+        :param start: If set, position in seconds to start decoding from.
+        :param stop: If set, position in seconds to stop decoding at. Use this to analyse only part of a song.
+        :return: A new Beats object.
+        """
+        with span("from_song"):
+            with span("decode"):
+                signal, sample_rate = _load_audio(fp, start, stop)
+
+            return Beats.from_signal(signal, sample_rate, backend)
+
+    @staticmethod
+    def from_signal(signal: np.ndarray, sample_rate: int, backend: Backend = None) -> "Beats":
+        """
+        Splits already decoded audio into beats.
 
-        signal, sample_rate = _load_audio(fp)
+        :param signal: Audio with shape (samples, channels).
+        :param sample_rate: Sample rate of the audio.
+        :param backend: Backend used to locate beats. Defaults to madmom.
+        :return: A new Beats object.
+        """
+        backend = backend or _default_backend()
 
         channels = 1
-        if len(signal.shape) >= 1:
+        if len(signal.shape) > 1:
             channels = signal.shape[1]
 
-        beat_locations = np.array(backend.locate_beats(signal, sample_rate)).astype(np.int64)
+        with span("analysis"):
+            beat_locations = np.array(backend.locate_beats(signal, sample_rate)).astype(np.int64)
+
+        with span("features"):
+            features = compute_features(signal, sample_rate, beat_locations)
 
-        return Beats(sample_rate, channels, np.split(signal, beat_locations))
+        return Beats(sample_rate, channels, np.split(signal, beat_locations), features)
@@ -0,0 +1,175 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import typing as t
+from pathlib import Path
+
+import numpy as np
+import soundfile
+
+from .backend import Backend
+from .beats import Beats
+from .effect_registry import EffectRegistry
+
+# Example effect chains shipped alongside the package in a source checkout.
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+# Changes smaller than this are within measurement noise, no matter how large they are relative to the baseline.
+_NOISE_FLOOR = {"seconds": 0.005, "peak_bytes": 1 << 20}
+
+
+class BenchResult(t.NamedTuple):
+    name: str
+    seconds: float
+    peak_bytes: int
+
+
+class Regression(t.NamedTuple):
+    name: str
+    metric: str
+    baseline: float
+    current: float
+
+
+def synthesize_song(
+    path: str, seconds: float = 60.0, sample_rate: int = 44100, channels: int = 2, bpm: float = 120.0
+) -> np.ndarray:
+    """
+    Writes a WAV file of decaying clicks over quiet noise, with one click on every beat.
+
+    :param path: File to write.
+    :param seconds: Length of the song.
+    :param sample_rate: Sample rate of the song.
+    :param channels: Number of channels.
+    :param bpm: Tempo of the clicks.
+    :return: Sample offsets of the beats.
+    """
+    rng = np.random.default_rng(0)
+    frames = int(seconds * sample_rate)
+    signal = 0.05 * rng.standard_normal(frames)
+
+    beats = np.arange(0, frames, 60 * sample_rate / bpm).astype(np.int64)
+    click = np.sin(2 * np.pi * 1000 * np.arange(2048) / sample_rate) * np.exp(-np.arange(2048) / 256)
+    for beat in beats:
+        end = min(frames, beat + len(click))
+        signal[beat:end] += click[: end - beat]
+
+    soundfile.write(path, np.repeat(signal[:, None] * 0.5, channels, axis=1), sample_rate, subtype="PCM_16")
+    return beats
+
+
+def measure(fn: t.Callable[[], t.Any], repeat: int = 3) -> t.Tuple[float, int]:
+    """
+    :param fn: Function to measure.
+    :param repeat: Number of timed runs.
+    :return: The fastest of ``repeat`` runs in seconds, and the peak memory allocated during one more run. Memory is
+             measured separately because tracing allocations slows everything down.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return best, peak
+
+
+def _default_effect(name: str) -> t.Dict[str, t.Any]:
+    schema = EffectRegistry.schemas.get(name) or {}
+    return {"type": name, **{param: spec["default"] for param, spec in schema.items() if "default" in spec}}
+
+
+def run_benchmarks(
+    seconds: float = 60.0,
+    channels: int = 2,
+    bpm: float = 120.0,
+    backend: Backend = None,
+    examples_dir: str = None,
+    repeat: int = 3,
+) -> t.List[BenchResult]:
+    """
+    Benchmarks analysis, every registered effect, the example effect chains, consolidation and encoding on a
+    synthetic song.
+
+    :param seconds: Length of the synthetic song.
+    :param channels: Number of channels in the synthetic song.
+    :param bpm: Tempo of the synthetic song.
+    :param backend: Backend to benchmark analysis with. Defaults to madmom.
+    :param examples_dir: Directory of example effect chains. Defaults to the examples in a source checkout, if any.
+    :param repeat: Number of timed runs per benchmark.
+    :return: One result per benchmark.
+    """
+    examples = Path(examples_dir) if examples_dir is not None else EXAMPLES_DIR
+    results = []
+
+    def bench(name, fn):
+        results.append(BenchResult(name, *measure(fn, repeat)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        song = os.path.join(tmp, "song.wav")
+        synthesize_song(song, seconds, channels=channels, bpm=bpm)
+
+        bench("analysis", lambda: Beats.from_song(song, backend))
+        beats = Beats.from_song(song, backend)
+
+        for name in sorted(EffectRegistry.effects):
+            (effect,) = EffectRegistry.load_effect_chain([_default_effect(name)])
+            bench(f"effect/{name}", lambda: list(effect(beats._beats)))
+
+        for path in sorted(examples.glob("*.json")) if examples.is_dir() else []:
+            with open(path, "r") as fp:
+                chain = EffectRegistry.load_effect_chain(json.load(fp))
+            bench(f"chain/{path.stem}", lambda: beats.apply_all(*chain, warn=False).to_ndarray())
+
+        bench("to_ndarray", beats.to_ndarray)
+        bench("save/wav", lambda: beats.save(os.path.join(tmp, "out.wav")))
+        bench("save/mp3", lambda: beats.save(os.path.join(tmp, "out.mp3")))
+
+    return results
+
+
+def dump_results(results: t.Iterable[BenchResult], config: t.Dict[str, t.Any] = None) -> t.Dict[str, t.Any]:
+    """
+    :param results: Results to dump.
+    :param config: Settings the results were produced with.
+    :return: A JSON-serializable representation of the results.
+    """
+    return {
+        "config": config or {},
+        "results": {r.name: {"seconds": r.seconds, "peak_bytes": r.peak_bytes} for r in results},
+    }
+
+
+def compare(
+    results: t.Iterable[BenchResult], baseline: t.Dict[str, t.Any], tolerance: float = 0.25
+) -> t.List[Regression]:
+    """
+    Finds benchmarks that got slower or used more memory than a stored baseline.
+
+    :param results: Current results.
+    :param baseline: Baseline as returned by :func:`dump_results`.
+    :param tolerance: Allowed relative increase before a change counts as a regression.
+    :return: Every regression found. Benchmarks missing from the baseline are skipped, and so are changes within
+             measurement noise.
+    """
+    regressions = []
+    for result in results:
+        previous = baseline.get("results", {}).get(result.name)
+        if previous is None:
+            continue
+
+        for metric in ("seconds", "peak_bytes"):
+            before, after = previous[metric], getattr(result, metric)
+            if after > before * (1 + tolerance) and after - before > _NOISE_FLOOR[metric]:
+                regressions.append(Regression(result.name, metric, before, after))
+
+    return regressions
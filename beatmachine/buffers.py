@@ -0,0 +1,207 @@
+import contextlib
+import contextvars
+import threading
+import typing as t
+
+import numpy as np
+
+# Arrays smaller than this come straight from the allocator. Pooling only pays off for arrays large enough to be
+# mapped and unmapped by malloc on every allocation, which starts at 128 KiB by default.
+MIN_POOLED_BYTES = 256 * 1024
+
+# Each doubling of size is split into this many classes, so a borrowed block wastes at most a quarter of its size.
+_CLASSES_PER_DOUBLING = 4
+
+
+def size_class(nbytes: int) -> int:
+    """
+    :param nbytes: Number of bytes needed.
+    :return: The size of the smallest pooled block that can hold them.
+    """
+    if nbytes <= MIN_POOLED_BYTES:
+        return MIN_POOLED_BYTES
+
+    exponent = (nbytes - 1).bit_length() - 1
+    step = (1 << exponent) // _CLASSES_PER_DOUBLING
+    return -(-nbytes // step) * step
+
+
+class BufferPool:
+    """
+    A BufferPool keeps large blocks of memory around after use, sorted into size classes, and hands them out again
+    instead of allocating new ones. Long-running workers that decode and render songs of similar sizes over and over
+    then reuse the same few blocks, rather than fragmenting the heap with short-lived arrays hundreds of megabytes in
+    size.
+    """
+
+    def __init__(self, max_idle_bytes: int = 512 * 1024 * 1024):
+        """
+        :param max_idle_bytes: Most memory to hold on to while it isn't borrowed. Blocks given back beyond this are
+                               freed.
+        """
+        if max_idle_bytes < 0:
+            raise ValueError(f"max_idle_bytes must be >= 0, but was {max_idle_bytes}")
+
+        self.max_idle_bytes = max_idle_bytes
+        self.hits = 0
+        self.misses = 0
+        self._idle: t.Dict[int, t.List[np.ndarray]] = {}
+        self._idle_bytes = 0
+        self._borrowed: t.Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def idle_bytes(self) -> int:
+        """
+        :return: Memory held by the pool and not currently borrowed.
+        """
+        return self._idle_bytes
+
+    @property
+    def borrowed_bytes(self) -> int:
+        """
+        :return: Memory currently borrowed from the pool.
+        """
+        with self._lock:
+            return sum(block.nbytes for block in self._borrowed.values())
+
+    def take(self, shape: t.Tuple[int, ...], dtype=np.float64) -> np.ndarray:
+        """
+        Borrows an uninitialized array. Give it back with :meth:`give` once nothing refers to it any more.
+
+        :param shape: Shape of the array.
+        :param dtype: Data type of the array.
+        :return: A C-contiguous array viewing a pooled block.
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        size = size_class(nbytes)
+
+        with self._lock:
+            blocks = self._idle.get(size)
+            if blocks:
+                block = blocks.pop()
+                self._idle_bytes -= size
+                self.hits += 1
+            else:
+                block = None
+                self.misses += 1
+
+        if block is None:
+            block = np.empty(size, dtype=np.uint8)
+
+        with self._lock:
+            self._borrowed[id(block)] = block
+
+        return block[:nbytes].view(dtype).reshape(shape)
+
+    def give(self, array: np.ndarray):
+        """
+        Returns an array borrowed with :meth:`take`. Arrays that didn't come from this pool are ignored.
+
+        :param array: The borrowed array, or any view of it.
+        """
+        block = array.base if array.base is not None else array
+        with self._lock:
+            if self._borrowed.pop(id(block), None) is None:
+                return
+
+            if self._idle_bytes + block.nbytes <= self.max_idle_bytes:
+                self._idle.setdefault(block.nbytes, []).append(block)
+                self._idle_bytes += block.nbytes
+
+    def clear(self):
+        """
+        Frees every idle block.
+        """
+        with self._lock:
+            self._idle.clear()
+            self._idle_bytes = 0
+
+    @contextlib.contextmanager
+    def borrow(self, shape: t.Tuple[int, ...], dtype=np.float64) -> t.Iterator[np.ndarray]:
+        """
+        Borrows an array for the duration of a block.
+
+        :param shape: Shape of the array.
+        :param dtype: Data type of the array.
+        """
+        array = self.take(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.give(array)
+
+    @contextlib.contextmanager
+    def lease(self) -> t.Iterator[None]:
+        """
+        Makes this pool the source of every large array that :func:`empty` allocates in the current context, i.e.
+        decoded songs and rendered audio, and gives them all back at the end of the block. Nothing allocated within
+        the block may be used after it ends.
+        """
+        borrowed = []
+        token = _lease.set((self, borrowed))
+        try:
+            yield
+        finally:
+            _lease.reset(token)
+            for array in borrowed:
+                self.give(array)
+
+
+_lease: contextvars.ContextVar[t.Optional[t.Tuple[BufferPool, t.List[np.ndarray]]]] = contextvars.ContextVar(
+    "beatmachine_buffer_lease", default=None
+)
+
+
+def empty(shape: t.Tuple[int, ...], dtype=np.float64) -> np.ndarray:
+    """
+    Allocates an uninitialized array, borrowing it from the pool leased in the current context if there is one and
+    the array is large enough to be worth pooling.
+
+    :param shape: Shape of the array.
+    :param dtype: Data type of the array.
+    :return: A C-contiguous array.
+    """
+    lease = _lease.get()
+    if lease is None or int(np.prod(shape)) * np.dtype(dtype).itemsize < MIN_POOLED_BYTES:
+        return np.empty(shape, dtype=dtype)
+
+    pool, borrowed = lease
+    array = pool.take(shape, dtype)
+    borrowed.append(array)
+    return array
+
+
+@contextlib.contextmanager
+def scratch(shape: t.Tuple[int, ...], dtype=np.float64) -> t.Iterator[np.ndarray]:
+    """
+    Allocates a temporary array for the duration of a block, borrowing it from the leased pool if there is one.
+
+    :param shape: Shape of the array.
+    :param dtype: Data type of the array.
+    """
+    lease = _lease.get()
+    if lease is None or int(np.prod(shape)) * np.dtype(dtype).itemsize < MIN_POOLED_BYTES:
+        yield np.empty(shape, dtype=dtype)
+        return
+
+    with lease[0].borrow(shape, dtype) as array:
+        yield array
+
+
+def concatenate(arrays: t.Sequence, dtype=None) -> np.ndarray:
+    """
+    Joins arrays along their first axis into an array from :func:`empty`.
+
+    :param arrays: Arrays or array-likes with a ``shape`` and ``dtype``, all with the same trailing dimensions.
+    :param dtype: Data type of the result. Defaults to the common type of the inputs.
+    :return: The joined array.
+    """
+    if not arrays:
+        return np.concatenate(arrays, axis=0)
+
+    if dtype is None:
+        dtype = np.result_type(*(a.dtype for a in arrays))
+    out = empty((sum(a.shape[0] for a in arrays),) + tuple(arrays[0].shape[1:]), dtype)
+    return np.concatenate(arrays, axis=0, out=out)
@@ -0,0 +1,114 @@
+import tempfile
+import typing as t
+import warnings
+from functools import reduce
+
+import numpy as np
+
+from .effect_registry import Effect
+
+# Spilled beats start on multiples of this many bytes, so views of them are aligned for any dtype.
+_SPILL_ALIGNMENT = 16
+
+
+class UnboundedEffectWarning(ResourceWarning):
+    """
+    Emitted when an effect chain has to hold the whole song in memory.
+    """
+
+
+def effect_lookahead(effect: Effect) -> t.Optional[int]:
+    """
+    :param effect: Any effect.
+    :return: The effect's declared look-ahead. Effects that don't declare one are assumed to need the whole song.
+    """
+    return getattr(effect, "lookahead", None)
+
+
+def _spill(beats: t.Iterable[np.ndarray], spill_dir: str = None) -> t.List[np.ndarray]:
+    """
+    Writes beats to an anonymous temporary file and maps it back into memory, so an effect that needs every beat at
+    once holds references into the page cache instead of the audio itself.
+
+    :param beats: Beats to spill.
+    :param spill_dir: Directory to create the temporary file in. Defaults to the system temporary directory.
+    :return: Read-only views of the spilled beats, in order.
+    """
+    layout = []
+    with tempfile.TemporaryFile(dir=spill_dir) as fp:
+        offset = 0
+        for beat in beats:
+            beat = np.ascontiguousarray(beat)
+            fp.seek(offset)
+            fp.write(beat.tobytes())
+            layout.append((offset, beat.dtype, beat.shape))
+            offset += -(-beat.nbytes // _SPILL_ALIGNMENT) * _SPILL_ALIGNMENT
+
+        if offset == 0:
+            return [np.zeros(shape, dtype) for _, dtype, shape in layout]
+
+        fp.truncate(offset)
+        raw = np.memmap(fp, dtype=np.uint8, mode="r", shape=(offset,))
+
+    return [
+        raw[start : start + int(np.prod(shape)) * dtype.itemsize].view(dtype).reshape(shape)
+        for start, dtype, shape in layout
+    ]
+
+
+class ChainPlan:
+    """
+    A ChainPlan works out how much an effect chain buffers before running it. Each effect declares how many beats it
+    reads ahead through :attr:`LoadableEffect.lookahead`. If every effect in the chain is windowed, the chain never
+    holds more than the sum of their windows, no matter how long the song is. Effects that need the whole song can have
+    their input spilled to disk first.
+    """
+
+    def __init__(self, effects: t.Iterable[Effect]):
+        """
+        :param effects: Effects to apply in order.
+        """
+        self.effects = list(effects)
+        self.lookaheads = [effect_lookahead(effect) for effect in self.effects]
+
+    @property
+    def lookahead(self) -> t.Optional[int]:
+        """
+        :return: The most beats the chain holds at once, or None if some effect needs the whole song.
+        """
+        return None if self.unbounded else sum(self.lookaheads)
+
+    @property
+    def unbounded(self) -> t.List[Effect]:
+        """
+        :return: Effects in this chain that need the whole song.
+        """
+        return [effect for effect, lookahead in zip(self.effects, self.lookaheads) if lookahead is None]
+
+    def run(
+        self, beats: t.Iterable[np.ndarray], spill_dir: str = None, spill: bool = False, warn: bool = True
+    ) -> t.Iterable[np.ndarray]:
+        """
+        Applies the chain lazily.
+
+        :param beats: Beats to process.
+        :param spill_dir: Directory to spill beats to. Implies ``spill``.
+        :param spill: If set, the input of every effect that needs the whole song is spilled to disk first.
+        :param warn: If set, emits an :class:`UnboundedEffectWarning` when the chain will hold the whole song in
+                     memory.
+        :return: An iterable of processed beats.
+        """
+        spill = spill or spill_dir is not None
+        if warn and not spill and self.unbounded:
+            names = ", ".join(getattr(e, "__effect_name__", type(e).__name__) for e in self.unbounded)
+            message = f"Effects {names} hold the whole song in memory. Pass spill_dir to buffer it on disk."
+            warnings.warn(message, UnboundedEffectWarning, stacklevel=2)
+
+        def spilled(beats):
+            yield from _spill(beats, spill_dir)
+
+        def step(beats, item):
+            effect, lookahead = item
+            return effect(spilled(beats) if spill and lookahead is None else beats)
+
+        return reduce(step, zip(self.effects, self.lookaheads), beats)
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import typing as t
+
+import numpy as np
+import soundfile
+
+from .buffers import empty, scratch
+from .references import beat_blocks
+
+# Formats libsndfile can handle, keyed by file extension / ffmpeg format name, with the subtype used when writing.
+# Subtypes match ffmpeg's defaults so output doesn't change depending on which path wrote it.
+_SOUNDFILE_FORMATS = {
+    "wav": ("WAV", "PCM_16"),
+    "flac": ("FLAC", "PCM_16"),
+    "ogg": ("OGG", "VORBIS"),
+    "mp3": ("MP3", "MPEG_LAYER_III"),
+}
+
+
+def soundfile_format(fp, out_format: str = None) -> t.Optional[t.Tuple[str, str]]:
+    """
+    Determines whether libsndfile can handle a file directly. MP3 is only supported by libsndfile 1.1.0 and later.
+
+    :param fp: Filename or file-like object.
+    :param out_format: Explicit format name, as passed to ffmpeg. Required for file-like objects.
+    :return: A (format, subtype) pair for libsndfile, or None if the file needs ffmpeg.
+    """
+    name = out_format
+    if name is None and isinstance(fp, (str, os.PathLike)):
+        name = os.path.splitext(str(fp))[1].lstrip(".")
+
+    entry = _SOUNDFILE_FORMATS.get((name or "").lower())
+    if entry is None or entry[0] not in soundfile.available_formats():
+        return None
+
+    return entry if soundfile.check_format(*entry) else None
+
+
+def read_audio(fp, start: float = None, stop: float = None) -> t.Tuple[np.ndarray, int]:
+    """
+    Decodes audio as float64 with shape (samples, channels). Uses libsndfile in-process when it supports the format,
+    and falls back to ffmpeg otherwise.
+
+    :param fp: Filename or file-like object. File-like objects libsndfile can't parse are copied to a temporary file
+               for ffmpeg, so they must be seekable.
+    :param start: If set, position in seconds to start decoding from.
+    :param stop: If set, position in seconds to stop decoding at.
+    :return: The decoded signal and its sample rate.
+    """
+    is_path = isinstance(fp, (str, os.PathLike))
+
+    if not is_path or soundfile_format(fp):
+        position = fp.tell() if not is_path else None
+        try:
+            with soundfile.SoundFile(fp) as f:
+                first = int(round(start * f.samplerate)) if start else 0
+                last = int(round(stop * f.samplerate)) if stop is not None else f.frames
+                f.seek(min(first, f.frames))
+                frames = max(0, min(last, f.frames) - first)
+                signal = f.read(frames, dtype="float64", always_2d=True, out=empty((frames, f.channels)))
+                return signal, f.samplerate
+        except RuntimeError:
+            if not is_path:
+                fp.seek(position)
+                return _read_spooled(fp, start, stop)
+
+    # TODO: Revisit python-soundfile once it bundles a recent version of libsndfile on linux:
+    #       https://github.com/bastibe/python-soundfile/issues/353. (Most distros still have a libsndfile version
+    #       that doesn't support MP3. Users could always build from source but we don't want that to be a requirement.)
+    return _read_with_ffmpeg(str(fp), start, stop)
+
+
+def _read_spooled(fp, start: float = None, stop: float = None) -> t.Tuple[np.ndarray, int]:
+    # ffmpeg needs a file name, so file-like inputs in other formats are copied to disk first.
+    spool = tempfile.NamedTemporaryFile(prefix="beatmachine-", delete=False)
+    try:
+        with spool:
+            shutil.copyfileobj(fp, spool)
+        return _read_with_ffmpeg(spool.name, start, stop)
+    finally:
+        os.unlink(spool.name)
+
+
+def _read_with_ffmpeg(path: str, start: float = None, stop: float = None) -> t.Tuple[np.ndarray, int]:
+    # madmom decodes through ffmpeg. It is slow to import, and only needed for formats libsndfile can't read.
+    from madmom.audio import Signal
+
+    s = Signal(path, sample_rate=None, num_channels=None, start=start, stop=stop, dtype=np.float64)
+    return np.asarray(s).reshape(len(s), -1), s.sample_rate
+
+
+def pcm_blocks(beats: t.Iterable, channels: int) -> t.Generator[np.ndarray, None, None]:
+    """
+    Prepares beats for an encoder. Beats that are already C-contiguous float64 are passed through as they are, and
+    anything else is converted in a scratch buffer, so each block is only valid until the next one is requested.
+
+    :param beats: Beats to encode, in order.
+    :param channels: Number of audio channels.
+    :return: A generator yielding C-contiguous float64 blocks with shape (samples, channels).
+    """
+    for beat in beats:
+        for block in beat_blocks(beat):
+            block = np.asarray(block)
+            if block.dtype == np.float64 and block.flags.c_contiguous:
+                yield block.reshape(-1, channels)
+                continue
+
+            with scratch(block.shape) as converted:
+                np.copyto(converted, block)
+                yield converted.reshape(-1, channels)
+
+
+def open_audio_writer(fp, sample_rate: int, channels: int, sf_format: t.Tuple[str, str]) -> soundfile.SoundFile:
+    """
+    Opens an in-process libsndfile encoder. Write (samples, channels) float64 blocks to it and close it when done.
+
+    :param fp: Filename or file-like object to write to.
+    :param sample_rate: Audio sample rate.
+    :param channels: Number of audio channels.
+    :param sf_format: A (format, subtype) pair as returned by :func:`soundfile_format`.
+    :return: An open SoundFile.
+    """
+    major, subtype = sf_format
+    return soundfile.SoundFile(fp, "w", samplerate=sample_rate, channels=channels, format=major, subtype=subtype)
+
+
+def write_audio(
+    fp,
+    beats: t.Iterable[np.ndarray],
+    sample_rate: int,
+    channels: int,
+    sf_format: t.Tuple[str, str],
+):
+    """
+    Encodes beats in-process with libsndfile, one beat at a time.
+
+    :param fp: Filename or file-like object to write to.
+    :param beats: Beats to write, in order.
+    :param sample_rate: Audio sample rate.
+    :param channels: Number of audio channels.
+    :param sf_format: A (format, subtype) pair as returned by :func:`soundfile_format`.
+    """
+    with open_audio_writer(fp, sample_rate, channels, sf_format) as f:
+        for block in pcm_blocks(beats, channels):
+            f.write(block)
@@ -0,0 +1,189 @@
+import collections
+import concurrent.futures
+import json
+import os
+import pickle
+import socketserver
+import threading
+import typing as t
+
+from .backends.madmom import MadmomDbnBackend
+from .batch import _load_beats
+from .beats import Beats
+from .daemon_client import DaemonClient, DaemonError, default_socket_path
+from .effect_registry import EffectRegistry
+from .effects.periodic import PeriodicEffect
+from .utils import file_digest
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            response = self.server.daemon.handle(json.loads(line))
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Daemon:
+    """
+    A Daemon keeps beat tracking models, recently analysed songs and a pool of workers alive between CLI invocations,
+    and runs jobs sent to it over a Unix domain socket. Requests are single lines of JSON, answered with a single line
+    of JSON.
+    """
+
+    def __init__(
+        self, socket_path: str = None, cache_dir: str = None, workers: int = None, memory_cache_size: int = 32
+    ):
+        """
+        :param socket_path: Path to listen on. Defaults to :func:`default_socket_path`.
+        :param cache_dir: Directory holding cached beats, shared with the CLI. None disables the disk cache.
+        :param workers: Number of jobs to run at once. Defaults to the number of CPUs.
+        :param memory_cache_size: Number of analysed songs to keep in memory.
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.cache_dir = cache_dir
+        self.memory_cache_size = memory_cache_size
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._songs = collections.OrderedDict()
+        self._server = None
+
+    def backend(self, min_bpm: int, max_bpm: int) -> MadmomDbnBackend:
+        """
+        :return: A backend for the given tempo range, created the first time the calling worker needs it. Online
+                 backends carry state from one frame to the next, so each worker gets its own.
+        """
+        backends = self._local.__dict__.setdefault("backends", {})
+        key = (min_bpm, max_bpm)
+        if key not in backends:
+            backends[key] = MadmomDbnBackend(min_bpm=min_bpm, max_bpm=max_bpm, model_count=4)
+        return backends[key]
+
+    def beats(self, song: str, min_bpm: int, max_bpm: int, cache: bool = True) -> Beats:
+        """
+        Locates the beats in a song, reusing recent results held in memory or on disk.
+
+        :param song: Path to the song.
+        :param min_bpm: Minimum BPM passed to the beat tracker.
+        :param max_bpm: Maximum BPM passed to the beat tracker.
+        :param cache: Whether cached results may be used.
+        :return: Beats of the song.
+        """
+        if not cache:
+            return Beats.from_song(song, self.backend(min_bpm, max_bpm))
+
+        key = (file_digest(song), min_bpm, max_bpm)
+        with self._lock:
+            if key in self._songs:
+                self._songs.move_to_end(key)
+                return self._songs[key]
+
+        beats, _ = _load_beats(song, self.backend(min_bpm, max_bpm), self.cache_dir)
+        with self._lock:
+            self._songs[key] = beats
+            while len(self._songs) > self.memory_cache_size:
+                self._songs.popitem(last=False)
+
+        return beats
+
+    def handle(self, request: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+        """
+        Runs a request on the worker pool.
+
+        :param request: Decoded request.
+        :return: Response to send back.
+        """
+        command = request.get("command")
+        if command == "ping":
+            return {"pid": os.getpid()}
+        if command == "apply":
+            return self._executor.submit(self._apply, **request).result()
+        if command == "preprocess":
+            return self._executor.submit(self._preprocess, **request).result()
+
+        raise ValueError(f"Unknown command {command!r}")
+
+    def _apply(
+        self,
+        command,
+        input,
+        effects,
+        outputs,
+        segments=1,
+        effect_threads=1,
+        spill_dir=None,
+        min_bpm=60,
+        max_bpm=300,
+        cache=True,
+    ):
+        beats = self._load(input, min_bpm, max_bpm, cache)
+        effects = EffectRegistry.load_effect_chain(effects)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=effect_threads) as executor:
+            if effect_threads > 1:
+                effects = [e.with_executor(executor) if isinstance(e, PeriodicEffect) else e for e in effects]
+            beats = beats.apply_all(*effects, spill_dir=spill_dir)
+            if len(outputs) == 1:
+                beats.save(outputs[0], segments=segments)
+            else:
+                beats.save_all(outputs)
+        return {"outputs": outputs}
+
+    def _preprocess(self, command, input, output, min_bpm=60, max_bpm=300, cache=True):
+        beats = self._load(input, min_bpm, max_bpm, cache)
+        with open(output, "wb") as fp:
+            pickle.dump(beats, fp)
+        return {"outputs": [output]}
+
+    def _load(self, song, min_bpm, max_bpm, cache) -> Beats:
+        if song.endswith(".beat"):
+            with open(song, "rb") as fp:
+                return pickle.load(fp)
+        return self.beats(song, min_bpm, max_bpm, cache)
+
+    def serve_forever(self):
+        """
+        Listens for requests until :meth:`shutdown` is called. Refuses to start if another daemon is already
+        listening on the same socket, and replaces the socket file left behind by one that exited uncleanly.
+        """
+        client = DaemonClient.connect(self.socket_path)
+        if client is not None:
+            client.request("ping")
+            raise DaemonError(f"A daemon is already listening on {self.socket_path}")
+
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        # The socket is created with the umask's permissions, so other users can never connect, not even briefly.
+        umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.socket_path, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.daemon = self
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._executor.shutdown()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        """
+        Stops a daemon running :meth:`serve_forever` in another thread.
+        """
+        if self._server is not None:
+            self._server.shutdown()
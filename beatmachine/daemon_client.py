@@ -0,0 +1,70 @@
+import json
+import os
+import socket
+import tempfile
+import typing as t
+
+
+class DaemonError(Exception):
+    """
+    Raised by :class:`DaemonClient` when the daemon fails to run a request.
+    """
+
+
+def default_socket_path() -> str:
+    """
+    :return: Path of the socket the daemon listens on unless told otherwise. Each user gets their own daemon.
+    """
+    return os.path.join(tempfile.gettempdir(), "beatmachine", f"daemon-{os.getuid()}.sock")
+
+
+class DaemonClient:
+    """
+    A connection to a running daemon. Each client sends a single request.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+
+    @staticmethod
+    def connect(path: str = None) -> t.Optional["DaemonClient"]:
+        """
+        :param path: Socket path. Defaults to :func:`default_socket_path`.
+        :return: A connected client, or None if no daemon is listening.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path or default_socket_path())
+        except OSError:
+            sock.close()
+            return None
+
+        return DaemonClient(sock)
+
+    def close(self):
+        """
+        Closes the connection without sending a request.
+        """
+        self._sock.close()
+
+    def request(self, command: str, **kwargs) -> t.Dict[str, t.Any]:
+        """
+        Sends a request and waits for the daemon to finish it.
+
+        :param command: Name of the command to run, e.g. "apply".
+        :param kwargs: Arguments of the command. Must be JSON serializable.
+        :return: The daemon's response.
+        """
+        with self._sock, self._sock.makefile("rwb") as f:
+            f.write(json.dumps({"command": command, **kwargs}).encode() + b"\n")
+            f.flush()
+            line = f.readline()
+
+        if not line:
+            raise DaemonError("Daemon closed the connection without responding")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise DaemonError(response["error"])
+
+        return response
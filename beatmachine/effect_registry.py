@@ -1,7 +1,7 @@
 import abc
 import re
 from inspect import getdoc
-from typing import Callable, Iterable
+from typing import Callable, Iterable, Optional
 
 import numpy as np
 from jsonschema import validate
@@ -129,6 +129,26 @@ class LoadableEffect(abc.ABC):
 
     __effect_name__: str = NotImplemented
 
+    # Whether two equal instances always produce the same output for the same input. Deterministic effects can have
+    # their output shared between effect chains that start the same way.
+    __effect_deterministic__: bool = True
+
+    @property
+    def lookahead(self) -> Optional[int]:
+        """
+        :return: The most beats this effect reads ahead of the beats it has produced, or None if it may need to read
+                 the whole song first. Effects that don't override this are assumed to need the whole song.
+        """
+        return None
+
+    @property
+    def reads_features(self) -> bool:
+        """
+        :return: Whether this effect looks at what beats sound like, through :meth:`with_features` or by measuring
+                 them, rather than only at their position.
+        """
+        return False
+
     @abc.abstractmethod
     def __call__(self, beats: Iterable[np.ndarray]) -> Iterable[np.ndarray]:
         """
@@ -1,3 +1,5 @@
+from typing import List
+
 import numpy as np
 
 from ..effect_registry import EffectABCMeta
@@ -35,8 +37,9 @@ class CutEveryNth(PeriodicEffect, metaclass=EffectABCMeta):
         denominator: int = 2,
         take_index: int = 0,
         offset: int = 0,
+        skip_silent: bool = False,
     ):
-        super().__init__(period=period, offset=offset)
+        super().__init__(period=period, offset=offset, skip_silent=skip_silent)
         self.denominator = denominator
         self.take_index = take_index
 
@@ -45,10 +48,18 @@ class CutEveryNth(PeriodicEffect, metaclass=EffectABCMeta):
         offset = self.take_index * size
         return beat[offset : offset + size, ...]
 
+    def process_beats(self, beats: List[np.ndarray]) -> List[np.ndarray]:
+        # Pieces are contiguous views already, so only their bounds are worth computing together.
+        sizes = np.array([len(beat) for beat in beats]) // self.denominator
+        starts = self.take_index * sizes
+        return [beat[start:stop, ...] for beat, start, stop in zip(beats, starts.tolist(), (starts + sizes).tolist())]
+
     def __eq__(self, other):
         return (
             isinstance(other, CutEveryNth)
             and other.period == self.period
+            and other.offset == self.offset
+            and other.skip_silent == self.skip_silent
             and other.denominator == self.denominator
             and other.take_index == self.take_index
         )
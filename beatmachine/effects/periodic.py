@@ -1,17 +1,40 @@
 import abc
-from typing import Generator, List, Optional
+import collections
+import concurrent.futures
+import copy
+import os
+from typing import Generator, List, Optional, Tuple
 
 import numpy as np
 
 from beatmachine.effect_registry import LoadableEffect
+from beatmachine.features import FeatureIndex, beat_rms, is_silent
+from beatmachine.utils import chunks
 
 
 class PeriodicEffect(LoadableEffect, abc.ABC):
     """
     A PeriodicEffect is an effect that gets applied to beats at a fixed interval, i.e. every other beat. A
     PeriodicEffect with a period of 1 gets applied to every single beat.
+
+    Beats are read in small batches. The beats selected in each batch are handed to :meth:`process_beats` together,
+    so subclasses can transform all of them with a few array operations instead of one call per beat.
+
+    Effects with expensive :meth:`process_beat` implementations can instead be run on an executor with
+    :meth:`with_executor`.
+
+    With ``skip_silent``, silent beats are passed through untouched and don't count towards the period. Their levels
+    are read from a song's feature index when the effect is bound to one with :meth:`with_features`, and measured
+    otherwise.
     """
 
+    # Number of beats read per batch. Larger batches amortize more per-beat overhead but delay the first output beat.
+    batch_size: int = 16
+
+    executor: Optional[concurrent.futures.Executor] = None
+    window: Optional[int] = None
+    features: Optional[FeatureIndex] = None
+
     __effect_schema__ = {
         "period": {
             "type": "integer",
@@ -27,12 +50,19 @@ class PeriodicEffect(LoadableEffect, abc.ABC):
             "title": "Offset",
             "description": "How many beats to wait before applying this effect.",
         },
+        "skip_silent": {
+            "type": "boolean",
+            "default": False,
+            "title": "Skip silent beats",
+            "description": "If set, silent beats are left alone and don't count towards the period.",
+        },
     }
 
-    def __init__(self, *, period: int = 1, offset: int = 0):
+    def __init__(self, *, period: int = 1, offset: int = 0, skip_silent: bool = False):
         """
         :param period: Period (>= 1) to apply this effect on
         :param offset: How many beats to wait before applying this effect every ``period`` beats
+        :param skip_silent: If set, silent beats are left alone and don't count towards the period
         """
         if period <= 0:
             raise ValueError(f"Effect period must be > 0, but was {period}")
@@ -42,6 +72,7 @@ class PeriodicEffect(LoadableEffect, abc.ABC):
 
         self.period = period
         self.offset = offset
+        self.skip_silent = skip_silent
 
     @abc.abstractmethod
     def process_beat(self, beat: np.ndarray) -> Optional[np.ndarray]:
@@ -53,15 +84,126 @@ class PeriodicEffect(LoadableEffect, abc.ABC):
         """
         raise NotImplementedError
 
+    def process_beats(self, beats: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """
+        Processes the selected beats of a batch. Override this to handle them together. The default implementation
+        calls :meth:`process_beat` on each beat.
+
+        :param beats: Selected beats, in order.
+        :return: Updated beats, with None in place of beats that should be removed.
+        """
+        return [self.process_beat(beat) for beat in beats]
+
+    @staticmethod
+    def _uniform(beats: List[np.ndarray]) -> bool:
+        # Whether the beats share a dtype and channel layout, so that one array can hold all of them.
+        return len({(beat.dtype, np.shape(beat)[1:]) for beat in beats}) == 1
+
+    @property
+    def lookahead(self) -> int:
+        return self.window if self.executor is not None else self.batch_size
+
+    @property
+    def reads_features(self) -> bool:
+        return self.skip_silent
+
+    def selected(self, start: int, count: int) -> np.ndarray:
+        """
+        :param start: Index of the first beat.
+        :param count: Number of beats.
+        :return: Indices, relative to ``start``, of the beats this effect applies to.
+        """
+        i = np.arange(start, start + count) - self.offset
+        return np.flatnonzero((i >= 0) & ((i - 1) % self.period == 0))
+
+    def _select(self, batch: List[np.ndarray], start: int) -> Tuple[np.ndarray, int]:
+        # Returns the indices within the batch to process, and how many beats of the batch count towards the period.
+        if not self.skip_silent:
+            return self.selected(start, len(batch)), len(batch)
+
+        rms = [self.features.rms(beat) if self.features is not None else beat_rms(beat) for beat in batch]
+        counted = np.flatnonzero(~is_silent(rms))
+        return counted[self.selected(start, len(counted))], len(counted)
+
+    def with_features(self, features: FeatureIndex) -> "PeriodicEffect":
+        """
+        Creates a copy of this effect that reads beat levels from a precomputed feature index instead of measuring
+        them.
+
+        :param features: Feature index of the song this effect will be applied to.
+        :return: A copy of this effect.
+        """
+        effect = copy.copy(self)
+        effect.features = features
+        return effect
+
+    def with_executor(self, executor: concurrent.futures.Executor, window: int = None) -> "PeriodicEffect":
+        """
+        Creates a copy of this effect that calls :meth:`process_beat` on an executor, so several beats are processed
+        at once. Thread pools suit effects that spend their time in NumPy or SciPy calls that release the GIL; process
+        pools suit the rest, as long as the effect can be pickled. Beats are still produced in order, and at most
+        ``window`` beats are read ahead of the last one produced.
+
+        :param executor: Executor to process beats on.
+        :param window: Maximum number of beats in flight. Defaults to twice the number of CPUs.
+        :return: A copy of this effect.
+        """
+        if window is not None and window < 1:
+            raise ValueError(f"Window must be >= 1, but was {window}")
+
+        effect = copy.copy(self)
+        effect.executor = executor
+        effect.window = window or 2 * (os.cpu_count() or 1)
+        return effect
+
+    def __getstate__(self):
+        # Executors can't be pickled, and the copy sent to a process pool has no use for one. Neither has it any use
+        # for the feature index, which only recognizes beats in this process.
+        state = self.__dict__.copy()
+        state.pop("executor", None)
+        state.pop("features", None)
+        return state
+
+    def _call_on_executor(self, beats: List[np.ndarray]) -> Generator[Optional[np.ndarray], None, None]:
+        pending = collections.deque()
+        start = 0
+        for batch in chunks(beats, self.window):
+            indices, counted = self._select(batch, start)
+            indices = set(indices.tolist())
+            start += counted
+
+            for i, beat in enumerate(batch):
+                pending.append(self.executor.submit(self.process_beat, beat) if i in indices else beat)
+                while len(pending) > self.window:
+                    yield _result(pending.popleft())
+
+        while pending:
+            yield _result(pending.popleft())
+
     def __call__(self, beats: List[np.ndarray]) -> Generator[np.ndarray, None, None]:
-        for i, beat in enumerate(beats):
-            if i < self.offset:
-                yield beat
-            else:
-                i -= self.offset
-                result = self.process_beat(beat) if (i - 1) % self.period == 0 else beat
-                if result is not None:
-                    yield result
+        if self.executor is not None:
+            yield from (beat for beat in self._call_on_executor(beats) if beat is not None)
+            return
+
+        start = 0
+        for batch in chunks(beats, self.batch_size):
+            indices, counted = self._select(batch, start)
+            start += counted
+
+            if len(indices):
+                for i, result in zip(indices, self.process_beats([batch[i] for i in indices])):
+                    batch[i] = result
+
+            yield from (beat for beat in batch if beat is not None)
 
     def __eq__(self, other) -> bool:
-        return isinstance(other, self.__class__) and self.period == other.period
+        return (
+            isinstance(other, self.__class__)
+            and self.period == other.period
+            and self.offset == other.offset
+            and self.skip_silent == other.skip_silent
+        )
+
+
+def _result(item):
+    return item.result() if isinstance(item, concurrent.futures.Future) else item
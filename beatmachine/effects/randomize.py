@@ -10,6 +10,7 @@ class RandomizeAllBeats(LoadableEffect, metaclass=EffectABCMeta):
 
     __effect_name__ = "randomize"
     __effect_schema__ = {}
+    __effect_deterministic__ = False
 
     def __call__(self, beats):
         shuffled_beats = list(beats)
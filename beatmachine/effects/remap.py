@@ -36,6 +36,10 @@ class RemapBeats(LoadableEffect, metaclass=EffectABCMeta):
 
         self.mapping = mapping
 
+    @property
+    def lookahead(self) -> int:
+        return len(self.mapping)
+
     def __call__(self, beats: Iterable[np.ndarray]) -> Generator[np.ndarray, None, None]:
         for group in chunks(beats, len(self.mapping)):
             group_size = len(group)
@@ -27,12 +27,13 @@ class RemoveEveryNth(PeriodicEffect, metaclass=EffectABCMeta):
             "title": "Offset",
             "description": "How many beats to wait before applying this effect.",
         },
+        "skip_silent": PeriodicEffect.__effect_schema__["skip_silent"],
     }
 
-    def __init__(self, *, period: int = 2, offset: int = 0):
+    def __init__(self, *, period: int = 2, offset: int = 0, skip_silent: bool = False):
         if period < 2:
             raise ValueError(f"`remove` effect period must be >= 2, but was {period}")
-        super().__init__(period=period, offset=offset)
+        super().__init__(period=period, offset=offset, skip_silent=skip_silent)
 
     def process_beat(self, beat: np.ndarray) -> Optional[np.ndarray]:
         return None
@@ -1,6 +1,7 @@
 import numpy as np
 
 from ..effect_registry import EffectABCMeta
+from ..references import RepeatedBeat
 from .periodic import PeriodicEffect
 
 
@@ -20,15 +21,17 @@ class RepeatEveryNth(PeriodicEffect, metaclass=EffectABCMeta):
         },
     }
 
-    def __init__(self, *, period: int = 1, offset: int = 0, times: int = 2):
+    def __init__(self, *, period: int = 1, offset: int = 0, times: int = 2, skip_silent: bool = False):
+        if times != int(times):
+            raise ValueError(f"Repeat effect must have a whole number of `times`, but instead got {times}")
         if times < 2:
             raise ValueError(f"Repeat effect must have `times` >= 2, but instead got {times}")
-        super().__init__(period=period, offset=offset)
+        super().__init__(period=period, offset=offset, skip_silent=skip_silent)
 
-        self.times = times
+        self.times = int(times)
 
-    def process_beat(self, beat: np.ndarray) -> np.ndarray:
-        return np.concatenate(self.times * [beat], axis=0)
+    def process_beat(self, beat: np.ndarray) -> RepeatedBeat:
+        return RepeatedBeat(beat, self.times)
 
     def __eq__(self, other):
         return super(RepeatEveryNth, self).__eq__(other) and self.times == other.times
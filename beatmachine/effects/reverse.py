@@ -1,5 +1,8 @@
+from typing import List
+
 import numpy as np
 
+from ..buffers import empty
 from ..effect_registry import EffectABCMeta
 from .periodic import PeriodicEffect
 
@@ -13,3 +16,15 @@ class ReverseEveryNth(PeriodicEffect, metaclass=EffectABCMeta):
 
     def process_beat(self, beat: np.ndarray) -> np.ndarray:
         return np.flip(beat)
+
+    def process_beats(self, beats: List[np.ndarray]) -> List[np.ndarray]:
+        if not self._uniform(beats):
+            return super().process_beats(beats)
+
+        # Reversing a run of beats end to end yields each beat reversed, in the original order. So joining the beats
+        # back to front into a reversed view of one contiguous render buffer reverses all of them in a single copy,
+        # and encoders don't have to copy reversed views one by one. np.flip reverses the channels as well.
+        ends = np.cumsum([len(beat) for beat in beats])
+        out = empty((int(ends[-1]),) + np.shape(beats[0])[1:], beats[0].dtype)
+        np.concatenate(beats[::-1], axis=0, out=out[(slice(None, None, -1),) * out.ndim])
+        return np.split(out, ends[:-1])
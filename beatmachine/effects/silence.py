@@ -1,18 +1,31 @@
+from typing import List
+
 import numpy as np
 
 from ..effect_registry import EffectABCMeta
+from ..references import silence
 from .periodic import PeriodicEffect
 
 
 class SilenceEveryNth(PeriodicEffect, metaclass=EffectABCMeta):
     """
-    Silence beats, retaining their lengths.
+    Silence beats, retaining their lengths. Silenced beats are read-only views of a shared block, so effects that
+    modify beats in place must copy them first.
     """
 
     __effect_name__ = "silence"
 
-    def __init__(self, *, period: int = 1, offset: int = 0):
-        super().__init__(period=period, offset=offset)
+    def __init__(self, *, period: int = 1, offset: int = 0, skip_silent: bool = False):
+        super().__init__(period=period, offset=offset, skip_silent=skip_silent)
 
     def process_beat(self, beat: np.ndarray) -> np.ndarray:
-        return np.zeros(np.shape(beat), dtype="int16")
+        return silence(np.shape(beat), beat.dtype)
+
+    def process_beats(self, beats: List[np.ndarray]) -> List[np.ndarray]:
+        if not self._uniform(beats):
+            return super().process_beats(beats)
+
+        # Every silenced beat in the batch is a view of the same stretch of the shared block.
+        longest = max(len(beat) for beat in beats)
+        block = silence((longest,) + np.shape(beats[0])[1:], beats[0].dtype)
+        return [block[: len(beat)] for beat in beats]
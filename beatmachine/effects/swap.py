@@ -76,6 +76,10 @@ class SwapBeats(LoadableEffect, metaclass=EffectABCMeta):
         self.group_size = group_size
         self.offset = offset
 
+    @property
+    def lookahead(self) -> int:
+        return int(self.group_size)
+
     def __call__(self, beats: Iterable[np.ndarray]) -> Generator[np.ndarray, None, None]:
         beats = iter(beats)
 
@@ -85,7 +89,7 @@ class SwapBeats(LoadableEffect, metaclass=EffectABCMeta):
         for group in chunks(beats, self.group_size):
             if len(group) > self.high_period:
                 # Swap low and high beats
-                (group[self.low_period], group[self.high_period]) = (
+                group[self.low_period], group[self.high_period] = (
                     group[self.high_period],
                     group[self.low_period],
                 )
@@ -0,0 +1,233 @@
+import typing as t
+
+import numpy as np
+
+from .backend import Backend
+from .backends.bpm import BpmBackend
+from .backends.madmom import MadmomDbnBackend
+from .bench import measure
+from .service.tiers import TIERS
+
+# Detections within this many seconds of an annotated beat count as hits, as in MIREX beat tracking.
+F_MEASURE_WINDOW = 0.07
+
+# Detections within this fraction of the local inter-beat interval count towards continuity metrics.
+CONTINUITY_TOLERANCE = 0.175
+
+
+class GroundTruth(t.NamedTuple):
+    name: str
+    signal: np.ndarray
+    sample_rate: int
+    beats: np.ndarray
+
+
+class EvaluationResult(t.NamedTuple):
+    backend: str
+    material: str
+    f_measure: float
+    cmlt: float
+    amlt: float
+    seconds: float
+    peak_bytes: int
+
+
+def _beat_times(seconds: float, tempo: t.Callable[[float], float]) -> np.ndarray:
+    times = [0.0]
+    while times[-1] + 60 / tempo(times[-1]) < seconds:
+        times.append(times[-1] + 60 / tempo(times[-1]))
+    return np.array(times)
+
+
+def _add(signal: np.ndarray, sound: np.ndarray, at: int):
+    end = min(len(signal), at + len(sound))
+    if at < end:
+        signal[at:end] += sound[: end - at]
+
+
+def synthesize(
+    name: str,
+    beats: np.ndarray,
+    seconds: float,
+    sample_rate: int = 44100,
+    drums: bool = False,
+    swing: float = 0.5,
+    seed: int = 0,
+) -> GroundTruth:
+    """
+    Renders material with known beat times.
+
+    :param name: Name of the material.
+    :param beats: Beat times in seconds.
+    :param seconds: Length of the material.
+    :param sample_rate: Sample rate of the material.
+    :param drums: If set, renders a drum loop (kick on every beat, snare on 2 and 4, hi-hats on eighth notes) instead
+                  of a click track.
+    :param swing: Where the off-beat hi-hat falls between two beats, from 0.5 (straight) to about 0.67 (triplet swing).
+    :param seed: Seed for the noise used by snares and hi-hats.
+    :return: Mono material and its beats.
+    """
+    rng = np.random.default_rng(seed)
+    signal = np.zeros(int(seconds * sample_rate))
+    n = np.arange(int(0.2 * sample_rate))
+    decay = np.exp(-n / (0.03 * sample_rate))
+
+    click = np.sin(2 * np.pi * 1000 * n / sample_rate) * decay
+    kick = np.sin(2 * np.pi * np.cumsum(np.linspace(150, 50, len(n))) / sample_rate) * decay
+    snare = 0.5 * rng.standard_normal(len(n)) * decay**2
+    hat = 0.2 * rng.standard_normal(len(n) // 8) * decay[: len(n) // 8] ** 4
+
+    positions = (beats * sample_rate).astype(np.int64)
+    for i, at in enumerate(positions):
+        if not drums:
+            _add(signal, click, at)
+            continue
+
+        _add(signal, kick, at)
+        if i % 2 == 1:
+            _add(signal, snare, at)
+        _add(signal, hat, at)
+        if i + 1 < len(positions):
+            _add(signal, hat, int(at + swing * (positions[i + 1] - at)))
+
+    return GroundTruth(name, 0.5 * signal / np.max(np.abs(signal)), sample_rate, beats)
+
+
+def default_material(seconds: float = 30.0, sample_rate: int = 44100) -> t.List[GroundTruth]:
+    """
+    :param seconds: Length of each piece of material.
+    :param sample_rate: Sample rate of the material.
+    :return: Click tracks and drum loops covering steady tempos, swing, a tempo ramp and a sudden tempo change.
+    """
+    ramp = _beat_times(seconds, lambda time: 100 + 40 * time / seconds)
+    step = _beat_times(seconds, lambda time: 128 if time < seconds / 2 else 96)
+    return [
+        synthesize("click-120", _beat_times(seconds, lambda _: 120), seconds, sample_rate),
+        synthesize("click-ramp-100-140", ramp, seconds, sample_rate),
+        synthesize("drums-95", _beat_times(seconds, lambda _: 95), seconds, sample_rate, drums=True),
+        synthesize(
+            "drums-140-swing", _beat_times(seconds, lambda _: 140), seconds, sample_rate, drums=True, swing=0.66
+        ),
+        synthesize("drums-step-128-96", step, seconds, sample_rate, drums=True),
+    ]
+
+
+def f_measure(detections: np.ndarray, annotations: np.ndarray, window: float = F_MEASURE_WINDOW) -> float:
+    """
+    :param detections: Detected beat times in seconds.
+    :param annotations: Annotated beat times in seconds.
+    :param window: Largest distance in seconds at which a detection matches an annotation.
+    :return: Harmonic mean of precision and recall. Each detection matches at most one annotation.
+    """
+    if len(detections) == 0 or len(annotations) == 0:
+        return float(len(detections) == len(annotations))
+
+    used = np.zeros(len(detections), dtype=bool)
+    hits = 0
+    for annotation in annotations:
+        distance = np.where(used, np.inf, np.abs(detections - annotation))
+        closest = np.argmin(distance)
+        if distance[closest] <= window:
+            used[closest] = True
+            hits += 1
+
+    precision, recall = hits / len(detections), hits / len(annotations)
+    return 0.0 if hits == 0 else 2 * precision * recall / (precision + recall)
+
+
+def _correct_with_continuity(detections: np.ndarray, annotations: np.ndarray, tolerance: float) -> float:
+    if len(annotations) < 2 or len(detections) < 2:
+        return 0.0
+
+    correct = 0
+    for i in range(1, len(annotations)):
+        interval = annotations[i] - annotations[i - 1]
+        j = np.argmin(np.abs(detections - annotations[i]))
+        if j == 0 or abs(detections[j] - annotations[i]) > tolerance * interval:
+            continue
+        # The previous detection must match the previous beat too, so the tracker is in phase and at the right tempo.
+        if abs(detections[j - 1] - annotations[i - 1]) <= tolerance * interval:
+            correct += 1
+
+    return correct / len(annotations)
+
+
+def continuity(
+    detections: np.ndarray, annotations: np.ndarray, tolerance: float = CONTINUITY_TOLERANCE
+) -> t.Tuple[float, float]:
+    """
+    :param detections: Detected beat times in seconds.
+    :param annotations: Annotated beat times in seconds.
+    :param tolerance: Tolerance as a fraction of the local inter-beat interval.
+    :return: CMLt, the fraction of beats tracked correctly and continuously at the annotated metrical level, and
+             AMLt, the same but also accepting double tempo, half tempo and off-beat tracking.
+    """
+    cmlt = _correct_with_continuity(detections, annotations, tolerance)
+
+    midpoints = (annotations[:-1] + annotations[1:]) / 2
+    double = np.sort(np.concatenate((annotations, midpoints)))
+    variants = [annotations, double, annotations[::2], annotations[1::2], midpoints]
+    amlt = max(_correct_with_continuity(detections, variant, tolerance) for variant in variants)
+    return cmlt, amlt
+
+
+def default_backends(min_bpm: int = 55, max_bpm: int = 215) -> t.Dict[str, t.Callable[[], Backend]]:
+    """
+    :param min_bpm: Minimum BPM for backends that take one.
+    :param max_bpm: Maximum BPM for backends that take one.
+    :return: Factories for every backend configuration worth comparing, keyed by name. Factories are used because
+             loading madmom's models is itself expensive. Besides the tiers, madmom runs with each model count over the
+             whole tempo range, which tells the cost of the models apart from that of the DBN's state space.
+    """
+    backends = {f"tier/{name}": tier.create_backend for name, tier in TIERS.items()}
+    tiers = {(tier.model_count, tier.min_bpm, tier.max_bpm) for tier in TIERS.values()}
+    for model_count in (1, 2, 4):
+        # Configurations that are already a tier would only be measured twice
+        if (model_count, min_bpm, max_bpm) not in tiers:
+            backends[f"madmom/{model_count}-models/{min_bpm}-{max_bpm}bpm"] = (
+                lambda model_count=model_count: MadmomDbnBackend(
+                    min_bpm=min_bpm, max_bpm=max_bpm, model_count=model_count
+                )
+            )
+    backends["bpm/120"] = lambda: BpmBackend(120, 0)
+    return backends
+
+
+def evaluate(
+    backends: t.Dict[str, t.Union[Backend, t.Callable[[], Backend]]],
+    material: t.Iterable[GroundTruth],
+    skip: float = 5.0,
+) -> t.Generator[EvaluationResult, None, None]:
+    """
+    Runs every backend on every piece of material.
+
+    :param backends: Backends or backend factories, keyed by name.
+    :param material: Material with known beats, e.g. from :func:`default_material`.
+    :param skip: Beats in the first this many seconds are ignored, giving trackers time to settle.
+    :return: A generator yielding one result per backend and piece of material.
+    """
+    material = list(material)
+    for name, backend in backends.items():
+        if not hasattr(backend, "locate_beats"):
+            backend = backend()
+
+        for truth in material:
+            found = None
+
+            def locate():
+                nonlocal found
+                found = backend.locate_beats(truth.signal, truth.sample_rate)
+
+            seconds, peak_bytes = measure(locate, repeat=1)
+            detections = np.asarray(found, dtype=np.float64) / truth.sample_rate
+            detections = detections[detections >= skip]
+            annotations = truth.beats[truth.beats >= skip]
+
+            yield EvaluationResult(
+                name,
+                truth.name,
+                f_measure(detections, annotations),
+                *continuity(detections, annotations),
+                seconds,
+                peak_bytes,
+            )
@@ -0,0 +1,182 @@
+import typing as t
+
+import numpy as np
+
+# One row per beat. Durations are in seconds, levels are linear with 1.0 being full scale, and the spectral centroid
+# is in Hz.
+FEATURE_DTYPE = np.dtype(
+    [
+        ("start", np.int64),
+        ("duration", np.float32),
+        ("rms", np.float32),
+        ("peak", np.float32),
+        ("centroid", np.float32),
+        ("onset", np.float32),
+    ]
+)
+
+# Beats quieter than this, in dBFS, count as silent.
+SILENCE_DB = -60.0
+
+# Spectral features are computed on frames of this many samples, this far apart.
+_FRAME = 2048
+_HOP = 1024
+
+# Frames analysed at once, which bounds the memory used by the FFT.
+_FRAMES_PER_CHUNK = 256
+
+
+def _spectral_frames(mono: np.ndarray, sample_rate: int) -> t.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: Energy, spectral centroid and spectral flux of each frame.
+    """
+    if len(mono) < _FRAME:
+        mono = np.pad(mono, (0, _FRAME - len(mono)))
+
+    frames = np.lib.stride_tricks.sliding_window_view(mono, _FRAME)[::_HOP]
+    window = np.hanning(_FRAME)
+    freqs = np.fft.rfftfreq(_FRAME, 1 / sample_rate)
+
+    energy = np.empty(len(frames))
+    centroid = np.empty(len(frames))
+    flux = np.empty(len(frames))
+    previous = None
+    for first in range(0, len(frames), _FRAMES_PER_CHUNK):
+        chunk = slice(first, first + _FRAMES_PER_CHUNK)
+        magnitude = np.abs(np.fft.rfft(frames[chunk] * window, axis=1))
+        total = magnitude.sum(axis=1)
+        energy[chunk] = total
+        centroid[chunk] = np.divide(magnitude @ freqs, total, out=np.zeros_like(total), where=total > 0)
+
+        # Onset strength is the rectified increase in log magnitude from one frame to the next.
+        compressed = np.log1p(100 * magnitude)
+        before = np.vstack((compressed[:1] if previous is None else previous, compressed[:-1]))
+        flux[chunk] = np.maximum(compressed - before, 0).mean(axis=1)
+        previous = compressed[-1:]
+
+    return energy, centroid, flux
+
+
+def compute_features(signal: np.ndarray, sample_rate: int, boundaries: np.ndarray) -> np.ndarray:
+    """
+    Computes every beat's features in one pass over the signal.
+
+    :param signal: Audio with shape (samples, channels) or (samples,).
+    :param sample_rate: Sample rate of the audio.
+    :param boundaries: Sample offsets where beats start, as returned by a backend.
+    :return: A structured array with dtype :data:`FEATURE_DTYPE` and one row per beat. Beats are split exactly like
+             ``np.split(signal, boundaries)``.
+    """
+    signal = np.asarray(signal)
+    if signal.ndim == 1:
+        signal = signal[:, None]
+
+    n = len(signal)
+    edges = np.clip(np.asarray(boundaries, dtype=np.int64), 0, n)
+    starts = np.concatenate(([0], edges))
+    lengths = np.maximum(np.concatenate((edges, [n])), starts) - starts
+
+    features = np.zeros(len(starts), dtype=FEATURE_DTYPE)
+    features["start"] = starts
+    features["duration"] = lengths / sample_rate
+    if n == 0:
+        return features
+
+    power = np.concatenate(([0.0], np.cumsum(np.square(signal, dtype=np.float64).mean(axis=1))))
+    features["rms"] = np.sqrt((power[starts + lengths] - power[starts]) / np.maximum(lengths, 1))
+
+    peaks = np.maximum.reduceat(np.abs(signal).max(axis=1), np.minimum(starts, n - 1))
+    features["peak"] = np.where(lengths > 0, peaks, 0)
+
+    energy, centroid, flux = _spectral_frames(signal.mean(axis=1, dtype=np.float64), sample_rate)
+    centers = np.arange(len(energy)) * _HOP + _FRAME // 2
+    owner = np.clip(np.searchsorted(starts, centers, side="right") - 1, 0, len(starts) - 1)
+    weight = np.bincount(owner, weights=energy, minlength=len(starts))
+    weighted = np.bincount(owner, weights=energy * centroid, minlength=len(starts))
+    features["centroid"] = np.divide(weighted, weight, out=np.zeros_like(weight), where=weight > 0)
+
+    nearest = np.clip(np.round((starts - _FRAME // 2) / _HOP).astype(np.int64), 0, len(flux) - 1)
+    features["onset"] = np.maximum(flux[nearest], flux[np.minimum(nearest + 1, len(flux) - 1)])
+    return features
+
+
+def is_silent(rms, threshold_db: float = SILENCE_DB):
+    """
+    :param rms: RMS level of one or more beats.
+    :param threshold_db: Level in dBFS below which a beat counts as silent.
+    :return: Whether each beat is silent.
+    """
+    return np.asarray(rms) < 10 ** (threshold_db / 20)
+
+
+def beat_rms(beat) -> float:
+    """
+    :param beat: A single beat.
+    :return: RMS level of the beat, across all channels.
+    """
+    beat = np.asarray(beat)
+    return float(np.sqrt(np.mean(np.square(beat, dtype=np.float64)))) if beat.size else 0.0
+
+
+def _key(beat) -> t.Optional[t.Tuple]:
+    interface = getattr(beat, "__array_interface__", None)
+    if interface is None:
+        return None
+    return interface["data"][0], interface["shape"], interface.get("strides")
+
+
+class FeatureIndex:
+    """
+    A FeatureIndex looks up a song's precomputed beat features by the beat itself, so effects can read them in the
+    middle of a chain without knowing where each beat came from. Beats are recognized as long as they are the
+    unmodified views the song was split into. Beats changed by an earlier effect are measured on the spot instead.
+    """
+
+    def __init__(self, table: np.ndarray, beats: t.Sequence[np.ndarray], sample_rate: int):
+        """
+        :param table: Features of each beat, as returned by :func:`compute_features`.
+        :param beats: The beats the table describes, in the same order.
+        :param sample_rate: Sample rate of the song.
+        """
+        self.table = table
+        self.sample_rate = sample_rate
+        # Holding the beats keeps their memory from being reused by other arrays, which would then match their keys.
+        self._beats = list(beats)
+        self._rows = {}
+        for i, beat in enumerate(self._beats):
+            key = _key(beat)
+            if key is not None:
+                self._rows.setdefault(key, i)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, i):
+        return self.table[i]
+
+    def lookup(self, beat) -> np.void:
+        """
+        :param beat: Any beat.
+        :return: The beat's features.
+        """
+        i = self._rows.get(_key(beat))
+        if i is not None:
+            return self.table[i]
+        return measure(beat, self.sample_rate)
+
+    def rms(self, beat) -> float:
+        """
+        :param beat: Any beat.
+        :return: The beat's RMS level. Only this is computed for beats that aren't in the index.
+        """
+        i = self._rows.get(_key(beat))
+        return float(self.table["rms"][i]) if i is not None else beat_rms(beat)
+
+
+def measure(beat, sample_rate: int) -> np.void:
+    """
+    :param beat: A single beat.
+    :param sample_rate: Sample rate of the beat.
+    :return: The beat's features.
+    """
+    return compute_features(np.asarray(beat), sample_rate, np.zeros(0, dtype=np.int64))[0]
@@ -0,0 +1,240 @@
+import contextlib
+import threading
+import time
+import tracemalloc
+import typing as t
+
+from .chain import effect_lookahead
+from .effect_registry import Effect
+
+
+class Span(t.NamedTuple):
+    """
+    One timed stage of processing a song.
+    """
+
+    stage: str
+    seconds: float
+    peak_bytes: t.Optional[int]
+    parent: t.Optional[str]
+
+
+Hook = t.Callable[[Span], None]
+
+_hooks: t.List[Hook] = []
+_hooks_lock = threading.Lock()
+_local = threading.local()
+
+
+def add_hook(hook: Hook):
+    """
+    Registers a function to be called with every :class:`Span` recorded from now on, from whichever thread did the
+    work. Nothing is timed while no hooks are registered.
+
+    :param hook: Function taking a Span.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + [hook]
+
+
+def remove_hook(hook: Hook):
+    """
+    :param hook: A hook previously passed to :func:`add_hook`.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = [h for h in _hooks if h is not hook]
+
+
+def enabled() -> bool:
+    """
+    :return: Whether any hooks are registered.
+    """
+    return bool(_hooks)
+
+
+def _stack() -> t.List[t.List]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _emit(span: Span):
+    for hook in _hooks:
+        hook(span)
+
+
+@contextlib.contextmanager
+def span(stage: str) -> t.Iterator[None]:
+    """
+    Times the enclosed block as a stage. Spans nest: a span opened inside another names it as its parent. If
+    tracemalloc is tracing, the peak memory allocated within the block is recorded as well.
+
+    :param stage: Name of the stage.
+    """
+    if not _hooks:
+        yield
+        return
+
+    stack = _stack()
+    tracing = tracemalloc.is_tracing()
+    start_bytes = 0
+    if tracing:
+        # tracemalloc only has one peak, so each level remembers the highest peak reached by the spans it contained.
+        start_bytes, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+
+    parent = stack[-1][0] if stack else None
+    stack.append([stage, 0])
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _, inner_peak = stack.pop()
+
+        peak_bytes = None
+        if tracing and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], inner_peak)
+            peak_bytes = max(0, peak - start_bytes)
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+
+        _emit(Span(stage, seconds, peak_bytes, parent))
+
+
+class TimedEffect:
+    """
+    Wraps an effect to record the time spent inside it as an ``effect/<name>`` span. Effects run lazily, so the time
+    is only known once the beats have been consumed, and it excludes the time spent producing the effect's input.
+    """
+
+    def __init__(self, effect: Effect):
+        """
+        :param effect: Effect to time.
+        """
+        self.effect = effect
+        self.__effect_name__ = getattr(effect, "__effect_name__", type(effect).__name__)
+        self.stage = "effect/" + self.__effect_name__
+
+    @property
+    def lookahead(self) -> t.Optional[int]:
+        return effect_lookahead(self.effect)
+
+    def __call__(self, beats: t.Iterable) -> t.Iterator:
+        upstream = 0.0
+
+        def source():
+            nonlocal upstream
+            it = iter(beats)
+            while True:
+                start = time.perf_counter()
+                try:
+                    beat = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    upstream += time.perf_counter() - start
+                yield beat
+
+        total = 0.0
+        start = time.perf_counter()
+        try:
+            output = iter(self.effect(source()))
+        finally:
+            total += time.perf_counter() - start
+
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    beat = next(output)
+                except StopIteration:
+                    return
+                finally:
+                    total += time.perf_counter() - start
+                yield beat
+        finally:
+            stack = _stack()
+            _emit(Span(self.stage, total - upstream, None, stack[-1][0] if stack else None))
+
+
+def timed_effects(effects: t.Iterable[Effect]) -> t.List[Effect]:
+    """
+    :param effects: Effects to time.
+    :return: The effects wrapped in :class:`TimedEffect` if any hooks are registered, otherwise unchanged.
+    """
+    effects = list(effects)
+    return [TimedEffect(effect) for effect in effects] if _hooks else effects
+
+
+class Recorder:
+    """
+    A hook that keeps every span it receives, for printing a breakdown once processing is done.
+    """
+
+    def __init__(self):
+        self.spans: t.List[Span] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def __enter__(self) -> "Recorder":
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_hook(self)
+
+    def totals(self) -> t.Dict[str, t.Tuple[t.Optional[str], int, float, t.Optional[int]]]:
+        """
+        :return: For each stage, in the order stages first finished: its parent, how many times it ran, the total time
+                 spent in it and its highest peak memory.
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+
+        for s in spans:
+            parent, count, seconds, peak = totals.get(s.stage, (s.parent, 0, 0.0, None))
+            if s.peak_bytes is not None:
+                peak = max(peak or 0, s.peak_bytes)
+            totals[s.stage] = (parent, count + 1, seconds + s.seconds, peak)
+
+        return totals
+
+    def format(self) -> str:
+        """
+        :return: A human-readable table of stage totals, with each stage indented under its parent.
+        """
+        totals = self.totals()
+
+        def depth(stage, visited=()):
+            parent = totals[stage][0]
+            if parent not in totals or parent in visited or parent == stage:
+                return 0
+            return depth(parent, visited + (stage,)) + 1
+
+        seen = set()
+
+        def ordered(parent):
+            for stage, (p, *_) in totals.items():
+                if stage not in seen and (p == parent or (parent is None and p not in totals)):
+                    seen.add(stage)
+                    yield stage
+                    yield from ordered(stage)
+
+        lines = [f"{'stage':<40} {'calls':>6} {'seconds':>10} {'peak MiB':>10}"]
+        stages = list(ordered(None))
+        for stage in stages + [stage for stage in totals if stage not in seen]:
+            _, count, seconds, peak = totals[stage]
+            name = "  " * depth(stage) + stage
+            peak = "" if peak is None else f"{peak / 2**20:.1f}"
+            lines.append(f"{name:<40} {count:>6} {seconds:>10.3f} {peak:>10}")
+
+        return "\n".join(lines)
@@ -0,0 +1,293 @@
+import copy
+import queue
+import threading
+import typing as t
+
+import numpy as np
+
+from .backend import Backend
+from .chain import ChainPlan
+from .effect_registry import Effect
+from .effects.periodic import PeriodicEffect
+
+# Sample rate and frame size the madmom beat tracking networks were trained with.
+_MADMOM_SAMPLE_RATE = 44100
+_MADMOM_FRAME_SIZE = 2048
+
+_END = object()
+
+
+class OnlineTracker(t.Protocol):
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Feeds the next block of audio to the tracker.
+
+        :param block: Audio with shape (samples, channels) or (samples,).
+        :return: Absolute sample positions of beats confirmed since the last call, in ascending order.
+        """
+        raise NotImplementedError()
+
+    def flush(self) -> np.ndarray:
+        """
+        :return: Absolute sample positions of any beats still pending once the input has ended.
+        """
+        raise NotImplementedError()
+
+
+def _mono(block: np.ndarray) -> np.ndarray:
+    block = np.asarray(block, dtype=np.float64)
+    return block.mean(axis=1) if block.ndim > 1 else block
+
+
+class MadmomOnlineTracker:
+    """
+    Tracks beats frame by frame with madmom's online RNN and DBN processors. Stateful layers are never reset, so each
+    frame costs about the same no matter how long the stream has been running, and beats are reported as soon as the
+    tracker commits to them.
+    """
+
+    def __init__(self, sample_rate: int, min_bpm: int = 55, max_bpm: int = 215, fps: int = 100, model_count: int = 1):
+        """
+        :param sample_rate: Sample rate of the incoming audio.
+        :param min_bpm: Minimum BPM.
+        :param max_bpm: Maximum BPM.
+        :param fps: Activation frames per second.
+        :param model_count: Number of RNN models in the ensemble.
+        """
+        from madmom.audio import Signal
+        from madmom.features.beats import DBNBeatTrackingProcessor, RNNBeatProcessor
+        from madmom.models import BEATS_LSTM
+
+        self._signal = Signal
+        self.sample_rate = sample_rate
+        self.processor = RNNBeatProcessor(online=True, fps=fps, nn_files=BEATS_LSTM[:model_count])
+        self.tracker = DBNBeatTrackingProcessor(min_bpm=min_bpm, max_bpm=max_bpm, fps=fps, online=True)
+
+        self._hop = _MADMOM_SAMPLE_RATE // fps
+        self._frame = np.zeros(_MADMOM_FRAME_SIZE, dtype=np.float64)
+        self._pending = np.zeros(0, dtype=np.float64)
+        self._received = 0
+
+    def _resample(self, mono: np.ndarray) -> np.ndarray:
+        if self.sample_rate == _MADMOM_SAMPLE_RATE:
+            return mono
+
+        # Linear interpolation is crude, but the network only looks at coarse spectral flux.
+        start = self._received / self.sample_rate
+        src = start + np.arange(len(mono)) / self.sample_rate
+        first = int(np.ceil(start * _MADMOM_SAMPLE_RATE))
+        last = int(np.ceil((start + len(mono) / self.sample_rate) * _MADMOM_SAMPLE_RATE))
+        return np.interp(np.arange(first, last) / _MADMOM_SAMPLE_RATE, src, mono)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        mono = _mono(block)
+        self._pending = np.concatenate((self._pending, self._resample(mono)))
+        self._received += len(mono)
+
+        beats = []
+        while len(self._pending) >= self._hop:
+            self._frame = np.concatenate((self._frame[self._hop :], self._pending[: self._hop]))
+            self._pending = self._pending[self._hop :]
+
+            activations = self.processor.process(
+                self._signal(self._frame, sample_rate=_MADMOM_SAMPLE_RATE), reset=False
+            )
+            beats.extend(self.tracker.process_online(activations, reset=False))
+
+        return (np.asarray(beats, dtype=np.float64) * self.sample_rate).astype(np.int64)
+
+    def flush(self) -> np.ndarray:
+        return np.zeros(0, dtype=np.int64)
+
+
+class WindowedTracker:
+    """
+    Tracks beats by running an offline backend over a sliding window of recent audio. A beat is only reported once it
+    is at least ``margin`` seconds older than the newest audio, so the backend has seen what comes after it. Works with
+    any backend, at the cost of analysing each stretch of audio several times.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        sample_rate: int,
+        window: float = 8.0,
+        hop: float = 1.0,
+        margin: float = 1.0,
+        max_bpm: int = 300,
+    ):
+        """
+        :param backend: Backend used to locate beats within the window.
+        :param sample_rate: Sample rate of the incoming audio.
+        :param window: Length of the analysed window, in seconds.
+        :param hop: How much new audio to wait for between analyses, in seconds.
+        :param margin: How far behind the newest audio a beat must be to be reported, in seconds.
+        :param max_bpm: Maximum BPM. Beats closer together than this allows are treated as duplicates.
+        """
+        if hop + margin > window:
+            raise ValueError(f"Window ({window}s) must be at least hop + margin ({hop + margin}s)")
+
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self._window = int(window * sample_rate)
+        self._hop = int(hop * sample_rate)
+        self._margin = int(margin * sample_rate)
+        self._min_interval = int(60 * sample_rate / max_bpm)
+
+        self._buffer = np.zeros(0, dtype=np.float64)
+        self._start = 0
+        self._since = 0
+        self._last = None
+
+    def _confirm(self, limit: int) -> np.ndarray:
+        if len(self._buffer) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        beats = []
+        for beat in np.asarray(self.backend.locate_beats(self._buffer, self.sample_rate)) + self._start:
+            if beat < limit and (self._last is None or beat - self._last >= self._min_interval):
+                beats.append(beat)
+                self._last = beat
+
+        return np.asarray(beats, dtype=np.int64)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        mono = _mono(block)
+        self._buffer = np.concatenate((self._buffer, mono))
+        self._since += len(mono)
+
+        excess = len(self._buffer) - self._window
+        if excess > 0:
+            self._buffer = self._buffer[excess:]
+            self._start += excess
+
+        if self._since < self._hop:
+            return np.zeros(0, dtype=np.int64)
+
+        self._since = 0
+        return self._confirm(self._start + len(self._buffer) - self._margin)
+
+    def flush(self) -> np.ndarray:
+        return self._confirm(self._start + len(self._buffer))
+
+
+def _live_effects(effects: t.Iterable[Effect], max_lookahead: int) -> t.List[Effect]:
+    # Periodic effects batch beats for throughput. Live, every beat should go out as soon as it can.
+    live = []
+    for effect in effects:
+        if isinstance(effect, PeriodicEffect) and effect.executor is None:
+            effect = copy.copy(effect)
+            effect.batch_size = 1
+        live.append(effect)
+
+    plan = ChainPlan(live)
+    if plan.lookahead is None:
+        names = ", ".join(getattr(e, "__effect_name__", type(e).__name__) for e in plan.unbounded)
+        raise ValueError(f"Effects {names} need the whole song, so they can't be applied to a live stream")
+    if plan.lookahead > max_lookahead:
+        raise ValueError(f"Effect chain reads {plan.lookahead} beats ahead, but at most {max_lookahead} are allowed")
+
+    return live
+
+
+def remix_stream(
+    blocks: t.Iterable[np.ndarray],
+    channels: int,
+    effects: t.Iterable[Effect],
+    tracker: OnlineTracker,
+    max_lookahead: int = 16,
+) -> t.Generator[np.ndarray, None, None]:
+    """
+    Remixes a live stream. Incoming audio is split into beats as the tracker finds them, and each beat is passed
+    through the effect chain as soon as it closes. Output therefore lags input by the beat in progress, the tracker's
+    own delay and the chain's look-ahead. Every effect in the chain must declare a bounded look-ahead.
+
+    :param blocks: Incoming audio blocks, each with shape (samples, channels).
+    :param channels: Number of audio channels.
+    :param effects: Effects to apply in order.
+    :param tracker: Online beat tracker for the stream's sample rate.
+    :param max_lookahead: Maximum number of beats the effect chain may hold back.
+    :return: A generator yielding remixed beats as they become available.
+    """
+    effects = _live_effects(effects, max_lookahead)
+    beats = queue.Queue(maxsize=max_lookahead + 1)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                beats.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def split():
+        try:
+            pending = []
+            pending_start = 0
+            received = 0
+
+            def close_beats(boundaries):
+                nonlocal pending, pending_start
+                for boundary in boundaries:
+                    if boundary <= pending_start or not pending:
+                        continue
+                    audio = np.concatenate(pending, axis=0)
+                    cut = min(int(boundary - pending_start), len(audio))
+                    put(audio[:cut])
+                    pending = [audio[cut:]]
+                    pending_start += cut
+
+            for block in blocks:
+                if stop.is_set():
+                    return
+                block = np.asarray(block).reshape(-1, channels)
+                pending.append(block)
+                received += len(block)
+                close_beats(tracker.process(block))
+
+            close_beats(tracker.flush())
+            if pending and received > pending_start:
+                put(np.concatenate(pending, axis=0))
+            put(_END)
+        except BaseException as e:
+            put(e)
+
+    def incoming():
+        while True:
+            item = beats.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    splitter = threading.Thread(target=split, daemon=True)
+    splitter.start()
+    try:
+        yield from ChainPlan(effects).run(incoming(), warn=False)
+    finally:
+        # The splitter may be blocked reading input, so it's left to notice this on its own rather than joined.
+        stop.set()
+
+
+def read_pcm_blocks(fp: t.BinaryIO, channels: int, block_frames: int = 4096) -> t.Generator[np.ndarray, None, None]:
+    """
+    Reads raw little-endian float64 PCM, as produced by ffmpeg's f64le format, in fixed-size blocks.
+
+    :param fp: Binary stream to read from.
+    :param channels: Number of interleaved channels.
+    :param block_frames: Number of samples per channel in each block. The last block may be shorter.
+    :return: A generator yielding blocks with shape (samples, channels).
+    """
+    frame_bytes = 8 * channels
+    leftover = b""
+    while True:
+        data = fp.read(block_frames * frame_bytes - len(leftover))
+        if not data:
+            break
+        data = leftover + data
+        usable = len(data) - len(data) % frame_bytes
+        leftover = data[usable:]
+        if usable:
+            yield np.frombuffer(data[:usable], dtype="<f8").reshape(-1, channels)
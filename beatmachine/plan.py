@@ -0,0 +1,139 @@
+import typing as t
+from functools import reduce
+
+import numpy as np
+
+from .analysis import Analysis
+from .beats import Beats, _load_audio
+from .effect_registry import Effect
+
+# Source regions closer together than this many seconds are decoded in one pass.
+_MERGE_GAP_SECONDS = 1.0
+
+
+def _index_beats(analysis: Analysis) -> t.Generator[np.ndarray, None, None]:
+    # Each sample is replaced by its 1-based position in the flattened (frames, channels) source, so 0 is free to mean
+    # silence. Effects move, slice and flip these exactly like audio.
+    channels = analysis.channels
+    for start, end in analysis.beat_ranges:
+        yield (np.arange(start * channels, end * channels, dtype=np.int64) + 1).reshape(-1, channels)
+
+
+def _to_runs(flat: np.ndarray) -> np.ndarray:
+    """
+    Compresses a sequence of indices into runs of constant stride.
+
+    :param flat: 1-D array of source indices.
+    :return: An array with shape (runs, 3) holding the start, step and length of each run.
+    """
+    runs = []
+    if len(flat) == 1:
+        runs.append((flat[0], 0, 1))
+    elif len(flat) > 1:
+        steps = np.diff(flat)
+        changes = np.flatnonzero(steps[1:] != steps[:-1]) + 1
+
+        start = 0
+        while start < len(flat):
+            if start == len(flat) - 1:
+                runs.append((flat[start], 0, 1))
+                break
+
+            i = np.searchsorted(changes, start, side="right")
+            end = changes[i] if i < len(changes) else len(steps)
+            runs.append((flat[start], steps[start], end - start + 1))
+            start = end + 1
+
+    return np.array(runs, dtype=np.int64).reshape(-1, 3)
+
+
+def _from_runs(runs: np.ndarray) -> np.ndarray:
+    lengths = runs[:, 2]
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(runs[:, 0], lengths) + np.repeat(runs[:, 1], lengths) * offsets
+
+
+def _read_frames(source: str, sample_rate: int, channels: int, start: int, stop: int) -> np.ndarray:
+    signal, _ = _load_audio(source, start / sample_rate, stop / sample_rate)
+    signal = np.asarray(signal).reshape(-1, channels)[: stop - start]
+    if len(signal) < stop - start:
+        signal = np.concatenate((signal, np.zeros((stop - start - len(signal), channels), dtype=signal.dtype)))
+    return signal
+
+
+class RenderPlan:
+    """
+    A RenderPlan describes an effected song as references into its source instead of audio. It is built by running
+    the effect chain over sample indices, which only works for effects that move, slice, flip, repeat or silence
+    samples. All built-in effects qualify. Any range of output beats can then be rendered by decoding just the source
+    regions it references.
+    """
+
+    def __init__(self, analysis: Analysis, effects: t.Iterable[Effect] = ()):
+        """
+        :param analysis: Analysis of the source song.
+        :param effects: Effects to apply in order.
+        """
+        self.analysis = analysis
+
+        effects = list(effects)
+        if any(getattr(effect, "reads_features", False) for effect in effects):
+            raise ValueError("Effect chain depends on how beats sound, so it can't be rendered from a plan")
+
+        limit = analysis.frames * analysis.channels
+        self._beats = []
+        for beat in reduce(lambda beats, effect: effect(beats), effects, _index_beats(analysis)):
+            beat = np.asarray(beat)
+            if beat.size and (not np.issubdtype(beat.dtype, np.integer) or beat.min() < 0 or beat.max() > limit):
+                raise ValueError("Effect chain changes sample values, so it can't be rendered from a plan")
+            self._beats.append(_to_runs(beat.reshape(-1).astype(np.int64)))
+
+        frames = np.array([runs[:, 2].sum() for runs in self._beats], dtype=np.int64) // analysis.channels
+        self._offsets = np.concatenate(([0], np.cumsum(frames)))
+
+    def __len__(self) -> int:
+        return len(self._beats)
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """
+        :return: The output sample offset where each beat starts, followed by the total output length.
+        """
+        return self._offsets
+
+    def render(self, start: int = 0, stop: int = None) -> Beats:
+        """
+        Renders output beats ``start`` up to, but not including, ``stop``. Only the source regions these beats
+        reference are decoded.
+
+        :param start: First output beat to render.
+        :param stop: Output beat to stop at. Defaults to the end of the song.
+        :return: A Beats object holding the rendered slice as a single beat.
+        """
+        analysis = self.analysis
+        channels = analysis.channels
+        selected = self._beats[start:stop]
+
+        flat = _from_runs(np.concatenate(selected)) if selected else np.zeros(0, dtype=np.int64)
+        output = np.zeros(len(flat), dtype=np.float64)
+
+        audible = flat > 0
+        if audible.any():
+            frames = np.unique((flat[audible] - 1) // channels)
+            gap = int(_MERGE_GAP_SECONDS * analysis.sample_rate)
+            splits = np.flatnonzero(np.diff(frames) > gap) + 1
+            region_starts = frames[np.concatenate(([0], splits))]
+            region_stops = frames[np.concatenate((splits - 1, [len(frames) - 1]))] + 1
+
+            regions = [
+                _read_frames(analysis.source, analysis.sample_rate, channels, lo, hi).reshape(-1)
+                for lo, hi in zip(region_starts, region_stops)
+            ]
+            packed_offsets = np.concatenate(([0], np.cumsum([len(r) for r in regions])))[:-1]
+            packed = np.concatenate(regions)
+
+            sources = flat[audible] - 1
+            region = np.searchsorted(region_starts * channels, sources, side="right") - 1
+            output[audible] = packed[packed_offsets[region] + sources - region_starts[region] * channels]
+
+        return Beats(analysis.sample_rate, channels, [output.reshape(-1, channels)])
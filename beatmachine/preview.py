@@ -0,0 +1,87 @@
+import os
+import typing as t
+
+from .backend import Backend
+from .beats import Beats
+from .effect_registry import Effect
+
+# Formats without a bitrate. Previews in these formats skip -b:a, so they can be written without ffmpeg.
+_LOSSLESS_FORMATS = {"wav", "flac", "aiff", "aif"}
+
+
+class Preview:
+    """
+    A Preview decodes and analyses only the beginning of a song, so effects can be auditioned quickly. The rest of the
+    song can be analysed later with :meth:`full`, which reuses the beats already located in the preview.
+    """
+
+    def __init__(self, song: str, beats: Beats, complete: bool, backend: Backend = None):
+        """
+        :param song: Path to the song being previewed.
+        :param beats: Beats located in the previewed window.
+        :param complete: Whether the window covered the entire song.
+        :param backend: Backend used to locate beats.
+        """
+        self.song = song
+        self.beats = beats
+        self.complete = complete
+        self.backend = backend
+
+    @staticmethod
+    def from_song(song: str, seconds: float = 30.0, backend: Backend = None) -> "Preview":
+        """
+        Analyses the first few seconds of a song.
+
+        :param song: Path to the song to preview.
+        :param seconds: Length of the previewed window, in seconds.
+        :param backend: Backend used to locate beats. Defaults to madmom.
+        :return: A new Preview.
+        """
+        if seconds <= 0:
+            raise ValueError(f"Preview length must be > 0, but was {seconds}")
+
+        beats = Beats.from_song(song, backend, stop=seconds)
+        samples = sum(len(b) for b in beats._beats)
+        complete = samples < round(seconds * beats.sample_rate)
+        return Preview(str(song), beats, complete, backend)
+
+    def render(
+        self,
+        effects: t.Iterable[Effect],
+        fp,
+        out_format: str = None,
+        bitrate: str = "64k",
+        extra_ffmpeg_args: t.List[str] = None,
+    ):
+        """
+        Applies effects to the previewed beats and encodes a low bitrate clip.
+
+        :param effects: Effects to apply in order.
+        :param fp: Filename or binary file-like object to write to.
+        :param out_format: Output format passed to ffmpeg. Required when writing to a file-like object.
+        :param bitrate: Audio bitrate of the clip. Ignored for lossless formats.
+        :param extra_ffmpeg_args: Additional arguments passed to ffmpeg.
+        """
+        name = out_format
+        if name is None and isinstance(fp, (str, os.PathLike)):
+            name = os.path.splitext(str(fp))[1].lstrip(".")
+
+        args = [] if (name or "").lower() in _LOSSLESS_FORMATS else ["-b:a", bitrate]
+        args += extra_ffmpeg_args or []
+        return self.beats.apply_all(*effects, warn=False).save(fp, out_format, args or None)
+
+    def full(self) -> Beats:
+        """
+        Analyses the remainder of the song and joins it with the previewed beats. The last previewed beat is usually
+        cut off by the end of the window, so it is analysed again along with the rest of the song.
+
+        :return: Beats for the entire song.
+        """
+        if self.complete:
+            return self.beats
+
+        settled = self.beats._beats[:-1]
+        offset = sum(len(b) for b in settled)
+
+        remainder = Beats.from_song(self.song, self.backend, start=offset / self.beats.sample_rate)
+        return Beats(self.beats.sample_rate, self.beats.channels, settled + list(remainder._beats))
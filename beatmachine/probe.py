@@ -0,0 +1,71 @@
+import json
+import subprocess
+import typing as t
+from pathlib import Path
+
+import soundfile
+
+
+class AudioInfo(t.NamedTuple):
+    """
+    Stream metadata for an audio file, read without decoding it.
+    """
+
+    duration: float
+    sample_rate: int
+    channels: int
+
+    @property
+    def frames(self) -> int:
+        """
+        :return: Number of samples per channel once decoded.
+        """
+        return int(round(self.duration * self.sample_rate))
+
+
+def _probe_with_ffprobe(path: Path) -> t.Optional[AudioInfo]:
+    cmd = [
+        # fmt: off
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=sample_rate,channels,duration:format=duration",
+        "-of", "json",
+        str(path),
+        # fmt: on
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True, timeout=30)
+        info = json.loads(result.stdout)
+        stream = info["streams"][0]
+        duration = stream.get("duration") or info["format"]["duration"]
+        return AudioInfo(float(duration), int(stream["sample_rate"]), int(stream["channels"]))
+    except (OSError, subprocess.SubprocessError, ValueError, KeyError, IndexError):
+        return None
+
+
+def _probe_with_soundfile(path: Path) -> t.Optional[AudioInfo]:
+    try:
+        info = soundfile.info(str(path))
+    except RuntimeError:
+        return None
+
+    return AudioInfo(info.duration, info.samplerate, info.channels)
+
+
+def probe_audio(path: t.Union[str, Path]) -> AudioInfo:
+    """
+    Reads the duration, sample rate and channel count of an audio file. Uses ffprobe when it is available, falling back
+    to the file header via libsndfile.
+
+    :param path: Audio file to probe.
+    :return: Stream metadata for the first audio stream.
+    :raises ValueError: If the file can't be probed by either method.
+    """
+    path = Path(path)
+    info = _probe_with_ffprobe(path) or _probe_with_soundfile(path)
+    if info is None:
+        raise ValueError(f"Couldn't read audio metadata from {path}")
+
+    return info
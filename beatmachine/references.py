@@ -0,0 +1,80 @@
+import threading
+import typing as t
+
+import numpy as np
+
+# One shared block of silence per dtype, so silenced beats keep the dtype of the song they came from.
+_silence: t.Dict[np.dtype, np.ndarray] = {}
+_silence_lock = threading.Lock()
+
+
+def silence(shape: t.Tuple[int, ...], dtype: np.dtype = np.float64) -> np.ndarray:
+    """
+    :param shape: Shape of the silent beat.
+    :param dtype: Data type of the silent beat, normally that of the beat it replaces.
+    :return: A read-only view of silence shared by every caller. The shared block grows to fit the longest beat asked
+             for, so silencing many beats costs no more memory than silencing the longest of them. Copy it before
+             writing to it.
+    """
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape))
+    block = _silence.get(dtype)
+    if block is None or len(block) < size:
+        with _silence_lock:
+            block = _silence.get(dtype)
+            if block is None or len(block) < size:
+                block = np.zeros(size, dtype=dtype)
+                block.flags.writeable = False
+                _silence[dtype] = block
+
+    return block[:size].reshape(shape)
+
+
+class RepeatedBeat:
+    """
+    A RepeatedBeat is a beat played several times in a row. It holds a reference to the beat instead of a copy, and
+    behaves like an ndarray of the repeated audio when one is needed. Encoders write each repetition in turn with
+    :func:`beat_blocks`, so the repeated audio is never held in memory all at once.
+    """
+
+    def __init__(self, beat, times: int):
+        """
+        :param beat: Beat to repeat.
+        :param times: Number of times to play it.
+        """
+        self.beat = beat
+        self.times = times
+
+    @property
+    def shape(self) -> t.Tuple[int, ...]:
+        return (len(self.beat) * self.times,) + tuple(np.shape(self.beat)[1:])
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.beat.dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        repeated = np.concatenate([np.asarray(self.beat)] * self.times, axis=0)
+        return repeated if dtype is None else repeated.astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        return np.asarray(self)[key]
+
+
+def beat_blocks(beat) -> t.Generator[np.ndarray, None, None]:
+    """
+    :param beat: An ndarray or a :class:`RepeatedBeat`.
+    :return: A generator yielding the beat's audio as consecutive ndarrays, without materializing repetitions.
+    """
+    if isinstance(beat, RepeatedBeat):
+        for _ in range(beat.times):
+            yield from beat_blocks(beat.beat)
+    else:
+        yield np.asarray(beat)
@@ -0,0 +1,249 @@
+import concurrent.futures
+import math
+import os
+import subprocess
+import typing as t
+
+import numpy as np
+
+from .buffers import concatenate
+
+# Formats that can be encoded in pieces and joined by concatenating their frames, mapped from extension / ffmpeg
+# format name to the raw stream muxer.
+_SEGMENTED_FORMATS = {"mp3": "mp3", "aac": "adts", "adts": "adts"}
+
+# Arguments that keep each muxer's output free of headers and make frames independent of their neighbours. The joined
+# MP3 stream gets its own gapless header instead, see _mp3_info_frame.
+_MUXER_ARGS = {"mp3": ["-write_xing", "0", "-id3v2_version", "0", "-reservoir", "0"], "adts": []}
+
+# Encoder priming delay in samples, as reported by ffmpeg's libmp3lame and aac encoders.
+_ENCODER_DELAY = {"mp3": 1105, "adts": 1024}
+
+# Samples of delay every MP3 decoder adds. LAME headers store the delay and padding without it.
+_MP3_DECODER_DELAY = 529
+
+# Extra frames of real audio encoded on either side of each segment and then dropped, so the frames that overlap a
+# segment boundary are encoded from the same audio on both sides.
+_OVERLAP_FRAMES = 2
+
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# Size of the Xing tag with frame count, byte count, table of contents and quality, and of the LAME extension after it.
+_XING_SIZE = 120
+_LAME_SIZE = 36
+
+
+def segmented_format(fp, out_format: str = None) -> t.Optional[str]:
+    """
+    :param fp: Filename or file-like object.
+    :param out_format: Explicit format name, as passed to ffmpeg.
+    :return: The ffmpeg muxer to encode segments with, or None if the format can't be encoded in segments.
+    """
+    name = out_format
+    if name is None and isinstance(fp, (str, os.PathLike)):
+        name = os.path.splitext(str(fp))[1].lstrip(".")
+
+    return _SEGMENTED_FORMATS.get((name or "").lower())
+
+
+def _frame_size(muxer: str, sample_rate: int) -> int:
+    if muxer == "mp3":
+        return 1152 if sample_rate >= 32000 else 576
+    return 1024
+
+
+def _mp3_frame_length(header: bytes) -> int:
+    version = (header[1] >> 3) & 0x3
+    layer = (header[1] >> 1) & 0x3
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x3
+    if version not in _MP3_SAMPLE_RATES or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        raise ValueError(f"Invalid MP3 frame header {header[:4].hex()}")
+
+    bitrate = _MP3_BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x1
+    return (144 if version == 3 else 72) * bitrate // sample_rate + padding
+
+
+def _crc16(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def _mp3_info_frame(header: bytes, frames: int, size: int, delay: int, padding: int) -> bytes:
+    """
+    Builds a silent MP3 frame holding a Xing "Info" tag and a LAME extension, which decoders read to trim the encoder
+    delay and padding off a stream.
+
+    :param header: Header of the stream's first frame, whose version, sample rate and channel mode are copied.
+    :param frames: Number of audio frames that follow.
+    :param size: Size in bytes of the audio frames that follow.
+    :param delay: Samples to drop from the start of the stream, excluding the decoder delay.
+    :param padding: Samples to drop from the end of the stream.
+    :return: The encoded frame.
+    """
+    version = (header[1] >> 3) & 0x3
+    mono = (header[3] >> 6) == 0x3
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    needed = 4 + side_info + _XING_SIZE + _LAME_SIZE
+
+    # The lowest bitrate whose frames fit both tags, without padding and without a CRC.
+    for bitrate_index in range(1, 15):
+        frame_header = bytes([0xFF, header[1] | 0x1, (bitrate_index << 4) | (header[2] & 0x0C), header[3]])
+        length = _mp3_frame_length(frame_header)
+        if length >= needed:
+            break
+
+    total = length + size
+    toc = bytes(min(255, i * 256 // 100) for i in range(100))
+    xing = b"Info" + (0x0F).to_bytes(4, "big") + frames.to_bytes(4, "big") + total.to_bytes(4, "big") + toc + bytes(4)
+    lame = (
+        b"LAME3.100"
+        + bytes([0x01, 0])  # Tag revision 0, constant bitrate; no lowpass.
+        + bytes(8)  # Peak amplitude and replay gain.
+        + bytes(2)  # Encoding flags and minimum bitrate.
+        + ((min(delay, 0xFFF) << 12) | min(padding, 0xFFF)).to_bytes(3, "big")
+        + bytes(4)  # Misc flags, MP3 gain, surround and preset.
+        + total.to_bytes(4, "big")
+        + bytes(2)  # Music CRC, which decoders don't check.
+    )
+
+    frame = frame_header + bytes(side_info) + xing + lame
+    frame += _crc16(frame).to_bytes(2, "big")
+    return frame + bytes(length - len(frame))
+
+
+def _frame_offsets(data: bytes, muxer: str) -> t.List[int]:
+    """
+    Splits a raw MP3 or ADTS stream into frames.
+
+    :param data: Encoded stream without any container headers.
+    :param muxer: Either "mp3" or "adts".
+    :return: Byte offset of each frame.
+    """
+    offsets = []
+    pos = 0
+    while pos + 7 <= len(data):
+        if muxer == "mp3" and data[pos] == 0xFF and data[pos + 1] & 0xE0 == 0xE0:
+            length = _mp3_frame_length(data[pos : pos + 4])
+        elif muxer == "adts" and data[pos] == 0xFF and data[pos + 1] & 0xF0 == 0xF0:
+            length = ((data[pos + 3] & 0x3) << 11) | (data[pos + 4] << 3) | (data[pos + 5] >> 5)
+        else:
+            raise ValueError(f"Lost frame sync at byte {pos} of {muxer} stream")
+
+        if length <= 0:
+            raise ValueError(f"Invalid {muxer} frame at byte {pos}")
+
+        offsets.append(pos)
+        pos += length
+
+    return offsets
+
+
+def _split_points(beat_offsets: np.ndarray, segments: int, frame_size: int) -> t.List[int]:
+    """
+    Picks segment boundaries near beat boundaries, snapped to whole encoder frames.
+
+    :param beat_offsets: Sample offset where each beat starts, followed by the total length.
+    :param segments: Desired number of segments.
+    :param frame_size: Encoder frame size in samples.
+    :return: Sample offsets of segment boundaries, starting with 0 and ending with the total length.
+    """
+    total = int(beat_offsets[-1])
+    points = {0, total}
+    for k in range(1, segments):
+        target = total * k / segments
+        beat = beat_offsets[np.argmin(np.abs(beat_offsets - target))]
+        point = int(round(beat / frame_size)) * frame_size
+        if 0 < point < total:
+            points.add(point)
+
+    return sorted(points)
+
+
+def _encode_segment(
+    cmd: t.List[str], parts: t.List[np.ndarray], muxer: str, skip_frames: int, keep_frames: t.Optional[int]
+) -> bytes:
+    result = subprocess.run(cmd, input=np.concatenate(parts).tobytes(), stdout=subprocess.PIPE, check=True)
+    offsets = _frame_offsets(result.stdout, muxer) + [len(result.stdout)]
+    first = min(skip_frames, len(offsets) - 1)
+    last = len(offsets) - 1 if keep_frames is None else min(first + keep_frames, len(offsets) - 1)
+    return result.stdout[offsets[first] : offsets[last]]
+
+
+def save_segmented(beats, fp, muxer: str, segments: int, extra_ffmpeg_args: t.List[str] = None):
+    """
+    Encodes a Beats object as several segments in parallel and joins them into one stream.
+
+    Segments are cut near beat boundaries, on whole encoder frames. Each segment is encoded with a few frames of the
+    neighbouring audio on either side. The frames covering that overlap and the encoder's priming delay are dropped
+    again, so every segment starts exactly where the previous one ended. The encoders run as separate ffmpeg
+    processes, so a thread pool is enough to keep every core busy. MP3 segments are encoded without the bit reservoir
+    because a segment's first frame can't borrow bits from a frame that belongs to another encoder.
+
+    The joined MP3 stream starts with a LAME header that tells decoders how much delay and padding to trim, so it decodes
+    to exactly the original length. Raw AAC streams have no such header, so they still decode with the encoder's
+    padding at the end.
+
+    :param beats: Beats to encode.
+    :param fp: Filename or binary file-like object to write to.
+    :param muxer: ffmpeg muxer returned by :func:`segmented_format`.
+    :param segments: Number of segments to encode concurrently.
+    :param extra_ffmpeg_args: Additional arguments passed to ffmpeg.
+    """
+    beat_list = list(beats._beats)
+    pcm = concatenate(beat_list, np.float64).reshape(-1, beats.channels)
+    frame_size = _frame_size(muxer, beats.sample_rate)
+    skip_frames = math.ceil(_ENCODER_DELAY[muxer] / frame_size) + _OVERLAP_FRAMES
+    preroll = skip_frames * frame_size - _ENCODER_DELAY[muxer]
+
+    beat_offsets = np.concatenate(([0], np.cumsum([len(b) for b in beat_list])))
+    points = _split_points(beat_offsets, segments, frame_size)
+
+    args = _MUXER_ARGS[muxer] + (extra_ffmpeg_args or [])
+    cmd = beats._create_ffmpeg_command("pipe:", muxer, args)
+
+    def segment_parts(start, stop):
+        lead = pcm[max(0, start - preroll) : start]
+        silence = np.zeros((preroll - len(lead), beats.channels), dtype=pcm.dtype)
+        return [silence, lead, pcm[start : stop + _OVERLAP_FRAMES * frame_size]]
+
+    # MP3 keeps one priming frame in front of the audio, which the gapless header tells decoders to drop again.
+    lead_frames = 1 if muxer == "mp3" else 0
+
+    # Encoders flush extra frames when their input ends, so every segment but the last is cut to exactly its length.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(points) - 1) as executor:
+        futures = []
+        for start, stop in zip(points[:-1], points[1:]):
+            leading = lead_frames if start == 0 else 0
+            keep_frames = None if stop == points[-1] else (stop - start) // frame_size + leading
+            futures.append(
+                executor.submit(
+                    _encode_segment, cmd, segment_parts(start, stop), muxer, skip_frames - leading, keep_frames
+                )
+            )
+        encoded = [f.result() for f in futures]
+
+    if muxer == "mp3":
+        frames = sum(len(_frame_offsets(chunk, muxer)) for chunk in encoded)
+        delay = lead_frames * frame_size - _MP3_DECODER_DELAY
+        padding = frames * frame_size - delay - len(pcm)
+        info = _mp3_info_frame(encoded[0][:4], frames, sum(len(chunk) for chunk in encoded), delay, max(0, padding))
+        encoded.insert(0, info)
+
+    if isinstance(fp, (str, os.PathLike)):
+        with open(fp, "wb") as out:
+            for chunk in encoded:
+                out.write(chunk)
+    else:
+        for chunk in encoded:
+            fp.write(chunk)
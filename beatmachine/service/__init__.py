@@ -0,0 +1,8 @@
+"""
+The `service` module contains building blocks for running beatmachine behind a web server.
+"""
+
+from .admission import AdmissionController, AdmissionRejected, estimate_peak_memory
+from .janitor import Janitor
+from .metrics import Histogram, Metrics
+from .tiers import TIERS, QualityTier, TierSelector
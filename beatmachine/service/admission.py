@@ -0,0 +1,139 @@
+import contextlib
+import math
+import threading
+import time
+import typing as t
+
+from ..probe import AudioInfo
+
+# Decoded audio is held as float64 (see beats._load_audio).
+DECODED_SAMPLE_BYTES = 8
+
+# Peak memory as a multiple of the decoded signal size. Analysis keeps the signal plus madmom's resampled mono copy and
+# spectrogram stack; rendering keeps the signal, the consolidated output and the bytes handed to ffmpeg.
+ANALYSIS_OVERHEAD = 1.5
+RENDER_OVERHEAD = 3.0
+
+# Fixed cost per job that doesn't scale with the song (models, codec buffers, interpreter garbage).
+BASE_JOB_BYTES = 64 * 1024 * 1024
+
+
+def estimate_peak_memory(info: AudioInfo) -> int:
+    """
+    Estimates the peak memory used to analyse and render a song.
+
+    :param info: Probed stream metadata of the uploaded song.
+    :return: Estimated peak memory use in bytes.
+    """
+    decoded_bytes = info.frames * info.channels * DECODED_SAMPLE_BYTES
+    return BASE_JOB_BYTES + int(decoded_bytes * max(ANALYSIS_OVERHEAD, RENDER_OVERHEAD))
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a job can't be admitted. ``retry_after`` is a hint in seconds, or None if the job will never fit.
+    """
+
+    def __init__(self, message: str, retry_after: t.Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admits jobs against a memory budget. Jobs that fit run immediately, jobs that would exceed the budget wait in a
+    short bounded queue, and everything else is rejected up front instead of running the worker out of memory.
+    """
+
+    def __init__(self, budget_bytes: int, max_waiting: int = 2, wait_timeout: float = 2.0):
+        """
+        :param budget_bytes: Total estimated memory that admitted jobs may use at once.
+        :param max_waiting: How many jobs may wait for memory to free up before new jobs are rejected.
+        :param wait_timeout: How long, in seconds, a waiting job may wait before it is rejected. The caller's thread is
+                             blocked while it waits, so keep this short enough that waiting never costs more than a
+                             rejection and a retry.
+        """
+        if budget_bytes <= 0:
+            raise ValueError(f"Memory budget must be > 0, but was {budget_bytes}")
+
+        self.budget_bytes = budget_bytes
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._running = 0
+        self._waiting = 0
+        self._avg_job_seconds = 30.0
+
+    @property
+    def in_use(self) -> int:
+        """
+        :return: Estimated memory reserved by running jobs, in bytes.
+        """
+        return self._in_use
+
+    @property
+    def running(self) -> int:
+        """
+        :return: Number of admitted jobs.
+        """
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        """
+        :return: Number of jobs waiting for memory.
+        """
+        return self._waiting
+
+    def retry_after(self) -> int:
+        """
+        :return: Suggested number of seconds a rejected client should wait before retrying.
+        """
+        return max(1, math.ceil(self._avg_job_seconds * (1 + self._waiting)))
+
+    def _fits(self, estimate: int) -> bool:
+        return self._in_use + estimate <= self.budget_bytes
+
+    @contextlib.contextmanager
+    def admit(self, estimate: int) -> t.Iterator[None]:
+        """
+        Reserves memory for the duration of a job. Use as a context manager around the job.
+
+        :param estimate: Estimated peak memory of the job, in bytes.
+        :raises AdmissionRejected: If the job is larger than the budget, the wait queue is full, or memory didn't free
+                                   up in time.
+        """
+        if estimate > self.budget_bytes:
+            raise AdmissionRejected(
+                f"Job needs an estimated {estimate} bytes, which exceeds the memory budget of {self.budget_bytes}"
+            )
+
+        with self._cond:
+            if not self._fits(estimate):
+                if self._waiting >= self.max_waiting:
+                    raise AdmissionRejected("Too many jobs are waiting for memory", self.retry_after())
+
+                self._waiting += 1
+                try:
+                    admitted = self._cond.wait_for(lambda: self._fits(estimate), timeout=self.wait_timeout)
+                finally:
+                    self._waiting -= 1
+
+                if not admitted:
+                    raise AdmissionRejected("Timed out waiting for memory", self.retry_after())
+
+            self._in_use += estimate
+            self._running += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._cond:
+                self._in_use -= estimate
+                self._running -= 1
+                self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+                self._cond.notify_all()
@@ -0,0 +1,177 @@
+import collections
+import contextlib
+import logging
+import os
+import threading
+import time
+import typing as t
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry(t.NamedTuple):
+    path: str
+    size: int
+    mtime: float
+
+
+class Janitor:
+    """
+    Deletes old files from a set of directories on a background thread, so requests never pay for scanning them.
+    Files older than ``max_age`` are removed on every sweep, and if the directories still hold more than
+    ``max_total_bytes`` the oldest files go next. Files held with :meth:`hold` or :meth:`protect` belong to jobs that
+    are still running or streaming their result, and are never removed, however old they are.
+    """
+
+    def __init__(
+        self,
+        folders: t.Iterable[t.Union[str, os.PathLike]],
+        max_age: float = 300.0,
+        max_total_bytes: t.Optional[int] = None,
+        interval: float = 30.0,
+    ):
+        """
+        :param folders: Directories to clean. Subdirectories are left alone.
+        :param max_age: Age in seconds, by modification time, after which files are removed.
+        :param max_total_bytes: Most space the files in all folders may take up, or None for no limit.
+        :param interval: Seconds between sweeps.
+        """
+        if max_age < 0:
+            raise ValueError(f"max_age must be >= 0, but was {max_age}")
+        if max_total_bytes is not None and max_total_bytes < 0:
+            raise ValueError(f"max_total_bytes must be >= 0, but was {max_total_bytes}")
+        if interval <= 0:
+            raise ValueError(f"interval must be > 0, but was {interval}")
+
+        self.folders = [os.fspath(folder) for folder in folders]
+        self.max_age = max_age
+        self.max_total_bytes = max_total_bytes
+        self.interval = interval
+
+        self.total_bytes = 0
+        self.removed_files = 0
+        self.removed_bytes = 0
+
+        self._held: t.Counter[str] = collections.Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+
+    def hold(self, *paths: t.Union[str, os.PathLike]):
+        """
+        Keeps files from being removed until they are released. Holds are counted, so a file held twice must be
+        released twice.
+
+        :param paths: Files to keep. They don't have to exist yet.
+        """
+        with self._lock:
+            self._held.update(os.path.abspath(path) for path in paths)
+
+    def release(self, *paths: t.Union[str, os.PathLike]):
+        """
+        :param paths: Files previously passed to :meth:`hold`.
+        """
+        with self._lock:
+            self._held.subtract(os.path.abspath(path) for path in paths)
+            self._held += collections.Counter()
+
+    @contextlib.contextmanager
+    def protect(self, *paths: t.Union[str, os.PathLike]) -> t.Iterator[None]:
+        """
+        Holds files for the duration of a block.
+
+        :param paths: Files to keep.
+        """
+        self.hold(*paths)
+        try:
+            yield
+        finally:
+            self.release(*paths)
+
+    def _scan(self) -> t.List[_Entry]:
+        entries = []
+        for folder in self.folders:
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                entries.append(_Entry(os.path.abspath(entry.path), stat.st_size, stat.st_mtime))
+                        except FileNotFoundError:
+                            pass
+            except FileNotFoundError:
+                pass
+        return entries
+
+    def _remove(self, entry: _Entry) -> bool:
+        with self._lock:
+            # Checked under the lock, so a file can't be held between deciding to remove it and removing it.
+            if self._held[entry.path]:
+                return False
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                return True
+            except OSError as e:
+                logger.warning(f"Could not remove {entry.path}: {e}")
+                return False
+
+            self.removed_files += 1
+            self.removed_bytes += entry.size
+        return True
+
+    def sweep(self, now: float = None) -> t.List[str]:
+        """
+        Removes expired files, then the oldest files until the folders fit in the size quota.
+
+        :param now: Current time, as returned by :func:`time.time`.
+        :return: Paths of the files removed.
+        """
+        now = time.time() if now is None else now
+        entries = sorted(self._scan(), key=lambda entry: entry.mtime)
+        total = sum(entry.size for entry in entries)
+        removed = []
+
+        for entry in entries:
+            expired = now - entry.mtime > self.max_age
+            over_quota = self.max_total_bytes is not None and total > self.max_total_bytes
+            if not expired and not over_quota:
+                # Entries are oldest first, so nothing after this one is due either.
+                break
+
+            if self._remove(entry):
+                total -= entry.size
+                removed.append(entry.path)
+
+        self.total_bytes = total
+        return removed
+
+    def _run(self):
+        while not self._wake.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Cleanup error: {e}")
+
+    def start(self):
+        """
+        Starts sweeping in the background, unless this process is already doing so. Threads don't survive a fork, so
+        servers that import the app before forking workers should call this from each worker.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._wake.clear()
+            self._thread = threading.Thread(target=self._run, name="beatmachine-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops sweeping and waits for the current sweep to finish.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._wake.set()
+        if thread is not None:
+            thread.join()
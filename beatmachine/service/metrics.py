@@ -0,0 +1,137 @@
+import bisect
+import threading
+import typing as t
+
+from ..instrumentation import Span
+
+# Upper bounds in seconds. Stages range from milliseconds (effects) to minutes (analysis of a long song).
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _labels(names: t.Sequence[str], values: t.Sequence[str], **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """
+    A Prometheus histogram, with one series per combination of label values.
+    """
+
+    def __init__(
+        self, name: str, documentation: str, labels: t.Sequence[str] = (), buckets: t.Sequence[float] = DEFAULT_BUCKETS
+    ):
+        """
+        :param name: Metric name.
+        :param documentation: Help text.
+        :param labels: Label names.
+        :param buckets: Upper bounds of the buckets, in ascending order. A +Inf bucket is always added.
+        """
+        if list(buckets) != sorted(buckets):
+            raise ValueError(f"Buckets must be in ascending order, but were {buckets}")
+
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: t.Dict[t.Tuple[str, ...], t.List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        """
+        :param value: Observed value.
+        :param label_values: One value per label name.
+        """
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"Expected values for labels {self.labels}, but got {label_values}")
+
+        with self._lock:
+            series = self._series.setdefault(label_values, [[0] * (len(self.buckets) + 1), 0.0])
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> t.List[str]:
+        """
+        :return: Lines of the Prometheus text exposition format.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((values, list(counts), total) for values, (counts, total) in self._series.items())
+
+        for values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, le=le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+
+        return lines
+
+
+class Metrics:
+    """
+    Collects per-stage timings and request latencies, plus any number of gauges and counters read when scraped, and
+    renders them in the Prometheus text format. Register an instance with :func:`beatmachine.instrumentation.add_hook`
+    to time stages. Metrics are kept per process, so each server worker reports its own.
+    """
+
+    def __init__(self, buckets: t.Sequence[float] = DEFAULT_BUCKETS):
+        """
+        :param buckets: Histogram bucket upper bounds in seconds.
+        """
+        self.stages = Histogram(
+            "beatmachine_stage_seconds", "Time spent in each processing stage.", ("stage",), buckets
+        )
+        self.requests = Histogram(
+            "beatmachine_request_seconds", "Time to process a request, by response status.", ("status",), buckets
+        )
+        # Metric name -> (type, help text, function returning the current value).
+        self._readings: t.Dict[str, t.Tuple[str, str, t.Callable[[], float]]] = {}
+
+    def __call__(self, span: Span):
+        self.stages.observe(span.seconds, span.stage)
+
+    def observe_request(self, seconds: float, status: int):
+        """
+        :param seconds: Time taken to produce the response.
+        :param status: HTTP status code of the response.
+        """
+        self.requests.observe(seconds, str(status))
+
+    def gauge(self, name: str, documentation: str, read: t.Callable[[], float]):
+        """
+        Adds a gauge whose value is read each time metrics are rendered.
+
+        :param name: Metric name.
+        :param documentation: Help text.
+        :param read: Function returning the current value.
+        """
+        self._readings[name] = ("gauge", documentation, read)
+
+    def counter(self, name: str, documentation: str, read: t.Callable[[], float]):
+        """
+        Adds a counter whose value is read each time metrics are rendered. Unlike a gauge, its value must never
+        decrease while the process is running.
+
+        :param name: Metric name, which must end in ``_total``.
+        :param documentation: Help text.
+        :param read: Function returning the current total.
+        """
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter names must end in _total, but got {name}")
+
+        self._readings[name] = ("counter", documentation, read)
+
+    def render(self) -> str:
+        """
+        :return: Every metric in the Prometheus text exposition format.
+        """
+        lines = self.stages.render() + self.requests.render()
+        for name, (kind, documentation, read) in self._readings.items():
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {read()}"]
+        return "\n".join(lines) + "\n"
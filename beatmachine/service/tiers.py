@@ -0,0 +1,106 @@
+import collections
+import threading
+import typing as t
+
+import numpy as np
+
+from ..backend import Backend
+from ..backends.madmom import MadmomDbnBackend
+
+
+class QualityTier(t.NamedTuple):
+    """
+    A named set of analysis settings. Cheaper tiers use fewer RNN models and a narrower tempo range, which shrinks the
+    DBN state space. The frame rate stays at 100 fps because the bundled models were trained at that rate.
+    """
+
+    name: str
+    model_count: int
+    min_bpm: int
+    max_bpm: int
+    fps: int = 100
+
+    def create_backend(self) -> Backend:
+        return MadmomDbnBackend(min_bpm=self.min_bpm, max_bpm=self.max_bpm, fps=self.fps, model_count=self.model_count)
+
+
+# Ordered from most to least expensive.
+TIERS = {
+    "accurate": QualityTier("accurate", model_count=4, min_bpm=55, max_bpm=215),
+    "standard": QualityTier("standard", model_count=2, min_bpm=60, max_bpm=200),
+    "fast": QualityTier("fast", model_count=1, min_bpm=70, max_bpm=180),
+}
+
+
+class TierSelector:
+    """
+    Picks a quality tier from the current load. Every job already waiting or running degrades the tier by one step,
+    and so does a recent p95 latency above the target. Backends are built once per tier and reused, since loading
+    models is expensive.
+    """
+
+    def __init__(
+        self,
+        tiers: t.Sequence[QualityTier] = tuple(TIERS.values()),
+        target_latency: float = 60.0,
+        window: int = 20,
+    ):
+        """
+        :param tiers: Tiers to choose from, ordered from most to least expensive.
+        :param target_latency: Latency in seconds above which the selector degrades quality.
+        :param window: How many recent job latencies to consider.
+        """
+        if not tiers:
+            raise ValueError("At least one quality tier is required")
+
+        self.tiers = list(tiers)
+        self.target_latency = target_latency
+        self._latencies = collections.deque(maxlen=window)
+        self._backends = {}
+        self._lock = threading.Lock()
+        # Separate from _lock, which is held while a backend loads its models
+        self._latency_lock = threading.Lock()
+
+    def record_latency(self, seconds: float):
+        """
+        Records how long a finished job took.
+
+        :param seconds: Job latency in seconds.
+        """
+        with self._latency_lock:
+            self._latencies.append(seconds)
+
+    def recent_latency(self) -> t.Optional[float]:
+        """
+        :return: The p95 of recent job latencies, or None if nothing has been recorded yet.
+        """
+        with self._latency_lock:
+            latencies = list(self._latencies)
+        if not latencies:
+            return None
+        return float(np.percentile(latencies, 95))
+
+    def select(self, queue_depth: int) -> QualityTier:
+        """
+        Picks a tier for a new job.
+
+        :param queue_depth: Number of jobs already waiting or running.
+        :return: The tier to analyse the new job with.
+        """
+        level = max(0, queue_depth)
+
+        latency = self.recent_latency()
+        if latency is not None and latency > self.target_latency:
+            level += 1
+
+        return self.tiers[min(level, len(self.tiers) - 1)]
+
+    def backend(self, tier: QualityTier) -> Backend:
+        """
+        :param tier: Tier to get a backend for.
+        :return: A backend configured for the given tier, shared by every job thread.
+        """
+        with self._lock:
+            if tier.name not in self._backends:
+                self._backends[tier.name] = tier.create_backend()
+            return self._backends[tier.name]
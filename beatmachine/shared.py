@@ -0,0 +1,131 @@
+import typing as t
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# The boundary array starts on a multiple of this many bytes after the audio.
+_ALIGNMENT = 16
+
+
+class SharedBeatsHandle(t.NamedTuple):
+    """
+    Everything a consumer needs to attach to beats published with :class:`SharedBeats`. Handles are small, so they are
+    cheap to pickle and send to another process.
+    """
+
+    name: str
+    sample_rate: int
+    channels: int
+    shape: t.Tuple[int, ...]
+    dtype: str
+    beat_count: int
+
+    @property
+    def audio_bytes(self) -> int:
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    @property
+    def boundaries_offset(self) -> int:
+        return -(-self.audio_bytes // _ALIGNMENT) * _ALIGNMENT
+
+
+def _release(segment: shared_memory.SharedMemory):
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedBeats:
+    """
+    Publishes beats in a shared memory segment: one block of audio followed by the sample offsets where beats start.
+    Other processes attach to it with :meth:`Beats.from_shared` and get read-only views of the beats without copying
+    or unpickling any audio.
+
+    The publisher owns the segment and unlinks it when closed or garbage collected. Consumers that have already
+    attached keep their views until they drop them, so the segment can be closed as soon as every consumer has
+    attached. If the publishing process dies, multiprocessing's resource tracker unlinks the segment once the
+    processes sharing it have exited.
+    """
+
+    def __init__(self, sample_rate: int, channels: int, beats: t.Iterable[np.ndarray]):
+        """
+        :param sample_rate: Audio sample rate.
+        :param channels: Number of audio channels.
+        :param beats: Beats to publish.
+        """
+        beats = [np.asarray(beat) for beat in beats]
+        lengths = np.fromiter((len(beat) for beat in beats), dtype=np.int64, count=len(beats))
+        if beats:
+            dtype = np.result_type(*beats)
+            shape = (int(lengths.sum()),) + beats[0].shape[1:]
+        else:
+            dtype, shape = np.dtype(np.float64), (0, channels)
+
+        boundaries = np.cumsum(lengths[:-1])
+        handle = SharedBeatsHandle("", sample_rate, channels, shape, dtype.str, len(beats))
+        size = handle.boundaries_offset + boundaries.nbytes
+
+        self._segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.handle = handle._replace(name=self._segment.name)
+        self._finalizer = weakref.finalize(self, _release, self._segment)
+
+        audio = np.ndarray(shape, dtype=dtype, buffer=self._segment.buf)
+        offset = 0
+        for beat, length in zip(beats, lengths):
+            audio[offset : offset + length] = beat
+            offset += length
+
+        np.ndarray(boundaries.shape, np.int64, self._segment.buf, handle.boundaries_offset)[:] = boundaries
+        del audio
+
+    def close(self):
+        """
+        Unlinks the segment. Processes that have already attached can keep using their views.
+        """
+        self._finalizer()
+
+    def __enter__(self) -> "SharedBeats":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Attachment:
+    """
+    Keeps an attached segment mapped for as long as any array viewing it exists. Arrays are built from the segment's
+    address rather than its buffer, so they hold this object instead of a buffer export that would stop the segment
+    from ever being closed.
+    """
+
+    def __init__(self, segment: shared_memory.SharedMemory, offset: int, shape: t.Tuple[int, ...], dtype: np.dtype):
+        self._segment = segment
+        address = np.frombuffer(segment.buf, dtype=np.uint8, count=1).ctypes.data
+        self.__array_interface__ = {
+            "shape": shape,
+            "typestr": np.dtype(dtype).str,
+            "data": (address + offset, True),
+            "version": 3,
+        }
+
+
+def attach(handle: SharedBeatsHandle) -> t.Tuple[np.ndarray, np.ndarray]:
+    """
+    :param handle: Handle of the published beats.
+    :return: Read-only views of the shared audio and of the sample offsets where beats start.
+    """
+    try:
+        # Only the publisher should unlink the segment, so consumers don't register it for cleanup.
+        segment = shared_memory.SharedMemory(handle.name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attachment is registered. Processes started by multiprocessing share their parent's
+        # resource tracker, which only cleans up once they have all exited, so this is harmless for worker pools.
+        segment = shared_memory.SharedMemory(handle.name)
+    audio = np.asarray(_Attachment(segment, 0, handle.shape, np.dtype(handle.dtype)))
+    boundaries = np.asarray(
+        _Attachment(segment, handle.boundaries_offset, (max(handle.beat_count - 1, 0),), np.dtype(np.int64))
+    )
+    return audio, boundaries
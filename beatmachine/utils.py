@@ -1,3 +1,4 @@
+import hashlib
 import itertools
 import typing as t
 
@@ -6,3 +7,16 @@ def chunks(iterable: t.Iterable[t.T], size: int) -> t.Generator[t.List[t.T], Non
     iterator = iter(iterable)
     for first in iterator:
         yield list(itertools.chain([first], itertools.islice(iterator, size - 1)))
+
+
+def file_digest(path) -> str:
+    """
+    :param path: File to hash.
+    :return: Hex MD5 digest of the file's contents.
+    """
+    md5 = hashlib.md5()
+    with open(path, "rb") as file:
+        while block := file.read(512):
+            md5.update(block)
+
+    return md5.hexdigest()
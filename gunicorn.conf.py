@@ -12,10 +12,6 @@ timeout = 600  # 10 minutes
 graceful_timeout = 300  # 5 minutes
 keepalive = 5
 
-# Restart workers periodically to prevent memory leaks
-max_requests = 100
-max_requests_jitter = 10
-
 # Log level
 loglevel = 'info'
 
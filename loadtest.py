@@ -0,0 +1,244 @@
+"""
+Load generator for the web service in app.py.
+
+Replays a weighted mix of uploads against a running server at a fixed concurrency, optionally with Poisson arrivals
+at a target rate, and reports throughput, latency percentiles, error rate and server RSS over time.
+
+    python loadtest.py --file song.mp3 --pattern 1010 --pattern 1101 --concurrency 4 --rate 0.5 --duration 120
+    python loadtest.py --mix mix.json --requests 50 --pid 1234 --output results.json
+
+A mix file is a JSON list of {"file": ..., "pattern": ..., "preview": false, "weight": 1} objects.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import math
+import mimetypes
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+Result = collections.namedtuple("Result", "start latency status tier error")
+
+
+def load_mix(args):
+    """Build the list of request templates from --mix or --file/--pattern"""
+    if args.mix:
+        with open(args.mix) as f:
+            mix = json.load(f)
+    else:
+        mix = [
+            {"file": path, "pattern": pattern, "preview": args.preview}
+            for path in args.file
+            for pattern in (args.pattern or ["1010"])
+        ]
+
+    if not mix:
+        raise SystemExit("Nothing to send: pass --mix or at least one --file")
+
+    base = os.path.dirname(args.mix) if args.mix else ""
+    for entry in mix:
+        path = os.path.join(base, entry["file"])
+        with open(path, "rb") as f:
+            entry["body"] = f.read()
+        entry["filename"] = os.path.basename(path)
+    return mix
+
+
+def encode_multipart(entry):
+    """Encode one upload as multipart/form-data, the way the browser form sends it"""
+    boundary = uuid.uuid4().hex
+    content_type = mimetypes.guess_type(entry["filename"])[0] or "application/octet-stream"
+    fields = {"pattern": entry.get("pattern", "1010")}
+    if entry.get("preview"):
+        fields["preview"] = "1"
+
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{entry["filename"]}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n".encode()
+    )
+    parts.append(entry["body"])
+    parts.append(f"\r\n--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def send(url, entry, scheduled, timeout):
+    """Send one request and time it from when it was scheduled, so client-side queueing counts as latency"""
+    body, content_type = encode_multipart(entry)
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            return Result(
+                scheduled, time.monotonic() - scheduled, resp.status, resp.headers.get("X-Beatmachine-Tier"), None
+            )
+    except urllib.error.HTTPError as e:
+        e.read()
+        return Result(scheduled, time.monotonic() - scheduled, e.code, None, None)
+    except Exception as e:
+        return Result(scheduled, time.monotonic() - scheduled, None, None, f"{type(e).__name__}: {e}")
+
+
+def find_processes(args):
+    """Processes whose RSS is tracked: the given PID and its children, or every process matching --process-name"""
+    if psutil is None:
+        return []
+    if args.pid:
+        root = psutil.Process(args.pid)
+        return [root] + root.children(recursive=True)
+    if args.process_name:
+        return [p for p in psutil.process_iter(["cmdline"]) if args.process_name in " ".join(p.info["cmdline"] or [])]
+    return []
+
+
+def sample_rss(args, samples, started, stop):
+    """Record total RSS of the server processes every --sample-interval seconds"""
+    while not stop.wait(args.sample_interval):
+        total = 0
+        for proc in find_processes(args):
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        samples.append((time.monotonic() - started, total))
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered) / 100) - 1))]
+
+
+def run(args):
+    mix = load_mix(args)
+    weights = [entry.get("weight", 1) for entry in mix]
+    url = args.url.rstrip("/") + "/remix"
+    rng = random.Random(args.seed)
+
+    results = []
+    rss = []
+    stop = threading.Event()
+    started = time.monotonic()
+    deadline = started + args.duration if args.duration else None
+
+    def more():
+        if args.requests is not None and sent >= args.requests:
+            return False
+        return deadline is None or time.monotonic() < deadline
+
+    sampler = threading.Thread(target=sample_rss, args=(args, rss, started, stop), daemon=True)
+    if args.pid or args.process_name:
+        sampler.start()
+
+    sent = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        if args.rate:
+            # Open loop: arrivals follow a Poisson process whether or not earlier requests have finished
+            futures = []
+            next_arrival = time.monotonic()
+            while more():
+                time.sleep(max(0.0, next_arrival - time.monotonic()))
+                futures.append(pool.submit(send, url, rng.choices(mix, weights)[0], next_arrival, args.timeout))
+                sent += 1
+                next_arrival += rng.expovariate(args.rate)
+            results = [f.result() for f in futures]
+        else:
+            # Closed loop: each of --concurrency clients sends its next request as soon as the last one returns
+            lock = threading.Lock()
+
+            def client():
+                nonlocal sent
+                while True:
+                    with lock:
+                        if not more():
+                            return
+                        sent += 1
+                        entry = rng.choices(mix, weights)[0]
+                    result = send(url, entry, time.monotonic(), args.timeout)
+                    with lock:
+                        results.append(result)
+
+            for future in [pool.submit(client) for _ in range(args.concurrency)]:
+                future.result()
+
+    elapsed = time.monotonic() - started
+    stop.set()
+    if sampler.is_alive():
+        sampler.join()
+    return results, rss, elapsed
+
+
+def summarize(results, rss, elapsed):
+    ok = [r for r in results if r.status == 200]
+    latencies = [r.latency for r in ok]
+    statuses = collections.Counter(str(r.status) if r.status else r.error.split(":")[0] for r in results)
+    return {
+        "requests": len(results),
+        "elapsed": elapsed,
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "error_rate": 1 - len(ok) / len(results) if results else 0.0,
+        "latency": {f"p{q}": percentile(latencies, q) for q in (50, 95, 99)},
+        "statuses": dict(statuses),
+        "tiers": dict(collections.Counter(r.tier for r in ok if r.tier)),
+        "peak_rss": max((total for _, total in rss), default=None),
+        "rss": rss,
+        "results": [r._asdict() for r in results],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the beatmachine web service.")
+    parser.add_argument("--url", default=f'http://127.0.0.1:{os.environ.get("PORT", 8080)}', help="Server base URL")
+    parser.add_argument("--mix", help="JSON file describing the request mix")
+    parser.add_argument("--file", action="append", default=[], help="Song to upload, repeatable")
+    parser.add_argument("--pattern", action="append", help="Beat pattern to request, repeatable")
+    parser.add_argument("--preview", action="store_true", help="Request previews instead of full renders")
+    parser.add_argument("--concurrency", type=int, default=2, help="Maximum requests in flight")
+    parser.add_argument("--rate", type=float, help="Mean arrivals per second. Omit for a closed loop")
+    parser.add_argument("--duration", type=float, help="Stop sending after this many seconds")
+    parser.add_argument("--requests", type=int, help="Stop after sending this many requests")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-request timeout in seconds")
+    parser.add_argument("--pid", type=int, help="Server PID whose RSS (including children) is sampled")
+    parser.add_argument("--process-name", help="Sample RSS of every process whose command line contains this")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between RSS samples")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for request selection and arrivals")
+    parser.add_argument("--output", help="Write the full report, including every request, as JSON")
+    args = parser.parse_args()
+
+    if args.duration is None and args.requests is None:
+        parser.error("one of --duration or --requests is required")
+    if (args.pid or args.process_name) and psutil is None:
+        parser.error("psutil is required to sample server memory")
+
+    report = summarize(*run(args))
+
+    latency = report["latency"]
+    print(f"{report['requests']} requests in {report['elapsed']:.1f}s, {report['throughput']:.3f} successful/s")
+    print(f"latency p50 {latency['p50']:.2f}s  p95 {latency['p95']:.2f}s  p99 {latency['p99']:.2f}s")
+    print(f"error rate {report['error_rate']:.1%}  statuses {report['statuses']}  tiers {report['tiers']}")
+    if report["peak_rss"] is not None:
+        print(f"peak server RSS {report['peak_rss'] / 2**20:.1f} MiB over {len(report['rss'])} samples")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import concurrent.futures
+import time
 from typing import Optional
 
 import numpy as np
@@ -21,3 +23,95 @@ def test_zero_period_disallowed():
 def test_negative_period_disallowed():
     with pytest.raises(ValueError):
         _ = _NoOpEffect(period=-1)
+
+
+def test_selected_beats():
+    assert list(_NoOpEffect(period=3, offset=2).selected(0, 10)) == [3, 6, 9]
+    assert list(_NoOpEffect(period=3, offset=2).selected(5, 5)) == [1, 4]
+
+
+@pytest.mark.parametrize("effect", [{"type": "cut"}, {"type": "remove"}, {"type": "silence"}])
+def test_beats_are_read_in_bounded_batches(effect):
+    from beatmachine.effect_registry import EffectRegistry
+
+    (effect,) = EffectRegistry.load_effect_chain([{**effect, "period": 2}])
+    read = []
+
+    def beats():
+        for n in range(1, 100):
+            read.append(n)
+            yield np.full((4, 2), n, dtype=np.float64)
+
+    output = effect(beats())
+    next(output)
+    assert len(read) == effect.batch_size == effect.lookahead
+
+
+@pytest.mark.parametrize(
+    "effect",
+    [
+        {"type": "cut", "period": 2, "denominator": 3, "take_index": 1},
+        {"type": "remove", "period": 3, "offset": 1},
+        {"type": "repeat", "times": 3},
+        {"type": "reverse", "period": 2, "skip_silent": True},
+        {"type": "silence", "offset": 2},
+    ],
+)
+@pytest.mark.parametrize("shape", [(), (2,)])
+def test_batches_match_single_beats(monkeypatch, effect, shape):
+    from beatmachine.effect_registry import EffectRegistry
+
+    (effect,) = EffectRegistry.load_effect_chain([effect])
+    rng = np.random.default_rng(0)
+    beats = [rng.standard_normal((int(n),) + shape) * (n % 4 != 0) for n in rng.integers(1, 50, 40)]
+
+    actual = list(effect(beats))
+    monkeypatch.setattr(type(effect), "process_beats", PeriodicEffect.process_beats)
+    expected = list(effect(beats))
+
+    assert len(expected) == len(actual)
+    for e, a in zip(expected, actual):
+        np.testing.assert_array_equal(np.asarray(e), np.asarray(a))
+        assert a.dtype == e.dtype
+
+
+class _SlowNegate(PeriodicEffect):
+    __effect_name__: str = "slow_negate"
+
+    def process_beat(self, beat: np.ndarray) -> Optional[np.ndarray]:
+        time.sleep(0.001 * (beat[0] % 3))
+        return -beat if beat[0] % 5 else None
+
+
+def test_executor_preserves_order():
+    beats = [np.full(4, n) for n in range(1, 50)]
+    expected = list(_SlowNegate(period=2, offset=1)(beats))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        effect = _SlowNegate(period=2, offset=1).with_executor(executor, window=3)
+        actual = list(effect(iter(beats)))
+
+    assert len(expected) == len(actual)
+    for e, a in zip(expected, actual):
+        np.testing.assert_array_equal(e, a)
+
+
+def test_executor_window_must_be_positive():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(ValueError):
+            _NoOpEffect().with_executor(executor, window=0)
+
+
+@pytest.mark.parametrize("bound", [False, True])
+def test_silent_beats_are_skipped(bound):
+    from beatmachine import Beats
+    from beatmachine.effects import RemoveEveryNth
+
+    signal = np.concatenate([np.full((4, 1), 0.0 if n in (1, 2) else 0.5 + n) for n in range(6)])
+    beats = Beats(44100, 1, np.split(signal, range(4, 24, 4)))
+    effect = RemoveEveryNth(period=2, skip_silent=True)
+
+    # Beats 1 and 2 are silent, so the beats counted are 0, 3, 4 and 5 and the second and fourth of them go.
+    kept = beats.apply(effect) if bound else Beats(44100, 1, list(effect(beats._beats)))
+    assert [float(b[0, 0]) for b in kept._beats] == [0.5, 0.0, 0.0, 4.5]
+    assert effect.reads_features and RemoveEveryNth(period=2) != effect
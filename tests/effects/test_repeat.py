@@ -21,3 +21,17 @@ def test_invalid_repeat_effect_disallowed():
 
     with pytest.raises(ValueError):
         _ = RepeatEveryNth(times=-1)
+
+    with pytest.raises(ValueError):
+        _ = RepeatEveryNth(times=2.5)
+
+    assert RepeatEveryNth(times=3.0).times == 3
+
+
+def test_repeat_references_source_beat():
+    beat = np.arange(8).reshape(4, 2)
+    (repeated,) = RepeatEveryNth(times=3)([beat])
+
+    assert repeated.beat is beat
+    assert len(repeated) == 12
+    np.testing.assert_array_equal(np.concatenate([beat] * 3), repeated)
@@ -1,3 +1,5 @@
+import pytest
+
 from beatmachine.effects.silence import SilenceEveryNth
 
 from .effect_test_util import *
@@ -6,3 +8,32 @@ from .effect_test_util import *
 def test_silence_every_nth(song_ascending):
     silence_effect = SilenceEveryNth(period=2)
     assert_beat_sequences_equal([[1] * 4, [0] * 4, [3] * 4, [0] * 4], list(silence_effect(song_ascending)))
+
+
+def test_silence_shares_one_read_only_block():
+    beats = [np.ones((n, 2)) for n in (5, 3, 4)]
+    silent = list(SilenceEveryNth()(beats))
+
+    assert [s.shape for s in silent] == [b.shape for b in beats]
+    assert not any(s.flags.writeable for s in silent)
+    assert np.shares_memory(silent[0], silent[1]) and np.shares_memory(silent[1], silent[2])
+
+
+def test_silence_keeps_dtype():
+    from beatmachine import Beats
+
+    beats = Beats(44100, 2, [np.ones((4, 2), dtype=np.float32), np.ones((3, 2), dtype=np.float32)])
+    silent = beats.apply(SilenceEveryNth())
+
+    assert all(b.dtype == np.float32 for b in silent._beats)
+    assert silent.to_ndarray().dtype == np.float32
+
+
+def test_silence_does_not_materialize_repeats(monkeypatch):
+    from beatmachine.references import RepeatedBeat
+
+    monkeypatch.setattr(RepeatedBeat, "__array__", lambda *args, **kwargs: pytest.fail("Repeats were materialized"))
+    beat = RepeatedBeat(np.ones((4, 2), dtype=np.float32), 3)
+
+    silent = SilenceEveryNth().process_beat(beat)
+    assert silent.shape == (12, 2) and silent.dtype == np.float32
@@ -0,0 +1,56 @@
+import pytest
+
+from beatmachine.probe import AudioInfo, probe_audio
+from beatmachine.service.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    estimate_peak_memory,
+)
+
+
+def test_probe_wav(drums_wav_path):
+    info = probe_audio(drums_wav_path)
+    assert info.duration > 0
+    assert info.channels >= 1
+
+
+def test_estimate_scales_with_decoded_size():
+    mono = estimate_peak_memory(AudioInfo(duration=60, sample_rate=44100, channels=1))
+    stereo = estimate_peak_memory(AudioInfo(duration=60, sample_rate=44100, channels=2))
+    longer = estimate_peak_memory(AudioInfo(duration=120, sample_rate=44100, channels=1))
+    assert mono < stereo
+    assert stereo == longer
+
+
+def test_admit_within_budget():
+    controller = AdmissionController(budget_bytes=100)
+    with controller.admit(60):
+        assert controller.in_use == 60
+        assert controller.running == 1
+    assert controller.in_use == 0
+
+
+def test_reject_job_larger_than_budget():
+    controller = AdmissionController(budget_bytes=100)
+    with pytest.raises(AdmissionRejected) as e:
+        with controller.admit(101):
+            pass
+    assert e.value.retry_after is None
+
+
+def test_reject_when_wait_queue_full():
+    controller = AdmissionController(budget_bytes=100, max_waiting=0)
+    with controller.admit(60):
+        with pytest.raises(AdmissionRejected) as e:
+            with controller.admit(60):
+                pass
+    assert e.value.retry_after >= 1
+
+
+def test_reject_after_wait_timeout():
+    controller = AdmissionController(budget_bytes=100, max_waiting=1, wait_timeout=0.01)
+    with controller.admit(60):
+        with pytest.raises(AdmissionRejected):
+            with controller.admit(60):
+                pass
+    assert controller.waiting == 0
@@ -0,0 +1,81 @@
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+import beatmachine.effects as fx
+from beatmachine import Beats
+from beatmachine.effect_registry import LoadableEffect
+from beatmachine.instrumentation import Recorder
+
+
+class _CountingEffect(LoadableEffect):
+    calls = 0
+
+    def __call__(self, beats):
+        _CountingEffect.calls += 1
+        return beats
+
+    def __eq__(self, other):
+        return isinstance(other, _CountingEffect)
+
+
+@pytest.fixture
+def song():
+    return Beats(44100, 1, [np.full((4, 1), i, dtype=np.float64) for i in range(16)])
+
+
+def _values(beats):
+    return [b[0, 0] for b in beats._beats]
+
+
+@pytest.mark.parametrize("executor", [None, concurrent.futures.ThreadPoolExecutor(2)])
+def test_variants_match_independent_chains(song, executor):
+    chains = [
+        [fx.SwapBeats(x_period=2, y_period=4), fx.RemoveEveryNth(period=2)],
+        [fx.SwapBeats(x_period=2, y_period=4), fx.ReverseAllBeats()],
+        [fx.RemoveEveryNth(period=2, offset=1)],
+        [],
+    ]
+
+    variants = song.apply_variants(chains, executor)
+
+    for chain, variant in zip(chains, variants):
+        expected = Beats(song.sample_rate, song.channels, list(song._beats)).apply_all(*chain, warn=False)
+        assert _values(expected) == _values(variant)
+
+
+def test_shared_prefix_runs_once(song):
+    _CountingEffect.calls = 0
+    song.apply_variants([[_CountingEffect(), fx.ReverseAllBeats()], [_CountingEffect(), fx.RemoveEveryNth()]])
+    assert _CountingEffect.calls == 1
+
+
+def test_randomize_is_not_shared(song):
+    a, b = song.apply_variants([[fx.RandomizeAllBeats()], [fx.RandomizeAllBeats()]])
+    assert a._beats is not b._beats
+
+
+def test_variants_can_be_iterated_twice(song):
+    (variant,) = song.apply_variants([[fx.ReverseAllBeats()]])
+    assert _values(variant) == _values(variant)
+
+
+def test_variants_are_bound_and_timed(song, monkeypatch):
+    song = Beats(44100, 1, [np.zeros((4, 1))] + list(song._beats))
+    looked_up = []
+
+    def rms(beat):
+        looked_up.append(beat)
+        return float(np.sqrt(np.mean(np.square(beat))))
+
+    monkeypatch.setattr(song.features, "rms", rms)
+    chain = [fx.RemoveEveryNth(period=2, skip_silent=True)]
+
+    with Recorder() as recorder:
+        a, b = song.apply_variants([chain, chain + [fx.ReverseAllBeats()]])
+
+    assert looked_up
+    assert _values(a) == _values(song.apply_all(*chain))
+    assert _values(b) == _values(a)[::-1]
+    assert [s.stage for s in recorder.spans] == ["effect/remove", "effect/reverseb"]
@@ -0,0 +1,75 @@
+import json
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from beatmachine import batch
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.batch import BatchJob, find_jobs, load_manifest, run_job
+
+
+@pytest.fixture
+def worker(monkeypatch, tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr(batch, "_worker_backend", BpmBackend(120, 0))
+    monkeypatch.setattr(batch, "_worker_cache_dir", str(cache_dir))
+    return cache_dir
+
+
+def test_find_jobs_in_directory(tmp_path, drums_wav_path):
+    shutil.copy(drums_wav_path, tmp_path / "a.wav")
+    (tmp_path / "nested").mkdir()
+    shutil.copy(drums_wav_path, tmp_path / "nested" / "b.wav")
+    (tmp_path / "notes.txt").write_text("not a song")
+
+    jobs = find_jobs(str(tmp_path), [{"type": "reverse"}], str(tmp_path / "out"), ".mp3")
+
+    assert [j.input for j in jobs] == [str(tmp_path / "a.wav"), str(tmp_path / "nested" / "b.wav")]
+    assert [j.output for j in jobs] == [str(tmp_path / "out" / "a-out.mp3"), str(tmp_path / "out" / "b-out.mp3")]
+
+
+def test_load_manifest_resolves_relative_paths(tmp_path):
+    manifest = tmp_path / "jobs.jsonl"
+    manifest.write_text(json.dumps({"input": "a.wav", "effects": {"type": "reverse"}, "output": "a.mp3"}) + "\n")
+
+    assert load_manifest(str(manifest)) == [
+        BatchJob(str(tmp_path / "a.wav"), [{"type": "reverse"}], str(tmp_path / "a.mp3"))
+    ]
+
+
+def test_load_manifest_rejects_incomplete_jobs(tmp_path):
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps([{"input": "a.wav"}]))
+
+    with pytest.raises(ValueError):
+        load_manifest(str(manifest))
+
+
+def test_run_job_reuses_cached_analysis(worker, tmp_path, drums_wav_path):
+    job = BatchJob(str(drums_wav_path), [{"type": "reverse"}], str(tmp_path / "out" / "drums.wav"))
+
+    first = run_job(job)
+    second = run_job(job)
+
+    assert first.error is None and not first.cached
+    assert second.error is None and second.cached
+    assert (tmp_path / "out" / "drums.wav").stat().st_size > 0
+    assert len(list(worker.iterdir())) == 1
+
+
+def test_run_job_reports_failures(worker, tmp_path, drums_wav_path):
+    result = run_job(BatchJob(str(drums_wav_path), [{"type": "nonexistent"}], str(tmp_path / "out.wav")))
+
+    assert result.error is not None
+
+
+def test_worker_loads_one_backend():
+    code = (
+        "import beatmachine.batch as batch, beatmachine.beats as beats;"
+        "batch._init_worker(60, 300, None);"
+        "assert beats._default_backend.cache_info().currsize == 0"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
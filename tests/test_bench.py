@@ -0,0 +1,36 @@
+import numpy as np
+
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.bench import (
+    BenchResult,
+    compare,
+    dump_results,
+    run_benchmarks,
+    synthesize_song,
+)
+from beatmachine.codec import read_audio
+
+
+def test_synthesize_song(tmp_path):
+    beats = synthesize_song(str(tmp_path / "song.wav"), seconds=2, sample_rate=8000, channels=1, bpm=120)
+    signal, sample_rate = read_audio(str(tmp_path / "song.wav"))
+
+    assert sample_rate == 8000 and signal.shape == (16000, 1)
+    np.testing.assert_array_equal(beats, [0, 4000, 8000, 12000])
+
+
+def test_run_benchmarks_covers_every_stage(tmp_path):
+    (tmp_path / "swap.json").write_text('[{"type": "swap"}]')
+
+    results = run_benchmarks(seconds=2, channels=1, backend=BpmBackend(120, 0), examples_dir=str(tmp_path), repeat=1)
+    names = [r.name for r in results]
+
+    assert {"analysis", "effect/swap", "effect/remap", "chain/swap", "to_ndarray", "save/wav"} <= set(names)
+    assert all(r.seconds >= 0 and r.peak_bytes >= 0 for r in results)
+
+
+def test_compare_ignores_noise():
+    baseline = dump_results([BenchResult("a", 1.0, 100 << 20), BenchResult("b", 0.001, 0)])
+    current = [BenchResult("a", 1.5, 101 << 20), BenchResult("b", 0.003, 1000), BenchResult("c", 9.0, 0)]
+
+    assert [(r.name, r.metric) for r in compare(current, baseline)] == [("a", "seconds")]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from beatmachine import Beats
+from beatmachine.buffers import MIN_POOLED_BYTES, BufferPool, empty, size_class
+from beatmachine.codec import pcm_blocks
+from beatmachine.references import silence
+
+LARGE = (MIN_POOLED_BYTES // 8, 2)
+
+
+def test_size_classes_waste_at_most_a_quarter():
+    assert size_class(1) == MIN_POOLED_BYTES
+    for nbytes in (MIN_POOLED_BYTES + 1, 3 * 2**20 + 7, 200 * 2**20 + 1):
+        assert nbytes <= size_class(nbytes) <= nbytes * 1.25
+
+
+def test_blocks_are_reused():
+    pool = BufferPool()
+    with pool.borrow(LARGE) as first:
+        address = first.ctypes.data
+    with pool.borrow((LARGE[0] - 10, 2)) as second:
+        assert second.ctypes.data == address
+    assert (pool.hits, pool.misses) == (1, 1)
+    assert pool.borrowed_bytes == 0
+
+
+def test_idle_memory_is_capped():
+    pool = BufferPool(max_idle_bytes=0)
+    with pool.borrow(LARGE):
+        pass
+    assert pool.idle_bytes == 0
+
+
+def test_lease_returns_everything():
+    pool = BufferPool()
+    assert empty(LARGE).base is None
+
+    with pool.lease():
+        assert empty((4, 2)).base is None
+        signal = empty(LARGE)
+        assert pool.borrowed_bytes >= signal.nbytes
+
+    assert pool.borrowed_bytes == 0
+    assert pool.idle_bytes >= signal.nbytes
+
+
+def test_rendering_within_lease_matches(song_ascending):
+    pool = BufferPool()
+    beats = Beats(44100, 1, [np.repeat(b, MIN_POOLED_BYTES // 16) for b in song_ascending])
+    expected = beats.to_ndarray()
+    with pool.lease():
+        np.testing.assert_array_equal(beats.to_ndarray(), expected)
+
+
+def test_pcm_blocks_convert_to_float64():
+    beat = np.ones((3, 2))
+    blocks = [b.copy() for b in pcm_blocks([beat, silence((2, 2), np.int16)], 2)]
+    assert all(b.dtype == np.float64 and b.shape[1] == 2 for b in blocks)
+    np.testing.assert_array_equal(np.concatenate(blocks), [[1, 1]] * 3 + [[0, 0]] * 2)
+
+
+def test_negative_idle_size_is_rejected():
+    with pytest.raises(ValueError):
+        BufferPool(max_idle_bytes=-1)
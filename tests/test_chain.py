@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from beatmachine import Beats, ChainPlan
+from beatmachine.chain import UnboundedEffectWarning, _spill
+from beatmachine.effects import (
+    RandomizeAllBeats,
+    RemapBeats,
+    ReverseAllBeats,
+    ReverseEveryNth,
+    SwapBeats,
+)
+from beatmachine.instrumentation import Recorder
+
+
+def test_windowed_chain_lookahead():
+    plan = ChainPlan([RemapBeats(mapping=[0, 2, 1]), SwapBeats(group_size=4), ReverseEveryNth()])
+
+    assert plan.lookaheads == [3, 4, ReverseEveryNth.batch_size]
+    assert plan.lookahead == 7 + ReverseEveryNth.batch_size
+    assert plan.unbounded == []
+
+
+def test_unbounded_chain_warns():
+    plan = ChainPlan([ReverseEveryNth(), ReverseAllBeats(), lambda beats: beats])
+
+    assert plan.lookahead is None
+    assert len(plan.unbounded) == 2
+    with pytest.warns(UnboundedEffectWarning):
+        plan.run([])
+
+
+def test_spill_round_trips_mixed_beats(tmp_path):
+    beats = [np.arange(6, dtype=np.float64).reshape(3, 2), np.zeros((0, 2)), np.ones((5, 2), dtype=np.int16)]
+    spilled = _spill(iter(beats), str(tmp_path))
+
+    for expected, actual in zip(beats, spilled):
+        assert expected.dtype == actual.dtype
+        np.testing.assert_array_equal(expected, actual)
+
+
+def test_spilled_chain_matches_in_memory(tmp_path, song_ascending):
+    beats = Beats(44100, 1, song_ascending)
+    effects = [ReverseEveryNth(period=2), ReverseAllBeats(), RandomizeAllBeats()]
+
+    with pytest.warns(UnboundedEffectWarning):
+        ChainPlan(effects).run(beats._beats)
+
+    spilled = list(ChainPlan(effects[:2]).run(iter(song_ascending), spill_dir=str(tmp_path)))
+    expected = list(beats.apply_all(*effects[:2], warn=False)._beats)
+    for e, a in zip(expected, spilled):
+        np.testing.assert_array_equal(e, a)
+
+    assert sorted(map(tuple, beats.apply_all(*effects, spill_dir=str(tmp_path))._beats)) == sorted(map(tuple, expected))
+
+
+def test_apply_all_warns_about_unbounded_effects(recwarn, tmp_path):
+    beats = Beats(44100, 1, [np.full((4, 1), n, dtype=np.float64) for n in range(4)])
+
+    beats.apply_all(ReverseAllBeats(), spill_dir=str(tmp_path))
+    beats.apply_all(ReverseEveryNth())
+    beats.apply_all(ReverseAllBeats(), warn=False)
+    assert not recwarn.list
+
+    with pytest.warns(UnboundedEffectWarning, match="reverseb"):
+        beats.apply_all(ReverseAllBeats())
+
+    # Effects are wrapped while they are being timed, and still named after themselves
+    with Recorder(), pytest.warns(UnboundedEffectWarning, match="reverseb"):
+        beats.apply_all(ReverseAllBeats())
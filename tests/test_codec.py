@@ -0,0 +1,61 @@
+import io
+import types
+
+import numpy as np
+import pytest
+
+from beatmachine import codec
+from beatmachine.codec import read_audio, soundfile_format, write_audio
+
+
+def test_native_formats_detected_from_extension():
+    assert soundfile_format("out.wav") == ("WAV", "PCM_16")
+    assert soundfile_format("out.FLAC") == ("FLAC", "PCM_16")
+
+
+def test_unsupported_formats_need_ffmpeg():
+    assert soundfile_format("out.m4a") is None
+    assert soundfile_format(io.BytesIO()) is None
+    assert soundfile_format(io.BytesIO(), "aac") is None
+
+
+def test_read_is_two_dimensional(drums_wav_path):
+    signal, sample_rate = read_audio(drums_wav_path)
+    assert sample_rate == 44100
+    assert signal.ndim == 2
+    assert signal.dtype == np.float64
+
+
+def test_read_window(drums_wav_path):
+    signal, sample_rate = read_audio(drums_wav_path)
+    window, _ = read_audio(drums_wav_path, start=0.5, stop=1.0)
+    np.testing.assert_array_equal(signal[sample_rate // 2 : sample_rate], window)
+
+
+@pytest.mark.parametrize("out_format", ["wav", "flac"])
+def test_lossless_round_trip(drums_wav_path, out_format):
+    signal, sample_rate = read_audio(drums_wav_path)
+    beats = np.array_split(signal, 7)
+
+    buffer = io.BytesIO()
+    write_audio(buffer, beats, sample_rate, signal.shape[1], soundfile_format(buffer, out_format))
+    buffer.seek(0)
+
+    decoded, decoded_rate = read_audio(buffer)
+    assert decoded_rate == sample_rate
+    np.testing.assert_allclose(signal, decoded, atol=1 / 32768)
+
+
+def test_file_like_input_falls_back_to_ffmpeg(drums_wav_path, monkeypatch):
+    expected, sample_rate = read_audio(drums_wav_path)
+
+    def unsupported(*args, **kwargs):
+        raise RuntimeError("Format not recognised")
+
+    # Only the in-process path is made to fail; the ffmpeg fallback is left alone.
+    monkeypatch.setattr(codec, "soundfile", types.SimpleNamespace(SoundFile=unsupported))
+    with open(drums_wav_path, "rb") as f:
+        signal, rate = read_audio(io.BytesIO(f.read()))
+
+    assert rate == sample_rate
+    assert signal.shape == expected.shape
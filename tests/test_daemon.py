@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.codec import read_audio
+from beatmachine.daemon import Daemon
+from beatmachine.daemon_client import DaemonClient, DaemonError
+
+
+@pytest.fixture
+def daemon(monkeypatch, tmp_path):
+    daemon = Daemon(str(tmp_path / "d.sock"), workers=2)
+    monkeypatch.setattr(daemon, "backend", lambda min_bpm, max_bpm: BpmBackend(120, 0))
+
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    for _ in range(100):
+        client = DaemonClient.connect(daemon.socket_path)
+        if client is not None:
+            client.close()
+            break
+        time.sleep(0.01)
+
+    yield daemon
+
+    daemon.shutdown()
+    thread.join()
+
+
+def test_connect_without_daemon(tmp_path):
+    assert DaemonClient.connect(str(tmp_path / "missing.sock")) is None
+
+
+def test_apply_reuses_analysed_song(daemon, tmp_path, drums_wav_path):
+    for name in ("a.wav", "b.wav"):
+        response = DaemonClient.connect(daemon.socket_path).request(
+            "apply", input=str(drums_wav_path), effects=[{"type": "reverse"}], outputs=[str(tmp_path / name)]
+        )
+        assert response == {"outputs": [str(tmp_path / name)]}
+
+    assert len(daemon._songs) == 1
+    assert read_audio(str(tmp_path / "a.wav"))[0].shape == read_audio(str(drums_wav_path))[0].shape
+
+
+def test_errors_are_sent_back(daemon):
+    with pytest.raises(DaemonError):
+        DaemonClient.connect(daemon.socket_path).request("nonexistent")
+
+
+def test_refuses_to_start_twice(daemon):
+    with pytest.raises(DaemonError):
+        Daemon(daemon.socket_path).serve_forever()
+
+
+def test_socket_is_private(daemon):
+    assert os.stat(daemon.socket_path).st_mode & 0o777 == 0o600
+
+
+def test_apply_forwards_spill_dir(daemon, tmp_path, drums_wav_path):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    output = str(tmp_path / "out.wav")
+
+    DaemonClient.connect(daemon.socket_path).request(
+        "apply",
+        input=str(drums_wav_path),
+        effects=[{"type": "reverseb"}],
+        outputs=[output],
+        effect_threads=2,
+        spill_dir=str(spill_dir),
+    )
+
+    assert read_audio(output)[0].shape == read_audio(str(drums_wav_path))[0].shape
+
+
+def test_workers_do_not_share_backends(tmp_path):
+    daemon = Daemon(str(tmp_path / "d.sock"))
+    backends = []
+    threads = [threading.Thread(target=lambda: backends.append(daemon.backend(60, 300))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert daemon.backend(60, 300) is daemon.backend(60, 300)
+    assert len({id(backend) for backend in backends + [daemon.backend(60, 300)]}) == 3
+
+
+def test_cli_import_does_not_load_models():
+    code = (
+        "import sys, beatmachine.__main__;"
+        "assert 'madmom' not in sys.modules and 'beatmachine.beats' not in sys.modules;"
+        "assert 'beatmachine.daemon' not in sys.modules and 'beatmachine.batch' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
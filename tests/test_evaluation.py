@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.evaluation import (
+    continuity,
+    default_backends,
+    default_material,
+    evaluate,
+    f_measure,
+    synthesize,
+)
+
+
+def test_f_measure():
+    annotations = np.arange(0, 10, 0.5)
+
+    assert f_measure(annotations + 0.05, annotations) == 1.0
+    assert f_measure(annotations[::2], annotations) == pytest.approx(2 / 3)
+    assert f_measure(annotations + 0.25, annotations) == 0.0
+
+
+def test_continuity_accepts_other_metrical_levels():
+    annotations = np.arange(0, 10, 0.5)
+
+    assert continuity(annotations, annotations) == pytest.approx((19 / 20, 19 / 20))
+    cmlt, amlt = continuity(annotations[::2], annotations)
+    assert cmlt == 0.0 and amlt == pytest.approx(9 / 10)
+
+
+def test_default_material_has_tempo_changes():
+    material = {m.name: m for m in default_material(seconds=20, sample_rate=8000)}
+
+    assert np.diff(material["click-ramp-100-140"].beats)[-1] < np.diff(material["click-ramp-100-140"].beats)[0]
+    assert all(np.max(np.abs(m.signal)) == pytest.approx(0.5) for m in material.values())
+
+
+def test_evaluate_fixed_tempo_backend():
+    truth = synthesize("click", np.arange(0, 20, 0.5), 20, sample_rate=8000)
+
+    exact, wrong = evaluate({"exact": BpmBackend(120, 0), "wrong": lambda: BpmBackend(100, 0)}, [truth])
+
+    assert exact.f_measure == 1.0 and exact.cmlt > 0.9
+    assert wrong.f_measure < 0.5
+    assert exact.seconds >= 0 and exact.peak_bytes >= 0
+
+
+def test_bpm_backend_first_beat_offset():
+    beats = BpmBackend(60, 250).locate_beats(np.zeros(4000), 1000)
+
+    np.testing.assert_array_equal(beats, [250, 1250, 2250, 3250])
+
+
+def test_default_backends_keep_the_trained_frame_rate():
+    backends = {name: factory() for name, factory in default_backends().items() if not name.startswith("bpm/")}
+
+    assert "madmom/4-models/55-215bpm" not in backends  # Same as the accurate tier
+    assert {"madmom/1-models/55-215bpm", "madmom/2-models/55-215bpm"} <= set(backends)
+    assert all(backend.fps == 100 for backend in backends.values())
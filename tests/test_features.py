@@ -0,0 +1,49 @@
+import pickle
+
+import numpy as np
+
+from beatmachine import Analysis, Beats
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.features import compute_features, is_silent
+
+
+def test_levels_and_durations():
+    signal = np.concatenate((np.zeros(100), np.full(300, 0.5), -np.ones(100)))
+    features = compute_features(signal, 100, [100, 400, 400])
+
+    np.testing.assert_array_equal(features["start"], [0, 100, 400, 400])
+    np.testing.assert_allclose(features["duration"], [1, 3, 0, 1])
+    np.testing.assert_allclose(features["rms"], [0, 0.5, 0, 1])
+    np.testing.assert_allclose(features["peak"], [0, 0.5, 0, 1])
+    assert list(is_silent(features["rms"])) == [True, False, True, False]
+
+
+def test_brighter_beats_have_higher_centroid():
+    t = np.arange(44100) / 44100
+    signal = np.concatenate((np.sin(2 * np.pi * 200 * t), np.sin(2 * np.pi * 4000 * t)))
+    low, high = compute_features(signal, 44100, [44100])["centroid"]
+    assert 100 < low < 600 < 3500 < high < 4500
+
+
+def test_onsets_are_stronger_at_hits():
+    signal = np.zeros(44100 * 2)
+    signal[44100 : 44100 + 2048] = np.random.default_rng(0).standard_normal(2048)
+    quiet, hit = compute_features(signal, 44100, [44100])["onset"]
+    assert hit > 10 * quiet
+
+
+def test_features_are_kept_with_analysis(drums_wav_path):
+    beats = Beats.from_song(str(drums_wav_path), BpmBackend(120, 0))
+    analysis = Analysis.from_song(str(drums_wav_path), BpmBackend(120, 0))
+    np.testing.assert_array_equal(beats.features.table, analysis.features)
+    assert len(beats.features) == len(beats._beats)
+
+    restored = pickle.loads(pickle.dumps(beats))
+    np.testing.assert_array_equal(restored.features.table, beats.features.table)
+    assert restored.features.lookup(restored._beats[3]) == beats.features[3]
+
+
+def test_features_are_computed_on_demand(song_ascending):
+    beats = Beats(4, 1, [b.astype(np.float64) / 4 for b in song_ascending])
+    np.testing.assert_allclose(beats.features.table["rms"], [0.25, 0.5, 0.75, 1])
+    np.testing.assert_allclose(beats.features.rms(np.full(4, 0.5)), 0.5)
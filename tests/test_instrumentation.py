@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+import pytest
+
+from beatmachine import Beats
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.effects import RemapBeats, ReverseAllBeats
+from beatmachine.instrumentation import Recorder, TimedEffect, span, timed_effects
+from beatmachine.service import Metrics
+
+
+def test_spans_nest():
+    with Recorder() as recorder:
+        with span("outer"):
+            with span("inner"):
+                pass
+
+    assert [(s.stage, s.parent) for s in recorder.spans] == [("inner", "outer"), ("outer", None)]
+    assert recorder.spans[0].peak_bytes is None
+    assert recorder.format().splitlines()[2].startswith("  inner")
+
+
+def test_nothing_is_wrapped_without_hooks():
+    effect = ReverseAllBeats()
+    assert timed_effects([effect]) == [effect]
+
+
+def test_timed_effect_excludes_upstream_time(song_ascending):
+    def slow_source():
+        for beat in song_ascending:
+            time.sleep(0.01)
+            yield beat
+
+    effect = ReverseAllBeats()
+    assert TimedEffect(RemapBeats(mapping=[1, 0])).lookahead == 2
+
+    with Recorder() as recorder:
+        assert list(TimedEffect(effect)(slow_source())) == list(effect(song_ascending))
+
+    (s,) = recorder.spans
+    assert s.stage == "effect/reverseb"
+    assert s.seconds < 0.01
+
+
+def test_song_stages_are_recorded(drums_wav_path):
+    with Recorder() as recorder:
+        beats = Beats.from_song(str(drums_wav_path), BpmBackend(120, 0)).apply_all(ReverseAllBeats(), warn=False)
+        assert isinstance(beats.to_ndarray(), np.ndarray)
+
+    totals = recorder.totals()
+    assert list(totals) == ["decode", "analysis", "features", "from_song", "effect/reverseb"]
+    assert totals["decode"][0] == "from_song"
+
+
+def test_metrics_render_histograms_gauges_and_counters():
+    metrics = Metrics(buckets=(1.0, 10.0))
+    with Recorder() as recorder:
+        with span("decode"):
+            pass
+    metrics(recorder.spans[0])
+    metrics.observe_request(5.0, 200)
+    metrics.gauge("jobs_waiting", "Waiting jobs.", lambda: 3)
+    metrics.counter("files_removed_total", "Removed files.", lambda: 7)
+
+    lines = metrics.render().splitlines()
+    assert 'beatmachine_stage_seconds_bucket{stage="decode",le="1.0"} 1' in lines
+    assert 'beatmachine_request_seconds_bucket{status="200",le="1.0"} 0' in lines
+    assert 'beatmachine_request_seconds_bucket{status="200",le="+Inf"} 1' in lines
+    assert 'beatmachine_request_seconds_count{status="200"} 1' in lines
+    assert "jobs_waiting 3" in lines
+    assert "# TYPE jobs_waiting gauge" in lines
+    assert "files_removed_total 7" in lines
+    assert "# TYPE files_removed_total counter" in lines
+
+    with pytest.raises(ValueError):
+        metrics.counter("files_removed", "Removed files.", lambda: 7)
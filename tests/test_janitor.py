@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from beatmachine.service import Janitor
+
+
+def _make(path, size, age):
+    path.write_bytes(b"\0" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_removes_only_expired_files(tmp_path):
+    old = _make(tmp_path / "old.wav", 10, age=600)
+    new = _make(tmp_path / "new.wav", 10, age=10)
+
+    janitor = Janitor([tmp_path], max_age=300)
+    assert janitor.sweep() == [old]
+    assert os.path.exists(new)
+    assert janitor.removed_files == 1 and janitor.total_bytes == 10
+
+
+def test_removes_oldest_files_over_quota(tmp_path):
+    oldest = _make(tmp_path / "a.wav", 100, age=30)
+    middle = _make(tmp_path / "b.wav", 100, age=20)
+    newest = _make(tmp_path / "c.wav", 100, age=10)
+
+    janitor = Janitor([tmp_path], max_age=300, max_total_bytes=150)
+    assert janitor.sweep() == [oldest, middle]
+    assert os.path.exists(newest)
+
+
+def test_held_files_are_kept(tmp_path):
+    held = _make(tmp_path / "held.wav", 100, age=600)
+    other = _make(tmp_path / "other.wav", 100, age=600)
+
+    janitor = Janitor([tmp_path], max_age=300, max_total_bytes=0)
+    with janitor.protect(tmp_path / "held.wav"):
+        assert janitor.sweep() == [other]
+    assert janitor.sweep() == [held]
+
+
+def test_holds_are_counted(tmp_path):
+    path = _make(tmp_path / "song.wav", 10, age=600)
+    janitor = Janitor([tmp_path], max_age=0)
+    janitor.hold(path)
+    janitor.hold(path)
+    janitor.release(path)
+    assert janitor.sweep() == []
+    janitor.release(path)
+    assert janitor.sweep() == [path]
+
+
+def test_sweeps_in_background(tmp_path):
+    path = _make(tmp_path / "song.wav", 10, age=600)
+    janitor = Janitor([tmp_path, tmp_path / "missing"], max_age=300, interval=0.01)
+    janitor.start()
+    try:
+        deadline = time.monotonic() + 5
+        while os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        janitor.stop()
+    assert not os.path.exists(path)
+
+
+def test_rejects_bad_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        Janitor([tmp_path], interval=0)
+    with pytest.raises(ValueError):
+        Janitor([tmp_path], max_total_bytes=-1)
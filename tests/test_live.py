@@ -0,0 +1,53 @@
+import io
+
+import numpy as np
+import pytest
+
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.codec import read_audio
+from beatmachine.effects import ReverseAllBeats, ReverseEveryNth, SwapBeats
+from beatmachine.live import WindowedTracker, read_pcm_blocks, remix_stream
+
+
+def _blocks(signal, size=4096):
+    return (signal[i : i + size] for i in range(0, len(signal), size))
+
+
+def test_windowed_tracker_reports_each_beat_once():
+    sample_rate = 1000
+    tracker = WindowedTracker(BpmBackend(60, 0), sample_rate, window=4.0, hop=0.5, margin=1.0)
+
+    beats = [tracker.process(block) for block in _blocks(np.zeros((10 * sample_rate, 1)), 250)]
+    beats = np.concatenate(beats + [tracker.flush()])
+
+    assert np.all(np.diff(beats) >= 60 * sample_rate / 300)
+    assert beats[-1] < 10 * sample_rate
+
+
+def test_remix_stream_keeps_all_audio(drums_wav_path):
+    signal, sample_rate = read_audio(drums_wav_path)
+    tracker = WindowedTracker(BpmBackend(120, 0), sample_rate, window=2.0, hop=0.5, margin=0.5)
+
+    beats = list(remix_stream(_blocks(signal), signal.shape[1], [ReverseEveryNth(period=2), SwapBeats()], tracker))
+
+    assert len(beats) > 1
+    assert sum(len(b) for b in beats) == len(signal)
+
+
+def test_remix_stream_rejects_unbounded_effects():
+    tracker = WindowedTracker(BpmBackend(120, 0), 1000)
+
+    with pytest.raises(ValueError):
+        next(remix_stream(iter([]), 1, [ReverseAllBeats()], tracker))
+
+
+def test_read_pcm_blocks_handles_short_reads():
+    pcm = np.arange(20, dtype="<f8").reshape(10, 2)
+
+    class Trickle(io.BytesIO):
+        def read(self, size=-1):
+            return super().read(min(size, 5))
+
+    blocks = list(read_pcm_blocks(Trickle(pcm.tobytes()), 2, block_frames=4))
+
+    np.testing.assert_array_equal(np.concatenate(blocks), pcm)
@@ -1,6 +1,7 @@
 # These tests are kind of naive, but are better than nothing for now.
 
 from beatmachine import Beats
+from beatmachine.codec import read_audio
 
 
 def test_can_load_mp3(drums_mp3_path):
@@ -11,3 +12,11 @@ def test_can_load_mp3(drums_mp3_path):
 def test_can_load_wav(drums_wav_path):
     data = Beats.from_song(drums_wav_path).to_ndarray()
     assert (data != 0).any()
+
+
+def test_from_signal_matches_from_song(drums_wav_path):
+    signal, sample_rate = read_audio(drums_wav_path)
+    loaded = Beats.from_song(drums_wav_path)
+    split = Beats.from_signal(signal, sample_rate)
+    assert [len(b) for b in split._beats] == [len(b) for b in loaded._beats]
+    assert split.channels == loaded.channels
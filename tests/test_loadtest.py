@@ -0,0 +1,45 @@
+import math
+
+import pytest
+
+from loadtest import Result, percentile, summarize
+
+
+@pytest.mark.parametrize(
+    "q, expected",
+    [(0, 1), (20, 1), (25, 2), (50, 3), (80, 4), (95, 5), (100, 5)],
+)
+def test_percentile_is_nearest_rank(q, expected):
+    assert percentile([5, 3, 1, 4, 2], q) == expected
+
+
+def test_percentile_of_two_values():
+    assert percentile([2.0, 1.0], 50) == 1.0
+    assert math.isnan(percentile([], 50))
+
+
+def test_summarize_counts_successes_and_failures():
+    results = [
+        Result(0.0, 1.0, 200, "full", None),
+        Result(0.5, 3.0, 200, "fast", None),
+        Result(1.0, 2.0, 200, "full", None),
+        Result(1.5, 0.1, 503, None, None),
+        Result(2.0, 5.0, None, None, "TimeoutError: timed out"),
+    ]
+    report = summarize(results, [(1.0, 100), (2.0, 300), (3.0, 200)], 10.0)
+
+    assert report["requests"] == 5
+    assert report["throughput"] == pytest.approx(0.3)
+    assert report["error_rate"] == pytest.approx(0.4)
+    assert report["latency"] == {"p50": 2.0, "p95": 3.0, "p99": 3.0}
+    assert report["statuses"] == {"200": 3, "503": 1, "TimeoutError": 1}
+    assert report["tiers"] == {"full": 2, "fast": 1}
+    assert report["peak_rss"] == 300
+    assert len(report["results"]) == 5
+
+
+def test_summarize_without_results():
+    report = summarize([], [], 0.0)
+
+    assert report["throughput"] == 0.0 and report["error_rate"] == 0.0
+    assert report["peak_rss"] is None
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+import beatmachine.effects as fx
+from beatmachine import Beats
+from beatmachine.analysis import Analysis
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.plan import RenderPlan
+
+BACKEND = BpmBackend(bpm=480, first_beat_ms=0)
+
+CHAINS = [
+    [],
+    [fx.SwapBeats(x_period=2, y_period=4)],
+    [fx.ReverseEveryNth(period=2), fx.RemoveEveryNth(period=3)],
+    [fx.SilenceEveryNth(period=2), fx.CutEveryNth(period=3, denominator=3, take_index=1)],
+    [fx.RepeatEveryNth(period=2, times=3), fx.ReverseAllBeats()],
+]
+
+
+@pytest.mark.parametrize("effects", CHAINS)
+@pytest.mark.parametrize("start,stop", [(0, None), (3, 7), (5, 6)])
+def test_render_range_matches_full_render(drums_wav_path, effects, start, stop):
+    expected = list(Beats.from_song(drums_wav_path, BACKEND).apply_all(*effects, warn=False)._beats)[start:stop]
+    plan = RenderPlan(Analysis.from_song(drums_wav_path, BACKEND), effects)
+
+    np.testing.assert_array_equal(np.concatenate(expected), plan.render(start, stop).to_ndarray())
+
+
+def test_offsets_match_output_lengths(drums_wav_path):
+    effects = [fx.RepeatEveryNth(period=2, times=2)]
+    expected = list(Beats.from_song(drums_wav_path, BACKEND).apply_all(*effects, warn=False)._beats)
+    plan = RenderPlan(Analysis.from_song(drums_wav_path, BACKEND), effects)
+
+    assert len(plan) == len(expected)
+    np.testing.assert_array_equal(np.cumsum([0] + [len(b) for b in expected]), plan.offsets)
+
+
+def test_plan_rejects_effects_reading_features(drums_wav_path):
+    with pytest.raises(ValueError):
+        RenderPlan(Analysis.from_song(drums_wav_path, BACKEND), [fx.RemoveEveryNth(period=2, skip_silent=True)])
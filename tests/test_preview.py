@@ -0,0 +1,34 @@
+import numpy as np
+
+from beatmachine import Beats
+from beatmachine.backends.bpm import BpmBackend
+from beatmachine.preview import Preview
+
+
+def test_preview_covers_leading_window(drums_wav_path):
+    preview = Preview.from_song(drums_wav_path, seconds=1.0, backend=BpmBackend(bpm=240, first_beat_ms=0))
+    assert not preview.complete
+    assert len(preview.beats.to_ndarray()) == preview.beats.sample_rate
+
+
+def test_preview_longer_than_song_is_complete(drums_wav_path):
+    preview = Preview.from_song(drums_wav_path, seconds=60.0, backend=BpmBackend(bpm=240, first_beat_ms=0))
+    assert preview.complete
+    assert preview.full() is preview.beats
+
+
+def test_full_matches_song(drums_wav_path):
+    backend = BpmBackend(bpm=240, first_beat_ms=0)
+    full = Preview.from_song(drums_wav_path, seconds=1.0, backend=backend).full()
+    expected = Beats.from_song(drums_wav_path, backend).to_ndarray()
+    np.testing.assert_array_equal(expected, full.to_ndarray())
+
+
+def test_wav_preview_is_written_without_ffmpeg(drums_wav_path, tmp_path, monkeypatch):
+    def no_ffmpeg(*args, **kwargs):
+        raise AssertionError("ffmpeg should not be used for WAV previews")
+
+    monkeypatch.setattr(Beats, "_save_to_file", no_ffmpeg)
+    preview = Preview.from_song(drums_wav_path, seconds=1.0, backend=BpmBackend(bpm=240, first_beat_ms=0))
+    preview.render([], str(tmp_path / "preview.wav"))
+    assert (tmp_path / "preview.wav").stat().st_size > 0
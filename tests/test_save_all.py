@@ -0,0 +1,102 @@
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from beatmachine import Beats
+from beatmachine.beats import OutputTarget
+from beatmachine.codec import read_audio
+from beatmachine.effects.repeat import RepeatEveryNth
+
+
+def _beats(drums_wav_path):
+    signal, sample_rate = read_audio(drums_wav_path)
+    return Beats(sample_rate, signal.shape[1], np.array_split(signal, 8))
+
+
+def test_save_all_native_targets(tmp_path, drums_wav_path):
+    beats = _beats(drums_wav_path)
+    wav = io.BytesIO()
+
+    beats.save_all([str(tmp_path / "out.flac"), OutputTarget(wav, "wav")])
+    wav.seek(0)
+
+    expected = beats.to_ndarray()
+    np.testing.assert_allclose(expected, read_audio(str(tmp_path / "out.flac"))[0], atol=1 / 32768)
+    np.testing.assert_allclose(expected, read_audio(wav)[0], atol=1 / 32768)
+
+
+def test_save_all_mixes_native_and_ffmpeg_targets(tmp_path, drums_wav_path):
+    beats = _beats(drums_wav_path)
+    mp3 = io.BytesIO()
+
+    beats.save_all(
+        [
+            str(tmp_path / "out.wav"),
+            str(tmp_path / "out.mp3"),
+            OutputTarget(mp3, "mp3", ["-b:a", "96k"]),
+        ]
+    )
+
+    assert (tmp_path / "out.wav").stat().st_size > 0
+    assert (tmp_path / "out.mp3").stat().st_size > 0
+    assert len(mp3.getvalue()) > 0
+
+
+def test_save_all_expands_repeated_beats(tmp_path, drums_wav_path):
+    beats = _beats(drums_wav_path).apply(RepeatEveryNth(period=2, times=3))
+    expected = beats.to_ndarray()
+
+    beats.save_all([str(tmp_path / "out.wav")])
+
+    np.testing.assert_allclose(expected, read_audio(str(tmp_path / "out.wav"))[0], atol=1 / 32768)
+
+
+def test_save_all_raises_when_ffmpeg_fails(tmp_path, drums_wav_path):
+    beats = _beats(drums_wav_path)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        beats.save_all([OutputTarget(str(tmp_path / "out.mp3"), None, ["-c:a", "not-a-codec"])])
+
+
+def test_save_all_closes_pipes_when_ffmpeg_is_missing(monkeypatch, drums_wav_path):
+    beats = _beats(drums_wav_path)
+    open_fds = len(os.listdir("/proc/self/fd"))
+
+    def missing(*args, **kwargs):
+        raise FileNotFoundError("ffmpeg")
+
+    monkeypatch.setattr(subprocess, "Popen", missing)
+    with pytest.raises(FileNotFoundError):
+        beats.save_all([OutputTarget(io.BytesIO(), "mp3"), OutputTarget(io.BytesIO(), "ogg", ["-q:a", "3"])])
+
+    assert len(os.listdir("/proc/self/fd")) == open_fds
+
+
+def test_save_all_reports_ffmpeg_dying_early(monkeypatch, tmp_path, drums_wav_path):
+    beats = _beats(drums_wav_path)
+    beats = Beats(beats._sample_rate, beats._channels, beats._beats * 50)
+    script = "import sys; sys.stderr.write('boom'); sys.exit(3)"
+    monkeypatch.setattr(
+        Beats, "_create_multi_output_ffmpeg_command", lambda self, outputs: [sys.executable, "-c", script]
+    )
+
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        beats.save_all([OutputTarget(io.BytesIO(), "mp3", ["-b:a", "96k"])])
+
+    assert e.value.returncode == 3 and e.value.stderr == b"boom"
+
+
+def test_save_all_stops_ffmpeg_when_rendering_fails(tmp_path, drums_wav_path):
+    beats = _beats(drums_wav_path)
+
+    def failing():
+        yield from beats._beats[:2]
+        raise RuntimeError("effect failed")
+
+    broken = Beats(beats._sample_rate, beats._channels, failing())
+    with pytest.raises(RuntimeError, match="effect failed"):
+        broken.save_all([OutputTarget(io.BytesIO(), "mp3", ["-b:a", "96k"]), str(tmp_path / "out.ogg")])
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from beatmachine import Beats
+from beatmachine.codec import read_audio
+from beatmachine.segmented import (
+    _frame_offsets,
+    _mp3_frame_length,
+    _split_points,
+    segmented_format,
+)
+
+
+def test_segmented_formats():
+    assert segmented_format("out.mp3") == "mp3"
+    assert segmented_format("out.aac") == "adts"
+    assert segmented_format("out.wav") is None
+    assert segmented_format(None, "mp3") == "mp3"
+
+
+def test_split_points_snap_to_frames():
+    beat_offsets = np.arange(0, 44100 * 8 + 1, 22050)
+    points = _split_points(beat_offsets, 4, 1152)
+    assert points[0] == 0 and points[-1] == beat_offsets[-1]
+    assert len(points) == 5
+    assert all(p % 1152 == 0 for p in points[1:-1])
+
+
+def test_frame_offsets_follow_adts_lengths():
+    def adts_frame(length):
+        header = bytes([0xFF, 0xF1, 0x50, 0x80 | (length >> 11), (length >> 3) & 0xFF, (length & 0x7) << 5, 0xFC])
+        return header + bytes(length - len(header))
+
+    stream = adts_frame(100) + adts_frame(120) + adts_frame(90)
+    assert _frame_offsets(stream, "adts") == [0, 100, 220]
+
+
+def test_frame_offsets_reject_garbage():
+    with pytest.raises(ValueError):
+        _frame_offsets(bytes(16), "mp3")
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "fffb0000",  # Bitrate index 0 (free format).
+        "fffbf000",  # Bitrate index 15.
+        "fffb9c00",  # Reserved sample rate.
+        "ffeb9000",  # Reserved version.
+        "fffd9000",  # Layer II.
+    ],
+)
+def test_mp3_frame_length_rejects_invalid_headers(header):
+    assert _mp3_frame_length(bytes.fromhex("fffb9000")) == 417
+    with pytest.raises(ValueError):
+        _mp3_frame_length(bytes.fromhex(header))
+
+
+def test_segmented_mp3_keeps_length(tmp_path, drums_wav_path):
+    signal, sample_rate = read_audio(drums_wav_path)
+    beats = Beats(sample_rate, signal.shape[1], np.array_split(signal, 8))
+
+    output = str(tmp_path / "out.mp3")
+    beats.save(output, segments=3)
+
+    with open(output, "rb") as f:
+        assert b"Info" in f.read(64)
+
+    decoded, _ = read_audio(output)
+    assert len(decoded) == len(signal)
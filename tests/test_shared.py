@@ -0,0 +1,57 @@
+import concurrent.futures
+import pickle
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from beatmachine import Beats
+from beatmachine.references import RepeatedBeat
+
+
+def _checksum(handle):
+    beats = Beats.from_shared(handle)
+    return [float(np.sum(beat)) for beat in beats._beats]
+
+
+@pytest.fixture
+def beats():
+    signal = np.arange(20, dtype=np.float64).reshape(10, 2)
+    return Beats(44100, 2, np.split(signal, [3, 3, 7]))
+
+
+def test_round_trip(beats):
+    with beats.share() as shared:
+        handle = pickle.loads(pickle.dumps(shared.handle))
+        attached = Beats.from_shared(handle)
+
+    # Views stay valid after the publisher unlinks the segment.
+    assert len(attached._beats) == len(beats._beats)
+    for expected, actual in zip(beats._beats, attached._beats):
+        np.testing.assert_array_equal(expected, actual)
+        assert not actual.flags.writeable
+
+
+def test_references_are_materialized():
+    beats = Beats(44100, 1, [np.ones((2, 1)), RepeatedBeat(np.full((2, 1), 2.0), 3)])
+    with beats.share() as shared:
+        attached = Beats.from_shared(shared.handle)
+    np.testing.assert_array_equal(attached.to_ndarray(), beats.to_ndarray())
+
+
+def test_empty_beats():
+    with Beats(44100, 2, []).share() as shared:
+        assert Beats.from_shared(shared.handle)._beats == []
+
+
+def test_close_unlinks_segment(beats):
+    shared = beats.share()
+    name = shared.handle.name
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name)
+
+
+def test_other_process_attaches(beats):
+    with beats.share() as shared, concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(_checksum, shared.handle).result() == [float(np.sum(b)) for b in beats._beats]
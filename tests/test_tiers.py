@@ -0,0 +1,50 @@
+import concurrent.futures
+import time
+
+import numpy as np
+
+from beatmachine.service.tiers import TIERS, TierSelector
+
+
+def test_idle_selects_most_accurate_tier():
+    assert TierSelector().select(queue_depth=0) == TIERS["accurate"]
+
+
+def test_queue_depth_degrades_tier():
+    selector = TierSelector()
+    assert selector.select(queue_depth=1) == TIERS["standard"]
+    assert selector.select(queue_depth=2) == TIERS["fast"]
+    assert selector.select(queue_depth=50) == TIERS["fast"]
+
+
+def test_slow_recent_jobs_degrade_tier():
+    selector = TierSelector(target_latency=10)
+    for _ in range(5):
+        selector.record_latency(30)
+    assert selector.select(queue_depth=0) == TIERS["standard"]
+
+
+def test_fast_recent_jobs_keep_tier():
+    selector = TierSelector(target_latency=10)
+    selector.record_latency(1)
+    assert selector.select(queue_depth=0) == TIERS["accurate"]
+
+
+def test_backend_runs_one_rnn_pass_at_a_time():
+    backend = TIERS["fast"].create_backend()
+    active = []
+    overlapped = []
+
+    def processor(signal):
+        active.append(None)
+        overlapped.append(len(active) > 1)
+        time.sleep(0.01)
+        active.pop()
+        return np.zeros(int(len(signal) / signal.sample_rate * backend.fps))
+
+    backend.processor = processor
+    signal = np.zeros((44100, 1))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: backend.locate_beats(signal, 44100), range(8)))
+
+    assert len(overlapped) == 8 and not any(overlapped)